@@ -4,11 +4,31 @@ from .constants import set_envs, set_paths
 set_envs()
 set_paths()
 
-from .file_organizer import FileOrganizer
-from .data_process import DataProcess
-from .data_plot import DataPlot
-from .measure_manager import MeasureManager
-from .pltconfig import color_preset
+# the main classes are imported on first access (PEP 562), so "import pyflexlab" does not pull in
+# pandas, matplotlib, plotly or the instrument drivers until they are needed
+_lazy_attrs = {
+    "FileOrganizer": ".file_organizer",
+    "DataProcess": ".data_process",
+    "DataPlot": ".data_plot",
+    "MeasureManager": ".measure_manager",
+    "color_preset": ".pltconfig.color_preset",
+}
+
+__all__ = ["set_envs", "set_paths", "initialize_with_templates", *_lazy_attrs]
+
+
+def __getattr__(name: str):
+    if name not in _lazy_attrs:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    module = importlib.import_module(_lazy_attrs[name], __name__)
+    value = module if name == "color_preset" else getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy_attrs))
 
 def initialize_with_templates():
     """
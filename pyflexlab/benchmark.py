@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+
+"""
+Throughput benchmark of the measurement loop (get_measure_dict + record_update) running on the
+simulated instruments (drivers/simulated.py), used to quantify rows/s of typical module
+combinations and to catch regressions between commits.
+
+The benchmark runs in a temporary database, so the real LOCAL/OUT databases are not touched.
+
+Usage:
+    python -m pyflexlab.benchmark --rows 100 --out bench.json
+    python -m pyflexlab.benchmark --rows 100 --compare bench_old.json
+or in python:
+    results = run_benchmarks(rows=100)
+    save_results(results, "bench.json")
+    compare_results("bench_old.json", "bench.json")
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .drivers.simulated import SimBackend
+from .file_organizer import FileOrganizer
+
+# each scenario: the measure_mods, var_tuple (with {max}/{step} filled according to the rows),
+# meters loaded (type, address), the wrappers used (in the order of mods), compliance and the vary to start
+SCENARIOS: dict[str, dict] = {
+    "I_ac-V_lockin-T_vary": {
+        "mods": ("I_source_sweep_ac", "V_sense", "T_vary"),
+        "vars": lambda n: (1E-6, 1E-6 / n, 13.671, 1, 2, "", 3, 4, 300, 250),
+        "meters": (("6221", "GPIB0::12::INSTR"), ("sr830", "GPIB0::8::INSTR")),
+        "compliance": ["10V"],
+        "vary": "tmp_vary",
+    },
+    "I_dc-V_2182-B_vary": {
+        "mods": ("I_source_sweep_dc", "V_sense", "B_vary"),
+        "vars": lambda n: (1E-6, 2E-6 / n, 1, 2, "0-max-0", "", 3, 4, 0, 0.5),
+        "meters": (("6221", "GPIB0::12::INSTR"), ("2182", "GPIB0::7::INSTR")),
+        "compliance": ["10V"],
+        "vary": "mag_vary",
+    },
+    "V_dc-I_6430-T_fixed": {
+        "mods": ("V_source_sweep_dc", "I_sense", "T_fixed"),
+        "vars": lambda n: (0.1, 0.2 / n, 1, 2, "0-max-0", "", 3, 4, 300),
+        "meters": (("2400", "GPIB0::24::INSTR"), ("6430", "GPIB0::26::INSTR")),
+        "compliance": ["1mA"],
+        "vary": None,
+    },
+}
+
+
+def git_commit() -> str:
+    """return the current git commit hash of the package (or "unknown")"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+@contextlib.contextmanager
+def _temp_database():
+    """
+    switch the FileOrganizer to a temporary database and restore the original one afterwards
+    """
+    saved = {attr: getattr(FileOrganizer, attr) for attr in
+             ("_local_database_dir", "_out_database_dir", "_trash_dir", "measure_types_json", "proj_rec_json")}
+    with tempfile.TemporaryDirectory(prefix="pyflexlab_bench_") as tmp_dir:
+        local_db = Path(tmp_dir) / "local"
+        local_db.mkdir()
+        shutil.copy(Path(__file__).parent / "templates" / "measure_types.json", local_db / "measure_types.json")
+        FileOrganizer._local_database_dir = local_db
+        FileOrganizer._out_database_dir = Path(tmp_dir) / "out"
+        FileOrganizer._trash_dir = FileOrganizer._out_database_dir / "trash"
+        FileOrganizer.measure_types_json = None
+        FileOrganizer.proj_rec_json = None
+        try:
+            yield Path(tmp_dir)
+        finally:
+            for attr, value in saved.items():
+                setattr(FileOrganizer, attr, value)
+
+
+def _percentiles(arr: np.ndarray) -> dict[str, float]:
+    """latency statistics in ms"""
+    if len(arr) == 0:
+        return {}
+    return {"mean": float(arr.mean() * 1E3), "p50": float(np.percentile(arr, 50) * 1E3),
+            "p90": float(np.percentile(arr, 90) * 1E3), "p99": float(np.percentile(arr, 99) * 1E3),
+            "max": float(arr.max() * 1E3)}
+
+
+def run_scenario(name: str, *, rows: int = 100, nocache: bool = False, verbose: bool = False) -> dict:
+    """
+    run one scenario on simulated instruments and return the statistics
+
+    Args:
+        name (str): the name of the scenario in SCENARIOS
+        rows (int): the number of rows to record
+        nocache (bool): the record mode passed to record_update
+        verbose (bool): whether to show the prints of the measurement (suppressed by default)
+    """
+    from .measure_manager import MeasureManager
+
+    scenario = SCENARIOS[name]
+    out = sys.stdout if verbose else io.StringIO()
+    with _temp_database(), contextlib.redirect_stdout(out):
+        SimBackend.reset()
+        manager = MeasureManager("benchmark")
+        wrappers = []
+        for meter_no, address in scenario["meters"]:
+            manager.load_meter(meter_no, address, sim=True)
+            wrappers.append(manager.instrs[meter_no][0])
+        manager.load_mercury_itc(sim=True)
+        manager.load_mercury_ips(sim=True)
+        manager.instrs["ips"].heater_wait = 0  # avoid the heater waiting in the benchmark
+
+        mea_dict = manager.get_measure_dict(scenario["mods"], *scenario["vars"](rows), wrapper_lst=wrappers,
+                                            compliance_lst=list(scenario["compliance"]))
+        if scenario["vary"] is not None:
+            mea_dict[scenario["vary"]][0]()
+
+        gen_time = np.zeros(rows)
+        rec_time = np.zeros(rows)
+        tracemalloc.start()
+        mem_start = tracemalloc.get_traced_memory()[0]
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        n_rows = 0
+        gen = mea_dict["gen_lst"]
+        for n_rows in range(rows):
+            t0 = time.perf_counter()
+            try:
+                record = next(gen)
+            except StopIteration:
+                break
+            t1 = time.perf_counter()
+            manager.record_update(mea_dict["file_path"], mea_dict["record_num"], record,
+                                  nocache=nocache, force_write=(n_rows == rows - 1))
+            gen_time[n_rows] = t1 - t0
+            rec_time[n_rows] = time.perf_counter() - t1
+        else:
+            n_rows = rows
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        mem_end, mem_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    gen_time, rec_time = gen_time[:n_rows], rec_time[:n_rows]
+    return {"scenario": name, "mods": list(scenario["mods"]), "nocache": nocache, "rows": n_rows,
+            "wall_s": wall, "rows_per_s": n_rows / wall if wall > 0 else float("nan"),
+            "row_latency_ms": _percentiles(gen_time + rec_time),
+            "acquire_latency_ms": _percentiles(gen_time),
+            "record_latency_ms": _percentiles(rec_time),
+            "cpu_s": cpu, "cpu_per_row_ms": cpu / n_rows * 1E3 if n_rows else float("nan"),
+            "mem_growth_kb": (mem_end - mem_start) / 1024, "mem_peak_kb": mem_peak / 1024}
+
+
+def run_benchmarks(scenarios: Optional[list[str]] = None, *, rows: int = 100, latency_scale: float = 1,
+                   verbose: bool = False) -> dict:
+    """
+    run the scenarios for both record modes (nocache False/True)
+
+    Args:
+        scenarios (list[str]): the scenarios to run, default to all in SCENARIOS
+        rows (int): the number of rows for each run
+        latency_scale (float): scale the default latencies of the simulated instruments
+        verbose (bool): whether to show the prints of the measurement
+    """
+    scenarios = list(SCENARIOS) if scenarios is None else scenarios
+    saved_latency = dict(SimBackend.latency)
+    SimBackend.latency = {key: value * latency_scale for key, value in saved_latency.items()}
+    results = []
+    try:
+        for name in scenarios:
+            for nocache in (False, True):
+                res = run_scenario(name, rows=rows, nocache=nocache, verbose=verbose)
+                print(f"{name:<28} nocache={str(nocache):<5} {res['rows_per_s']:8.2f} rows/s  "
+                      f"p50 {res['row_latency_ms'].get('p50', float('nan')):8.2f} ms  "
+                      f"p99 {res['row_latency_ms'].get('p99', float('nan')):8.2f} ms  "
+                      f"cpu {res['cpu_per_row_ms']:6.2f} ms/row  mem +{res['mem_growth_kb']:.1f} kB")
+                results.append(res)
+    finally:
+        SimBackend.latency = saved_latency
+    return {"meta": {"commit": git_commit(), "timestamp": datetime.now().isoformat(timespec="seconds"),
+                     "python": platform.python_version(), "platform": platform.platform(),
+                     "rows": rows, "latency_scale": latency_scale, "latency": dict(SimBackend.latency)},
+            "results": results}
+
+
+def save_results(results: dict, file_path: Optional[Path | str] = None) -> Path:
+    """
+    save the results to json, default to benchmark_<commit>.json in the current directory
+    """
+    if file_path is None:
+        file_path = Path(f"benchmark_{results['meta']['commit']}.json")
+    file_path = Path(file_path)
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"results saved to {file_path}")
+    return file_path
+
+
+def compare_results(old: dict | Path | str, new: dict | Path | str, *, threshold: float = 0.1) -> list[dict]:
+    """
+    compare two benchmark results and print the changes of throughput, return the regressions
+    (throughput dropping by more than the threshold)
+
+    Args:
+        old, new: the results dict or the json file
+        threshold (float): the relative drop of rows/s considered as a regression
+    """
+    def load(res):
+        if isinstance(res, dict):
+            return res
+        with open(res, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    old, new = load(old), load(new)
+    old_map = {(r["scenario"], r["nocache"]): r for r in old["results"]}
+    regressions = []
+    print(f"compare {old['meta']['commit']} -> {new['meta']['commit']}")
+    for res in new["results"]:
+        ref = old_map.get((res["scenario"], res["nocache"]))
+        if ref is None:
+            continue
+        change = res["rows_per_s"] / ref["rows_per_s"] - 1
+        flag = ""
+        if change < -threshold:
+            flag = "  <-- regression"
+            regressions.append({"scenario": res["scenario"], "nocache": res["nocache"], "change": change})
+        print(f"{res['scenario']:<28} nocache={str(res['nocache']):<5} "
+              f"{ref['rows_per_s']:8.2f} -> {res['rows_per_s']:8.2f} rows/s ({change:+.1%}){flag}")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="benchmark the measurement loop on simulated instruments")
+    parser.add_argument("--rows", type=int, default=100, help="rows recorded for each run")
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS), help="scenarios to run (default all)")
+    parser.add_argument("--latency-scale", type=float, default=1, help="scale of the simulated latencies")
+    parser.add_argument("--out", type=str, default=None, help="json file to store the results")
+    parser.add_argument("--compare", type=str, default=None, help="json file of former results to compare with")
+    parser.add_argument("--verbose", action="store_true", help="show the prints of the measurement")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.scenario, rows=args.rows, latency_scale=args.latency_scale, verbose=args.verbose)
+    save_results(results, args.out)
+    if args.compare is not None:
+        compare_results(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
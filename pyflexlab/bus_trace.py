@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+
+"""
+This module provides an opt-in tracer for the VISA bus, used to find out where the
+acquisition time goes (instrument latency or python overhead).
+
+The tracer patches the methods of pyvisa's MessageBasedResource, so every layer built
+on top of a VISA session is covered at the same time:
+- pymeasure adapters (SR830, ITC503, 2182, 6221, ...) via connection.write/read
+- qcodes VisaInstrument (2400, 2450, 6430, MercuryITC) via visa_handle.write/query
+- the custom ask() of MercuryiPS via visa_handle.query
+
+Flow:
+    VisaTracer.enable()
+    (run the measurement as usual)
+    VisaTracer.report(top_n=10)
+    VisaTracer.export_chrome_trace("trace.json")  # open in chrome://tracing or ui.perfetto.dev
+    VisaTracer.disable()
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+# methods of MessageBasedResource to be traced, nested calls (query -> write + read)
+# are recorded only once as the outermost call
+_TRACED_METHODS = ("query", "write", "read", "write_raw", "read_raw", "read_bytes")
+
+
+def command_key(cmd: str) -> str:
+    """
+    normalize a command into a key for aggregating statistics, the trailing set value is
+    replaced by "<v>" so that e.g. "SOUR:CURR 1E-6" and "SOUR:CURR 2E-6" share one key
+
+    Args:
+        cmd (str): the raw command
+    """
+    cmd = cmd.strip()
+    # SCPI-like "CMD value"
+    if " " in cmd:
+        return cmd.split(" ", 1)[0] + " <v>"
+    # Mercury-like "SET:DEV:GRPZ:PSU:SIG:FSET:1.0"
+    return re.sub(r"(?<=:)[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?[a-zA-Z/]{0,5}$", "<v>", cmd)
+
+
+class VisaTracer:
+    """
+    Static tracer recording every VISA transaction (command, instrument, bytes, latency)
+    into a ring buffer, and aggregating per-command latency histograms
+    """
+    enabled: bool = False
+    _originals: dict = {}
+    _lock = threading.Lock()
+    _local = threading.local()
+    _t0: float = 0.0
+    events: deque = deque(maxlen=100000)
+    """ring buffer of (t_start[s], latency[s], resource, method, command, nbytes, thread_id)"""
+    stats: dict = {}
+    """per-command aggregation {key: {"count", "total", "max", "bytes", "hist"}}"""
+    hist_edges: np.ndarray = np.logspace(-5, 2, 29)
+    """latency bin edges (s), 10us to 100s, 4 bins per decade"""
+    key_func: Callable[[str], str] = staticmethod(command_key)
+    _last_cmd: dict = {}
+
+    @staticmethod
+    def enable(maxlen: int = 100000, *, key_func: Optional[Callable[[str], str]] = None,
+               clear: bool = True) -> None:
+        """
+        start tracing all VISA sessions (including those already opened)
+
+        Args:
+            maxlen (int): the length of the ring buffer for raw events
+            key_func (Callable): the function used to aggregate commands, default to command_key
+            clear (bool): whether to clear the former records
+        """
+        from pyvisa.resources.messagebased import MessageBasedResource
+
+        if clear or VisaTracer.events.maxlen != maxlen:
+            VisaTracer.clear(maxlen)
+        if key_func is not None:
+            VisaTracer.key_func = key_func
+        if VisaTracer.enabled:
+            return
+        for name in _TRACED_METHODS:
+            original = getattr(MessageBasedResource, name)
+            VisaTracer._originals[name] = original
+            setattr(MessageBasedResource, name, VisaTracer._traced(name, original))
+        VisaTracer.enabled = True
+        print("VISA tracing enabled")
+
+    @staticmethod
+    def disable() -> None:
+        """
+        stop tracing and restore the original pyvisa methods (records are kept)
+        """
+        if not VisaTracer.enabled:
+            return
+        from pyvisa.resources.messagebased import MessageBasedResource
+
+        for name, original in VisaTracer._originals.items():
+            setattr(MessageBasedResource, name, original)
+        VisaTracer._originals = {}
+        VisaTracer.enabled = False
+        print("VISA tracing disabled")
+
+    @staticmethod
+    def clear(maxlen: Optional[int] = None) -> None:
+        """
+        clear all records, optionally resize the ring buffer
+        """
+        with VisaTracer._lock:
+            VisaTracer.events = deque(maxlen=maxlen if maxlen is not None else VisaTracer.events.maxlen)
+            VisaTracer.stats = {}
+            VisaTracer._last_cmd = {}
+            VisaTracer._t0 = time.perf_counter()
+
+    @staticmethod
+    def _traced(name: str, original: Callable) -> Callable:
+        """
+        wrap one method of MessageBasedResource
+        """
+
+        @wraps(original)
+        def wrapper(resource, *args, **kwargs):
+            local = VisaTracer._local
+            depth = getattr(local, "depth", 0)
+            if depth > 0:
+                return original(resource, *args, **kwargs)
+            local.depth = 1
+            t_start = time.perf_counter()
+            try:
+                result = original(resource, *args, **kwargs)
+            finally:
+                latency = time.perf_counter() - t_start
+                local.depth = 0
+            resource_name = getattr(resource, "resource_name", repr(resource))
+            if name in ("write", "write_raw", "query"):
+                cmd = args[0] if args else kwargs.get("message", "")
+                if isinstance(cmd, bytes):
+                    cmd = cmd.decode(errors="replace")
+                VisaTracer._last_cmd[resource_name] = cmd
+            else:
+                # reads are attributed to the last command written to the same resource
+                cmd = VisaTracer._last_cmd.get(resource_name, "")
+            nbytes = len(args[0]) if name in ("write", "write_raw", "query") and args else 0
+            if name != "write" and name != "write_raw" and result is not None:
+                nbytes += len(result)
+            VisaTracer._record(t_start, latency, resource_name, name, cmd, nbytes)
+            return result
+
+        return wrapper
+
+    @staticmethod
+    def _record(t_start: float, latency: float, resource: str, method: str, cmd: str, nbytes: int) -> None:
+        """
+        store one event into the ring buffer and update the aggregation
+        """
+        key = f"{method} {VisaTracer.key_func(cmd)}"
+        bin_idx = int(np.searchsorted(VisaTracer.hist_edges, latency))
+        with VisaTracer._lock:
+            VisaTracer.events.append((t_start - VisaTracer._t0, latency, resource, method, cmd, nbytes,
+                                      threading.get_ident()))
+            stat = VisaTracer.stats.get(key)
+            if stat is None:
+                stat = {"count": 0, "total": 0.0, "max": 0.0, "bytes": 0,
+                        "hist": np.zeros(len(VisaTracer.hist_edges) + 1, dtype=np.int64),
+                        "resources": set()}
+                VisaTracer.stats[key] = stat
+            stat["count"] += 1
+            stat["total"] += latency
+            stat["max"] = max(stat["max"], latency)
+            stat["bytes"] += nbytes
+            stat["hist"][bin_idx] += 1
+            stat["resources"].add(resource)
+
+    @staticmethod
+    def summary(top_n: Optional[int] = None, sort_by: str = "total") -> list[dict]:
+        """
+        return the aggregated statistics sorted by the given field
+
+        Args:
+            top_n (int): only return the first n commands
+            sort_by (str): "total", "count", "mean" or "max"
+        """
+        with VisaTracer._lock:
+            rows = [{"command": key, "count": s["count"], "total": s["total"],
+                     "mean": s["total"] / s["count"], "max": s["max"], "bytes": s["bytes"],
+                     "p50": min(VisaTracer._hist_quantile(s["hist"], 0.5), s["max"]),
+                     "p95": min(VisaTracer._hist_quantile(s["hist"], 0.95), s["max"]),
+                     "resources": sorted(s["resources"])}
+                    for key, s in VisaTracer.stats.items()]
+        rows.sort(key=lambda r: r[sort_by], reverse=True)
+        return rows[:top_n] if top_n is not None else rows
+
+    @staticmethod
+    def _hist_quantile(hist: np.ndarray, q: float) -> float:
+        """
+        estimate the quantile from the histogram (upper edge of the bin)
+        """
+        cum = np.cumsum(hist)
+        idx = int(np.searchsorted(cum, q * cum[-1]))
+        edges = VisaTracer.hist_edges
+        return float(edges[min(idx, len(edges) - 1)])
+
+    @staticmethod
+    def histogram(cmd_key: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        return the latency histogram (counts, bin edges) of a command key
+        (the first bin counts latencies below the first edge, the last one those above the last edge)
+        """
+        return VisaTracer.stats[cmd_key]["hist"].copy(), VisaTracer.hist_edges.copy()
+
+    @staticmethod
+    def report(top_n: int = 10, sort_by: str = "total") -> None:
+        """
+        print the top-n commands consuming the bus time
+        """
+        rows = VisaTracer.summary(top_n, sort_by)
+        total_time = sum(s["total"] for s in VisaTracer.stats.values())
+        print(f"VISA bus time: {total_time:.3f} s in {sum(s['count'] for s in VisaTracer.stats.values())} calls")
+        print(f"{'command':<48}{'count':>8}{'total(s)':>10}{'mean(ms)':>10}{'p95(ms)':>10}{'max(ms)':>10}{'share':>8}")
+        for row in rows:
+            share = row["total"] / total_time if total_time > 0 else 0
+            print(f"{row['command'][:47]:<48}{row['count']:>8}{row['total']:>10.3f}{row['mean'] * 1E3:>10.2f}"
+                  f"{row['p95'] * 1E3:>10.2f}{row['max'] * 1E3:>10.2f}{share:>8.1%}")
+
+    @staticmethod
+    def export_chrome_trace(file_path: Path | str) -> Path:
+        """
+        export the events in the ring buffer to the Chrome trace format (json), which can be
+        inspected as a timeline in chrome://tracing or https://ui.perfetto.dev
+        each instrument is shown as one track
+        """
+        file_path = Path(file_path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        pid = os.getpid()
+        with VisaTracer._lock:
+            events = list(VisaTracer.events)
+        tids = {}
+        trace_events = []
+        for t_start, latency, resource, method, cmd, nbytes, thread_id in events:
+            if resource not in tids:
+                tids[resource] = len(tids) + 1
+                trace_events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tids[resource],
+                                     "args": {"name": resource}})
+            trace_events.append({"name": cmd or method, "cat": method, "ph": "X",
+                                 "ts": t_start * 1E6, "dur": latency * 1E6,
+                                 "pid": pid, "tid": tids[resource],
+                                 "args": {"bytes": nbytes, "thread": thread_id}})
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+        print(f"trace exported to {file_path}")
+        return file_path
@@ -5,12 +5,13 @@ from pathlib import Path
 import sys
 from datetime import datetime
 from functools import wraps
-from typing import Literal, Generator, Sequence, Optional
-from matplotlib.colors import LinearSegmentedColormap, ListedColormap
-from matplotlib import colormaps
+from typing import Literal, Generator, Sequence, Optional, TYPE_CHECKING
 
 import numpy as np
-import pandas as pd
+
+# pandas and matplotlib are only imported where used, so importing pyflexlab stays light
+if TYPE_CHECKING:
+    import pandas as pd
 
 import pyflexlab.pltconfig.color_preset as colors
 
@@ -57,6 +58,16 @@ def set_paths(*, local_db_path: Path | str | None = None, out_db_path: Path | st
             OUT_DB_PATH = Path(os.getenv("PYLAB_DB_OUT"))
             print(f"read from PYLAB_DB_OUT:{OUT_DB_PATH}")
 
+
+def is_simulated(sim: Optional[bool] = None) -> bool:
+    """
+    judge if the simulated instruments (drivers/simulated.py) should be used,
+    the explicit argument overwrites the environment variable PYLAB_SIMULATE
+    """
+    if sim is not None:
+        return sim
+    return os.getenv("PYLAB_SIMULATE", "0").lower() in ["1", "true", "yes", "on"]
+
 # define constants
 cm_to_inch = 0.3937
 hplanck = 6.626 * 10 ** (-34)
@@ -189,15 +200,114 @@ def gen_seq(start, end, step):
     """
     double-ended bi-direction sequence generator
     """
+    yield from sweep_table(start, end, step).tolist()
+
+
+def sweep_table(start: float, end: float, step: float) -> np.ndarray:
+    """
+    double-ended bi-direction sequence from start to end (both included), the values are computed by
+    index multiplication (start + i * step) and rounded far below the step, so no error is accumulated
+    and e.g. 0.3 is given instead of 0.30000000000000004; the last step may be shorter than step
+    """
     if step == 0:
         raise ValueError("step should not be zero")
-    if step * (end - start) < 0:
-        step *= -1
-    value = start
-    while (value - end) * step < 0:
-        yield value
-        value += step
-    yield end
+    step = abs(step) if end >= start else -abs(step)
+    ratio = (end - start) / step
+    n_steps = int(np.ceil(ratio - 1E-9 * max(1, abs(ratio))))
+    values = start + np.arange(n_steps) * step
+    values = np.append(values, end)
+    decimals = 10 - int(np.floor(np.log10(abs(step))))
+    return np.round(values, decimals)
+
+
+class SweepPlan:
+    """
+    the table of a sweep built from segments, the whole table is computed up front so it can be
+    inspected (len, values, duration estimate, ...) before running, and it is iterated as python floats;
+    the values at the joints of the segments are repeated (same as the former sweep generators)
+
+    Flow:
+        plan = SweepPlan.from_mode("0-max--max-max-0", 1, 0.1)
+        len(plan), plan.values
+        for value in plan: ...
+    """
+
+    def __init__(self):
+        self.segments: list[np.ndarray] = []
+        self._values: Optional[np.ndarray] = None
+
+    def add_segment(self, start: float, end: float, step: Optional[float] = None, *,
+                    n_points: Optional[int] = None, log: bool = False) -> "SweepPlan":
+        """
+        add a segment from start to end (both included)
+
+        Args:
+            start, end (float): the ends of the segment
+            step (float): the step of a linear segment
+            n_points (int): the number of points (instead of step, or required for log segment)
+            log (bool): logarithmically spaced segment (start and end should have the same sign)
+        """
+        if log:
+            if n_points is None:
+                raise ValueError("n_points is needed for a log segment")
+            segment = np.geomspace(start, end, n_points)
+        elif n_points is not None:
+            segment = np.linspace(start, end, n_points)
+        elif step is not None:
+            segment = sweep_table(start, end, step)
+        else:
+            raise ValueError("either step or n_points should be given")
+        self.segments.append(segment)
+        self._values = None
+        return self
+
+    def add_values(self, values: Sequence[float] | np.ndarray) -> "SweepPlan":
+        """add a custom segment of values"""
+        self.segments.append(np.asarray(values, dtype=float).ravel())
+        self._values = None
+        return self
+
+    @classmethod
+    def from_mode(cls, mode: Literal["0-max-0", "0--max-max-0", "0-max--max-max-0", "min-max"], max_value: float,
+                  step: float, *, min_value: Optional[float] = None) -> "SweepPlan":
+        """
+        build the plan of the sweep modes used by the measurements
+        """
+        plan = cls()
+        if mode == "0-max-0":
+            plan.add_segment(0, max_value, step).add_segment(max_value, 0, step)
+        elif mode == "0--max-max-0":
+            plan.add_segment(0, -max_value, step).add_segment(-max_value, max_value, step)
+            plan.add_segment(max_value, 0, step)
+        elif mode == "0-max--max-max-0":
+            plan.add_segment(0, max_value, step).add_segment(max_value, -max_value, step)
+            plan.add_segment(-max_value, max_value, step).add_segment(max_value, 0, step)
+        elif mode == "min-max":
+            if min_value is None:
+                raise ValueError("min_value is needed for min-max mode")
+            plan.add_segment(min_value, max_value, step)
+        else:
+            raise ValueError("sweep mode not recognized")
+        return plan
+
+    @property
+    def values(self) -> np.ndarray:
+        """the whole table (computed once)"""
+        if self._values is None:
+            self._values = np.concatenate(self.segments) if self.segments else np.array([])
+        return self._values
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self.segments)
+
+    def __iter__(self):
+        return iter(self.values.tolist())
+
+    def __getitem__(self, item):
+        return self.values[item]
+
+    def __repr__(self) -> str:
+        return f"SweepPlan({len(self.segments)} segments, {len(self)} points)"
 
 
 def handle_keyboard_interrupt(func):
@@ -305,7 +415,7 @@ def hex_to_rgb(hex_str: str, fractional: bool = True) -> tuple[int, ...] | tuple
     return tuple(int(hex_str[i:i + 2], 16) for i in (0, 2, 4))
 
 
-def timestr_convert(t: pd.Series | Sequence[str] | np.ndarray, format_str: str = "%Y-%m-%d_%H:%M:%S.%f", *,
+def timestr_convert(t: "pd.Series | Sequence[str] | np.ndarray", format_str: str = "%Y-%m-%d_%H:%M:%S.%f", *,
                     elapsed: Optional[Literal["sec", "min", "hour"]] = None) -> list[datetime] | list[float]:
     """
     Convert the time to datetime object, used to split time series without day information
@@ -370,6 +480,7 @@ def truncate_cmap(cmap, min_val: float = 0.0, max_val: float = 1.0, n: int = 256
         n : int
             the number of colors in the colormap
     """
+    from matplotlib.colors import LinearSegmentedColormap
     new_cmap = LinearSegmentedColormap.from_list(
         f"trunc({cmap.name},{min_val:.2f},{max_val:.2f})", cmap(np.linspace(min_val, max_val, n)))
     return new_cmap
@@ -385,6 +496,7 @@ def combine_cmap(cmap_lst: list, segment: int = 128):
         segment : int
             the number of segments in each colormap
     """
+    from matplotlib.colors import LinearSegmentedColormap
     c_lst = []
     for cmap in cmap_lst:
         c_lst.extend(cmap(np.linspace(0, 1, segment)))
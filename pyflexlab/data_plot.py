@@ -3,6 +3,8 @@
 
 import importlib
 import copy
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import json
 import threading
 import re
@@ -12,18 +14,25 @@ import sys
 from collections.abc import Sequence
 from importlib import resources
 from pathlib import Path
-from typing import Optional, Literal
+from typing import Optional, Literal, TYPE_CHECKING
 
 from matplotlib.axes import Axes
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
 import pandas as pd
 
 from .constants import cm_to_inch, factor, default_plot_dict, is_notebook, hex_to_rgb
 from .data_process import DataProcess
+from .live_buffer import TraceBuffer, GridAccumulator
+from .downsample import Downsampler, downsample_indices
+
+# plotly (and dash) are only needed by the live plotting, imported in live_plot_init
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+LINE_PLOT_TYPES = ("scatter", "scattergl", "auto")
+"""the live plot types with lines_per_fig traces (the others have one 2d trace per subplot)"""
 
 
 class DataPlot(DataProcess):
@@ -123,17 +132,50 @@ class DataPlot(DataProcess):
         - if_folder_create: whether to create the folder for all the measurements in project
         """
         super().__init__(proj_name)
-        self.plot_types: list[list[str]] = []
         DataPlot.load_settings(usetex, usepgf)
         self.create_folder("plot")
         self.unit = {"I": "A", "V": "V", "R": "Ohm", "T": "K", "B": "T", "f": "Hz"}
         # params here are mainly used for internal methods
         self.params = DataPlot.PlotParam(no_params)
-        self.live_dfs: list[list[list[go.Scatter]]] = []
-        self.go_f: Optional[go.FigureWidget] = None
+        self._init_live_state()
         if if_folder_create:
             self.assign_folder()
 
+    def _init_live_state(self) -> None:
+        """
+        the attributes of the live plotting, separated from __init__ for the plotting process
+        (which only needs the live plotting part of the instance)
+        """
+        self.plot_types: list[list[str]] = []
+        self.live_dfs: list[list[list[go.Scatter]]] = []
+        self.live_buffers: list[list[list[dict[str, TraceBuffer]]]] = []
+        """the x/y/z buffers of each live trace, the traces are refreshed from them"""
+        self.live_refresh_interval: float = 0.5
+        self.live_webgl_threshold: int = 10000
+        """the number of shown points of a trace to switch an "auto" subplot to WebGL"""
+        self._live_dirty: set[tuple[int, int, int]] = set()
+        self._live_last_refresh: float = -np.inf
+        self._live_lock = threading.RLock()
+        self._live_layout_rev = 0
+        """increased on every change needing a full redraw (init, non-incremental update)"""
+        self._live_downsamplers: dict[tuple[int, int, int], Downsampler] = {}
+        """the downsamplers of the scatter traces (empty if downsampling is disabled)"""
+        self._live_xranges: dict[tuple[int, int], tuple[float, float]] = {}
+        """the zoomed x ranges of the subplots, shown in full resolution"""
+        self._live_date_axes: set[tuple[str, int, int]] = set()
+        """the (axis, row, col) set to date axes (the times are kept as epoch ms)"""
+        self._live_data_rev = 0
+        """increased on every change of the live data, used to skip unchanged exports"""
+        self.export_stats = {"written": 0, "skipped": 0, "last_time": 0.0, "total_time": 0.0}
+        """the statistics of the periodic figure export (save_fig_periodically)"""
+        self._dash_rev = -1
+        self._dash_cursors: dict[tuple[int, int, int], int] = {}
+        self._dash_sent: dict[tuple[int, int, int], int] = {}
+        self.go_f: Optional[go.FigureWidget] = None
+        self._live_queue: Optional[multiprocessing.Queue] = None
+        """the queue to the plotting process (None for plotting in this process)"""
+        self._live_process: Optional[multiprocessing.Process] = None
+
         self._stop_event = threading.Event()
         self._thread = None
 
@@ -333,17 +375,79 @@ class DataPlot(DataProcess):
                     print("no data found")
                     return None
 
+        fig, ax = DataPlot._df_cols_figure(data_df)
+        if plot_path is not None and not plot_path.exists():
+            print(f"plot saved to {plot_path}")
+            fig.savefig(plot_path)
+        plt.show()
+        return fig, ax
+
+    @staticmethod
+    def _df_cols_figure(data_df: pd.DataFrame) -> tuple[Figure, Axes]:
+        """the figure of plot_df_cols (all columns w.r.t. the first column)"""
         fig, ax, param = DataPlot.init_canvas(1, 1, 14, 20)
         for col in data_df.columns[1:]:
             ax.plot(data_df.iloc[:, 0], data_df[col], label=col)
         ax.set_xlabel(data_df.columns[0])  # Set the label of the x-axis to the name of the first column
         ax.legend(edgecolor='black', prop=DataPlot.legend_font)
-        if plot_path is not None and not plot_path.exists():
-            print(f"plot saved to {plot_path}")
-            fig.savefig(plot_path)
-        plt.show()
         return fig, ax
 
+    def render_project(self, pattern: str | Sequence[str] = "**/*.csv", *,
+                       measurements: Optional[Sequence[str]] = None, workers: Optional[int] = None,
+                       force: bool = False, usetex: bool = False, usepgf: bool = False) -> dict:
+        """
+        render the plot_df_cols figures of many records of the project in a process pool (non-interactive
+        backend), the figures are saved in the plot folder with the same relative path as the records
+        (like get_filepath(..., plot=True)). The records older than their existing figures are skipped.
+
+        Args:
+        - pattern: the glob pattern(s) relative to the project folder
+        - measurements: the measurement names (folders) in the project record to render instead of the pattern,
+                e.g. self.query_proj()["measurements"]
+        - workers: the number of processes, default to the number of CPUs
+        - force: render all figures even if up to date
+        - usetex, usepgf: the matplotlib settings (see load_settings)
+
+        Returns:
+            dict with the "rendered", "skipped" (paths of the records), "failed" ({record path: error})
+            and "seconds"
+        """
+        proj_path = self.proj_path
+        patterns = [pattern] if isinstance(pattern, str) else list(pattern)
+        if measurements is not None:
+            patterns = [f"{measure_name}/**/*.csv" for measure_name in measurements]
+        data_paths = sorted({path for pat in patterns for path in proj_path.glob(pat)
+                             if path.is_file() and path.relative_to(proj_path).parts[0] != "plot"})
+        jobs, skipped = [], []
+        for data_path in data_paths:
+            plot_path = (proj_path / "plot" / data_path.relative_to(proj_path)).with_suffix(".png")
+            if not force and plot_path.exists() and plot_path.stat().st_mtime >= data_path.stat().st_mtime:
+                skipped.append(data_path)
+            else:
+                jobs.append((data_path, plot_path))
+
+        result = {"rendered": [], "skipped": skipped, "failed": {}, "seconds": 0.0}
+        t_start = time.perf_counter()
+        if jobs:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_render_init, initargs=(usetex, usepgf)) as executor:
+                futures = {executor.submit(_render_df_cols, data_path, plot_path): data_path
+                           for data_path, plot_path in jobs}
+                for future in as_completed(futures):
+                    error = future.exception()
+                    if error is None:
+                        result["rendered"].append(futures[future])
+                    else:
+                        result["failed"][futures[future]] = repr(error)
+        result["seconds"] = time.perf_counter() - t_start
+        n_rendered = len(result["rendered"])
+        print(f"rendered {n_rendered} figures in {result['seconds']:.1f} s "
+              f"({n_rendered / max(result['seconds'], 1E-9):.1f} figures/s), "
+              f"{len(skipped)} up to date, {len(result['failed'])} failed")
+        for data_path, error in result["failed"].items():
+            print(f"failed: {data_path.relative_to(proj_path)} ({error})")
+        return result
+
     @staticmethod
     def plot_mapping(data_df: pd.DataFrame, mapping_x: any, mapping_y: any, mapping_val: any, *,
                      fig: Figure = None, ax: Axes = None, cmap: str = "viridis") -> tuple[Figure, Axes]:
@@ -422,7 +526,10 @@ class DataPlot(DataProcess):
                        pixel_width: float = 1200, *, titles: Sequence[Sequence[str]] = None,
                        axes_labels: Sequence[Sequence[Sequence[str]]] = None,
                        line_labels: Sequence[Sequence[Sequence[str]]] = None,
-                       plot_types: Sequence[Sequence[Literal["scatter", "contour", "heatmap"]]] = None) -> None:
+                       plot_types: Sequence[Sequence[Literal["scatter", "scattergl", "auto", "contour", "heatmap"]]] = None,
+                       refresh_interval: float = 0.5, downsample: Optional[Literal["minmax", "lttb"]] = "minmax",
+                       pixel_budget: Optional[int] = None, webgl_threshold: int = 10000,
+                       separate_process: bool = False) -> None:
         """
         initialize the real-time plotter using plotly
 
@@ -436,14 +543,38 @@ class DataPlot(DataProcess):
         - axes_labels: the labels of the axes, note the type notation, shape should be (n_rows, n_cols, 2[x and y axes labels])
         - line_labels: the labels of the lines, note the type notation, shape should be (n_rows, n_cols, lines_per_fig)
         - plot_types: the plot types for the lines, the type of plot for each subplot,
-                options include 'scatter' and 'contour', shape should be (n_rows, n_cols)
+                options include 'scatter', 'scattergl' (WebGL, for dense lines), 'auto' (scatter switched to
+                scattergl once a trace shows more than webgl_threshold points), 'contour' and 'heatmap',
+                shape should be (n_rows, n_cols)
+        - refresh_interval: the min interval (s) between two refreshes of the figure for incremental updates
+        - downsample: the visual downsampling of long scatter traces ("minmax" envelope or "lttb"), None to show all
+                points, the buffers always keep the full data (see live_plot_set_range for zooming)
+        - pixel_budget: the number of buckets per trace for downsampling, default to the pixel width of a subplot
+        - webgl_threshold: the number of shown points of a trace to switch an 'auto' subplot to WebGL
+        - separate_process: own the figure and the Dash server in a separate process, the live plot methods
+                (update, refresh, set_range, start/stop_saving) are then only queued to that process, so the
+                plotting never blocks the measurement. The process is started by "spawn", so the measurement
+                script needs the `if __name__ == "__main__":` guard. Use live_plot_close to stop it.
         """
+        self.live_plot_close()
+        if separate_process:
+            init_kwargs = dict(n_rows=n_rows, n_cols=n_cols, lines_per_fig=lines_per_fig, pixel_height=pixel_height,
+                               pixel_width=pixel_width, titles=titles, axes_labels=axes_labels,
+                               line_labels=line_labels, plot_types=plot_types, refresh_interval=refresh_interval,
+                               downsample=downsample, pixel_budget=pixel_budget, webgl_threshold=webgl_threshold)
+            ctx = multiprocessing.get_context("spawn")
+            self._live_queue = ctx.Queue()
+            self._live_process = ctx.Process(target=_live_plot_process, args=(self._live_queue, init_kwargs),
+                                             name="live-plot", daemon=True)
+            self._live_process.start()
+            return
         if plot_types is None:
             plot_types = [['scatter' for _ in range(n_cols)] for _ in range(n_rows)]
-        self.plot_types = plot_types
+        # copied, as the 'auto' subplots are changed to 'scattergl' when switched
+        self.plot_types = [list(row_types) for row_types in plot_types]
         # for contour plot, only one "line" is allowed
-        traces_per_subplot = [[lines_per_fig if plot_types[i][j] == 'scatter' else 1 for j in range(n_cols)] for i
-                              in range(n_rows)]
+        traces_per_subplot = [[lines_per_fig if plot_types[i][j] in LINE_PLOT_TYPES else 1 for j in range(n_cols)]
+                              for i in range(n_rows)]
         if titles is None:
             titles = [["" for _ in range(n_cols)] for _ in range(n_rows)]
         flat_titles = [item for sublist in titles for item in sublist]
@@ -456,16 +587,38 @@ class DataPlot(DataProcess):
         #x_arr = [[[] for _ in range(n_cols)] for _ in range(n_rows)]
         #y_arr = [[[[] for _ in range(lines_per_fig)] for _ in range(n_cols)] for _ in range(n_rows)]
 
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+
         fig = make_subplots(rows=n_rows, cols=n_cols, subplot_titles=flat_titles)
         data_idx = 0
         self.live_dfs = [[[] for _ in range(n_cols)] for _ in range(n_rows)]
+        self.live_buffers = [[[{"x": TraceBuffer(), "y": TraceBuffer(), "z": TraceBuffer()}
+                               | ({} if plot_types[i][j] in LINE_PLOT_TYPES
+                                  else {"grid": GridAccumulator(), "gridded": True})
+                               for _ in range(traces_per_subplot[i][j])] for j in range(n_cols)]
+                             for i in range(n_rows)]
+        self.live_refresh_interval = refresh_interval
+        self.live_webgl_threshold = webgl_threshold
+        self._live_dirty = set()
+        self._live_last_refresh = -np.inf
+        self._live_layout_rev += 1
+        if pixel_budget is None:
+            pixel_budget = int(pixel_width / n_cols)
+        self._live_downsamplers = {(i, j, k): Downsampler(pixel_budget, downsample)
+                                   for i in range(n_rows) for j in range(n_cols)
+                                   for k in range(traces_per_subplot[i][j])
+                                   if downsample is not None and plot_types[i][j] in LINE_PLOT_TYPES}
+        self._live_xranges = {}
+        self._live_date_axes = set()
         for i in range(n_rows):
             for j in range(n_cols):
                 plot_type = plot_types[i][j]
                 num_traces = traces_per_subplot[i][j]
-                if plot_type == 'scatter':
+                if plot_type in LINE_PLOT_TYPES:
+                    trace_type = go.Scattergl if plot_type == 'scattergl' else go.Scatter
                     for k in range(num_traces):
-                        fig.add_trace(go.Scatter(x=[], y=[], mode='lines+markers', name=line_labels[i][j][k]),
+                        fig.add_trace(trace_type(x=[], y=[], mode='lines+markers', name=line_labels[i][j][k]),
                                       row=i + 1, col=j + 1)
                         data_idx += 1
                 elif plot_type == 'contour':
@@ -498,15 +651,19 @@ class DataPlot(DataProcess):
         else:
             import dash
             from dash import html, dcc
+            from dash import no_update
             from dash.dependencies import Input, Output
             import threading
             import webbrowser
 
             port = 11235
             app = dash.Dash(__name__)
+            # keep the zoom of the user when the whole figure is sent again
+            fig.update_layout(uirevision=True)
             app.layout = html.Div([
                 dcc.Graph(id='live-graph', figure=fig),
-                dcc.Interval(id='interval-component', interval= 500, n_intervals=0)
+                dcc.Interval(id='interval-component', interval= 500, n_intervals=0),
+                dcc.Store(id='live-range')
             ])
 
             self.go_f = fig
@@ -520,11 +677,21 @@ class DataPlot(DataProcess):
 
             @app.callback(
                 Output('live-graph', 'figure'),
+                Output('live-graph', 'extendData'),
                 Input('interval-component', 'n_intervals'),
                 prevent_initial_call=True
             )
             def update_graph(_):
-                return self.go_f
+                return self._dash_tick()
+
+            @app.callback(
+                Output('live-range', 'data'),
+                Input('live-graph', 'relayoutData'),
+                prevent_initial_call=True
+            )
+            def update_range(relayout_data):
+                self._dash_relayout(relayout_data or {})
+                return no_update
 
             # Run Dash server in a separate thread
             def run_dash():
@@ -533,7 +700,7 @@ class DataPlot(DataProcess):
                 # Open the browser automatically
                 webbrowser.open(f'http://localhost:{port}')
                 # Run the server
-                app.run_server(debug=False, port=port, dev_tools_silence_routes_logging=True,
+                app.run(debug=False, port=port, dev_tools_silence_routes_logging=True,
                 use_reloader=False)
 
             self._dash_thread = threading.Thread(target=run_dash, daemon=True)
@@ -541,35 +708,114 @@ class DataPlot(DataProcess):
             # Give the server a moment to start
             time.sleep(2)
 
-    def save_fig_periodically(self, plot_path: Path | str, time_interval: int = 60) -> None:
+    def _live_forward(self, method: str, *args, **kwargs) -> bool:
+        """
+        queue the call to the plotting process, return False if plotting in this process
+        """
+        if self._live_queue is None:
+            return False
+        self._live_queue.put((method, args, kwargs))
+        return True
+
+    def live_plot_close(self) -> None:
+        """
+        stop the plotting process (if any), the pending updates are processed before it stops
+        """
+        if self._live_process is None:
+            return
+        self._live_queue.put(("close", (), {}))
+        self._live_process.join(timeout=10)
+        if self._live_process.is_alive():
+            self._live_process.terminate()
+        self._live_queue.close()
+        self._live_queue = None
+        self._live_process = None
+
+    def save_fig_periodically(self, plot_path: Path | str, time_interval: int = 60,
+                              points_per_trace: int = 4000) -> None:
         """
         save the figure periodically
         this function will be running consistently in the background
         use threading to run this function in the background
+        The intervals without any change of the live data are skipped, and the figure is saved once more
+        when stopped (if changed). See export_stats for the export time and skip counts.
+
+        Args:
+        - plot_path: the path of the image (the format is given by the suffix)
+        - time_interval: the interval (s) between two exports
+        - points_per_trace: the max number of points of each line in the image (downsampled copy)
         """
         if isinstance(plot_path, str):
             plot_path = Path(plot_path)
         plot_path.parent.mkdir(parents=True, exist_ok=True)
-        while not self._stop_event.is_set():
-            time.sleep(time_interval)
-            self.go_f.write_image(plot_path)
+        self.export_stats = {"written": 0, "skipped": 0, "last_time": 0.0, "total_time": 0.0}
+        exported_rev = None
+        while True:
+            stopped = self._stop_event.wait(time_interval)
+            with self._live_lock:
+                rev = (self._live_layout_rev, self._live_data_rev)
+            if rev == exported_rev:
+                self.export_stats["skipped"] += 1
+            else:
+                t_start = time.perf_counter()
+                self.export_figure(plot_path, points_per_trace)
+                exported_rev = rev
+                self.export_stats["written"] += 1
+                self.export_stats["last_time"] = time.perf_counter() - t_start
+                self.export_stats["total_time"] += self.export_stats["last_time"]
+            if stopped:
+                break
+
+    def export_figure(self, plot_path: Path | str, points_per_trace: int = 4000) -> None:
+        """
+        write the live figure as an image, the lines are downsampled to points_per_trace in a copy of the
+        figure (the live figure is only locked for copying), and the image is written to a temporary file
+        and renamed, so readers never see a partially written file
+        """
+        import plotly.graph_objects as go
+
+        plot_path = Path(plot_path)
+        with self._live_lock:
+            self.live_plot_refresh()
+            fig = go.Figure(self.go_f)
+        for trace in fig.data:
+            if trace.type in ("scatter", "scattergl") and trace.y is not None and len(trace.y) > points_per_trace:
+                idx = downsample_indices(np.asarray(trace.x), np.asarray(trace.y), points_per_trace)
+                trace.x, trace.y = np.asarray(trace.x)[idx], np.asarray(trace.y)[idx]
+        # keep the suffix for the format of the image
+        tmp_path = plot_path.with_name(f".{plot_path.stem}.tmp{plot_path.suffix}")
+        try:
+            fig.write_image(tmp_path)
+            os.replace(tmp_path, plot_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
 
-    def start_saving(self, plot_path: Path | str, time_interval: int = 60) -> None:
+    def start_saving(self, plot_path: Path | str, time_interval: int = 60, points_per_trace: int = 4000) -> None:
         """
         start the thread to save the figure periodically
         """
+        if self._live_forward("start_saving", plot_path, time_interval, points_per_trace):
+            return
         self._stop_event.clear()
-        self._thread = threading.Thread(target=self.save_fig_periodically, args=(plot_path, time_interval))
+        self._thread = threading.Thread(target=self.save_fig_periodically,
+                                        args=(plot_path, time_interval, points_per_trace))
         self._thread.start()
 
     def stop_saving(self) -> None:
         """
-        stop the thread to save the figure periodically
+        stop the thread to save the figure periodically (the pending live data is pushed to the figure first)
         """
+        if self._live_forward("stop_saving"):
+            return
+        if self.go_f is not None:
+            self.live_plot_refresh()
         self._stop_event.set()
         if self._thread is not None:
             self._thread.join()
             self._thread = None
+            stats = self.export_stats
+            print(f"figure export: {stats['written']} written ({stats['total_time'] / max(stats['written'], 1):.2f} s "
+                  f"each), {stats['skipped']} unchanged intervals skipped")
 
     def live_plot_update(self, row: int | tuple[int], col: int | tuple[int], lineno: int | tuple[int],
                          x_data: Sequence[float | str] | Sequence[Sequence[float | str]] | np.ndarray[float | str],
@@ -596,78 +842,346 @@ class DataPlot(DataProcess):
         - z_data: the array-like z data (for contour plot only, be the same length as no of contour plots)
         - incremental: whether to update the data incrementally
         - max_points: the maximum number of points to be plotted, if None, no limit, only affect incremental line plots
-        - with_str: whether there are strings (mainly for time string) in data. There will be no order for string data,
-                   the string data will just be plotted evenly spaced
+        - with_str: whether there are strings (mainly for time string) in data. The time strings (like the time column
+                   of the records) are plotted on a date axis, other string data has no order and will just be
+                   plotted evenly spaced
+
+        With separate_process in live_plot_init, the data is only queued (pickled later by the queue thread),
+        so do not modify the passed arrays in place afterwards.
         """
+        if self._live_forward("live_plot_update", row, col, lineno, x_data, y_data, z_data,
+                              incremental=incremental, max_points=max_points, with_str=with_str):
+            return
         if not incremental and max_points is not None:
             print("max_points will be ignored when incremental is False")
 
-        def ensure_list(data, target_type: type = np.float32) -> np.ndarray:
-            def try_type(x):
-                try:
-                    return target_type(x)
-                except (ValueError, TypeError):
-                    return x
-            if isinstance(data, (list, tuple, np.ndarray, pd.Series, pd.DataFrame)):
-                return np.array([try_type(i) for i in data])
-            else:
-                return np.array([try_type(data)])
-
-        def ensure_2d_array(data, if_with_str=False) -> np.ndarray:
-            data_arr = ensure_list(data)
-            if data_arr.size == 0:
-                return data_arr
-            if not isinstance(data_arr[0], np.ndarray):
-                if if_with_str:
-                    return np.array([data_arr])
-                return np.array([data_arr], dtype=np.float32)
-            else:
-                if if_with_str:
-                    return np.array(data_arr)
-                return np.array(data_arr, dtype=np.float32)
-
-        row = ensure_list(row, target_type=int)
-        col = ensure_list(col, target_type=int)
-        lineno = ensure_list(lineno, target_type=int)
-        if not incremental:
-            x_data = ensure_2d_array(x_data, with_str)
-            y_data = ensure_2d_array(y_data, with_str)
-            z_data = ensure_2d_array(z_data, with_str)
-        else:
-            x_data = ensure_list(x_data)
-            y_data = ensure_list(y_data)
-            z_data = ensure_list(z_data)
+        row = np.atleast_1d(np.asarray(row, dtype=int))
+        col = np.atleast_1d(np.asarray(col, dtype=int))
+        lineno = np.atleast_1d(np.asarray(lineno, dtype=int))
+        z_default = isinstance(z_data, tuple) and z_data == (0,)
+        x_data, x_time = DataPlot._ingest_lines(x_data, len(row), incremental, with_str)
+        y_data, y_time = DataPlot._ingest_lines(y_data, len(row), incremental, with_str)
+        z_data, _ = DataPlot._ingest_lines(z_data, len(row), incremental, with_str)
 
         #dim_tolift = [0, 0, 0]
-        with (self.go_f.batch_update()):
-            idx_z = 0
+        idx_z = 0
+        with self._live_lock, self.go_f.batch_update():
+            self._live_data_rev += 1
             for no, (irow, icol, ilineno) in enumerate(zip(row, col, lineno)):
+                self._live_date_axis("x", irow, icol, x_time[no])
+                self._live_date_axis("y", irow, icol, y_time[no])
                 plot_type = self.plot_types[irow][icol]
                 trace = self.live_dfs[irow][icol][ilineno]
-                if plot_type == 'scatter':
+                buffers = self.live_buffers[irow][icol][ilineno]
+                if plot_type in LINE_PLOT_TYPES:
                     if incremental:
-                        trace.x = np.append(trace.x, x_data[no])[-max_points:] if max_points is not None \
-                            else np.append(trace.x, x_data[no])
-                        trace.y = np.append(trace.y, y_data[no])[-max_points:] if max_points is not None \
-                            else np.append(trace.y, y_data[no])
+                        # only append to the buffers, the trace is refreshed later
+                        buffers["x"].set_max_points(max_points)
+                        buffers["y"].set_max_points(max_points)
+                        buffers["x"].extend(x_data[no])
+                        buffers["y"].extend(y_data[no])
+                        self._live_dirty.add((irow, icol, ilineno))
                     else:
-                        trace.x = x_data[no]
-                        trace.y = y_data[no]
+                        buffers["x"].replace(x_data[no])
+                        buffers["y"].replace(y_data[no])
+                        if (irow, icol, ilineno) in self._live_downsamplers:
+                            self._live_downsamplers[(irow, icol, ilineno)].reset()
+                        trace.x, trace.y = self._live_display_xy((irow, icol, ilineno))
                 if plot_type == 'contour' or plot_type == "heatmap":
                     if not incremental:
+                        buffers["x"].replace(x_data[no])
+                        buffers["y"].replace(y_data[no])
+                        buffers["z"].replace(z_data[idx_z])
+                        buffers["grid"].clear()
+                        buffers["gridded"] = True
                         trace.x = x_data[no]
                         trace.y = y_data[no]
                         trace.z = z_data[idx_z]
                     else:
-                        trace.x = np.append(trace.x, x_data[no])
-                        trace.y = np.append(trace.y, y_data[no])
-                        trace.z = np.append(trace.z, z_data[idx_z])
+                        buffers["x"].extend(x_data[no])
+                        buffers["y"].extend(y_data[no])
+                        buffers["z"].extend(z_data[idx_z])
+                        # only numeric, non-date points are gridded (the date values are too close for the
+                        # grid digits), once others come the raw points are shown until the data is replaced
+                        if (buffers["gridded"] and not (x_time[no] or y_time[no])
+                                and all(arr.dtype.kind in "biuf" for arr in (x_data[no], y_data[no], z_data[idx_z]))):
+                            buffers["grid"].add(x_data[no], y_data[no], z_data[idx_z])
+                        else:
+                            buffers["gridded"] = False
+                        self._live_dirty.add((irow, icol, ilineno))
                     idx_z += 1
-            assert idx_z == len(z_data) or (idx_z == 0 and z_data == (0,)), \
+            assert idx_z == len(z_data) or (idx_z == 0 and z_default), \
                 "z_data should have the same length as the number of contour plots"
-        if not is_notebook() and not incremental:
-            self.go_f.update_layout(uirevision=True)
-            time.sleep(0.5)
+        if not incremental:
+            self._live_auto_webgl()
+        if incremental and time.perf_counter() - self._live_last_refresh >= self.live_refresh_interval:
+            self.live_plot_refresh()
+        if not incremental:
+            self._live_layout_rev += 1
+
+    @staticmethod
+    def _ingest_values(values, with_str: bool) -> tuple[np.ndarray, bool]:
+        """
+        the data of one line (or one point) as an array, without per-element conversion: numeric arrays
+        pass through without copy, numeric strings are cast at once, and with with_str the time strings are
+        parsed at once to epoch ms (the unit of plotly date axes), other strings are kept as they are
+        (plotted evenly spaced). Returns the array and whether it holds times.
+        """
+        if isinstance(values, (pd.Series, pd.DataFrame)):
+            values = values.to_numpy()
+        arr = np.atleast_1d(np.asarray(values))
+        if arr.dtype.kind in "biuf":
+            return arr, False
+        if arr.dtype.kind == "M":
+            return arr.astype("datetime64[us]").astype(np.int64) / 1E3, True
+        try:
+            return arr.astype(np.float64), False
+        except (ValueError, TypeError):
+            if not with_str:
+                return arr.astype(object), False
+        try:
+            # the time format of the records ("%Y-%m-%d_%H:%M:%S.%f") or ISO format
+            times = np.char.replace(arr.astype(str), "_", "T").astype("datetime64[us]")
+            return times.astype(np.int64) / 1E3, True
+        except ValueError:
+            return arr.astype(object), False
+
+    @staticmethod
+    def _ingest_lines(data, n_lines: int, incremental: bool, with_str: bool) -> tuple[list[np.ndarray], list[bool]]:
+        """
+        split the data of live_plot_update into the data of each line: a sequence of sequences (or a 2d
+        array) gives one element per line, a flat sequence is one line (non-incremental or a single line) or
+        one point per line (incremental with several lines)
+        """
+        if isinstance(data, np.ndarray) and data.dtype.kind in "biuf":
+            if data.ndim >= 2:
+                lines = list(data)
+            elif incremental and n_lines > 1:
+                lines = list(data.reshape(-1, 1))
+            else:
+                lines = [data]
+        else:
+            if isinstance(data, (pd.Series, pd.DataFrame)):
+                data = data.to_numpy()
+            if not isinstance(data, (list, tuple, np.ndarray)):
+                lines = [data]
+            elif len(data) > 0 and isinstance(data[0], (list, tuple, np.ndarray, pd.Series)):
+                lines = list(data)
+            elif incremental and n_lines > 1:
+                lines = [[value] for value in data]
+            else:
+                lines = [data]
+        ingested = [DataPlot._ingest_values(line, with_str) for line in lines]
+        return [arr for arr, _ in ingested], [is_time for _, is_time in ingested]
+
+    def _live_date_axis(self, axis: Literal["x", "y"], row: int, col: int, is_time: bool) -> None:
+        """set the axis of the subplot to a date axis when it first receives times (epoch ms)"""
+        if not is_time or (axis, row, col) in self._live_date_axes:
+            return
+        self._live_date_axes.add((axis, int(row), int(col)))
+        update = self.go_f.update_xaxes if axis == "x" else self.go_f.update_yaxes
+        update(type="date", row=row + 1, col=col + 1)
+        self._live_layout_rev += 1
+
+    def _dash_tick(self) -> tuple:
+        """
+        the (figure, extendData) outputs of a tick of the Dash server: the whole figure only when the layout
+        changed since the last tick (then the cursors are reset) or a gridded (contour / heatmap) trace changed,
+        otherwise only the points appended since the last tick of each trace (tracked by the server-side
+        cursors) are sent
+        """
+        from dash import no_update
+
+        with self._live_lock:
+            traces = [((irow, icol, ilineno), buffers, self.plot_types[irow][icol] in ("contour", "heatmap"))
+                      for irow, row_buffers in enumerate(self.live_buffers)
+                      for icol, col_buffers in enumerate(row_buffers)
+                      for ilineno, buffers in enumerate(col_buffers)]
+            new = [(idx, key, buffers, is_2d) for idx, (key, buffers, is_2d) in enumerate(traces)
+                   if buffers["x"].total > self._dash_cursors.get(key, 0)]
+            # the downsampled traces are sent again as a whole once the appended points exceed the budget
+            over_budget = any(self._dash_sent.get(key, 0) + buffers["x"].total - self._dash_cursors.get(key, 0)
+                              > self._live_downsamplers[key].budget
+                              for _, key, buffers, _ in new if key in self._live_downsamplers)
+            # the z matrix of the 2d traces can not be extended, so they are sent as a whole figure
+            if self._dash_rev != self._live_layout_rev or any(is_2d for *_, is_2d in new) or over_budget:
+                self._dash_rev = self._live_layout_rev
+                self.live_plot_refresh()
+                self._dash_cursors = {key: buffers["x"].total for key, buffers, _ in traces}
+                self._dash_sent = {}
+                return self.go_f, no_update
+            if not new:
+                return no_update, no_update
+            keys = ("x", "y")
+            update = {key: [] for key in keys}
+            for _, trace_key, buffers, _ in new:
+                cursor = self._dash_cursors.get(trace_key, 0)
+                for key in keys:
+                    update[key].append(buffers[key].since(cursor).tolist())
+                self._dash_sent[trace_key] = self._dash_sent.get(trace_key, 0) + buffers["x"].total - cursor
+                self._dash_cursors[trace_key] = buffers["x"].total
+            max_points = [buffers["x"].max_points or 10 ** 9 for _, _, buffers, _ in new]
+            return no_update, [update, [idx for idx, *_ in new], {key: max_points for key in keys}]
+
+    def live_plot_refresh(self) -> None:
+        """
+        push the buffered data of the traces changed since the last refresh to the figure,
+        called automatically by incremental live_plot_update (at most once per refresh interval),
+        call it manually to show the last points at the end of a measurement
+        """
+        if self._live_forward("live_plot_refresh"):
+            return
+        with self._live_lock:
+            if not self._live_dirty:
+                return
+            with self.go_f.batch_update():
+                for irow, icol, ilineno in self._live_dirty:
+                    trace = self.live_dfs[irow][icol][ilineno]
+                    buffers = self.live_buffers[irow][icol][ilineno]
+                    if self.plot_types[irow][icol] in ("contour", "heatmap") and buffers["gridded"] \
+                            and buffers["grid"].total:
+                        trace.x, trace.y, trace.z = buffers["grid"].view()
+                    elif self.plot_types[irow][icol] in ("contour", "heatmap"):
+                        trace.x = buffers["x"].view()
+                        trace.y = buffers["y"].view()
+                        trace.z = buffers["z"].view()
+                    else:
+                        trace.x, trace.y = self._live_display_xy((irow, icol, ilineno))
+            self._live_dirty = set()
+            self._live_last_refresh = time.perf_counter()
+            self._live_auto_webgl()
+
+    def _live_auto_webgl(self) -> None:
+        """
+        switch the traces of the 'auto' subplots to WebGL (Scattergl) once a trace shows more than
+        live_webgl_threshold points (not switched back). The traces are re-added to the figure in the same
+        order, so the Dash server sends the whole figure on the next tick.
+        """
+        with self._live_lock:
+            switch = {(i, j) for i, row_types in enumerate(self.plot_types) for j, plot_type in enumerate(row_types)
+                      if plot_type == 'auto' and any(trace.x is not None and len(trace.x) > self.live_webgl_threshold
+                                                     for trace in self.live_dfs[i][j])}
+            if not switch:
+                return
+            keep = ("x", "y", "mode", "name", "xaxis", "yaxis", "showlegend", "legendgroup", "visible", "opacity",
+                    "marker", "line")
+            specs = []
+            for i, row_dfs in enumerate(self.live_dfs):
+                for j, col_dfs in enumerate(row_dfs):
+                    for trace in col_dfs:
+                        spec = trace.to_plotly_json()
+                        spec.pop("uid", None)
+                        if (i, j) in switch:
+                            spec = {key: value for key, value in spec.items() if key in keep}
+                            spec["type"] = "scattergl"
+                        specs.append(spec)
+            self.go_f.data = []
+            self.go_f.add_traces(specs)
+            idx = 0
+            for row_dfs in self.live_dfs:
+                for col_dfs in row_dfs:
+                    for k in range(len(col_dfs)):
+                        col_dfs[k] = self.go_f.data[idx]
+                        idx += 1
+            for i, j in switch:
+                self.plot_types[i][j] = 'scattergl'
+            self._live_layout_rev += 1
+
+    def _live_display_xy(self, key: tuple[int, int, int]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        the x, y of a scatter trace to be shown: downsampled to the pixel budget, or only the points within
+        the zoomed x range of the subplot (downsampled again only if still more than twice the budget)
+        """
+        buffers = self.live_buffers[key[0]][key[1]][key[2]]
+        x, y = buffers["x"].view(), buffers["y"].view()
+        downsampler = self._live_downsamplers.get(key)
+        if downsampler is None or len(x) != len(y):
+            return x, y
+        x_range = self._live_xranges.get(key[:2])
+        if x_range is not None and np.issubdtype(x.dtype, np.number):
+            in_range = np.flatnonzero((x >= x_range[0]) & (x <= x_range[1]))
+            # one more point on each side, so the lines reach the edges of the plot
+            in_range = np.arange(max(in_range[0] - 1, 0), min(in_range[-1] + 2, len(x))) \
+                if len(in_range) and np.all(np.diff(in_range) == 1) else in_range
+            idx = in_range[downsample_indices(x[in_range], y[in_range], 2 * downsampler.budget, downsampler.method)]
+        else:
+            idx = downsampler.indices(x, y, buffers["y"].total)
+        return x[idx], y[idx]
+
+    def live_plot_set_range(self, row: int, col: int, x_range: Optional[tuple[float, float]] = None) -> None:
+        """
+        show the points of a subplot within the x range in full resolution (the downsampled traces only keep
+        the envelope of the whole data), None to go back to the whole data. Called by the zoom of the Dash plot,
+        set the range of the axis manually in jupyter.
+
+        Args:
+        - row: the row of the subplot (from 0)
+        - col: the column of the subplot (from 0)
+        - x_range: the (min, max) of the x axis
+        """
+        if self._live_forward("live_plot_set_range", row, col, x_range):
+            return
+        with self._live_lock:
+            if x_range is None:
+                self._live_xranges.pop((row, col), None)
+            else:
+                self._live_xranges[(row, col)] = (min(x_range), max(x_range))
+            self._live_dirty.update((row, col, ilineno) for ilineno in range(len(self.live_buffers[row][col])))
+            self._live_layout_rev += 1
+            self._live_data_rev += 1
+            self.live_plot_refresh()
+
+    def live_plot_set_grid(self, row: int, col: int, x_axis: Optional[Sequence[float]] = None,
+                           y_axis: Optional[Sequence[float]] = None, *, average: bool = True) -> None:
+        """
+        set the grid of a contour / heatmap subplot for the incremental updates, the points are put to the
+        nearest grid values (e.g. the SweepPlan of the two varied quantities). Without calling it, the grid
+        grows with every new x / y value. Only numeric points on non-date axes are gridded, other data (e.g. time
+        strings) is shown as the raw points.
+
+        Args:
+        - row: the row of the subplot (from 0)
+        - col: the column of the subplot (from 0)
+        - x_axis: the grid values of x, None for growing with the data
+        - y_axis: the grid values of y, None for growing with the data
+        - average: average the repeated points of a cell, otherwise show the last one
+        """
+        if self._live_forward("live_plot_set_grid", row, col, x_axis, y_axis, average=average):
+            return
+        with self._live_lock:
+            buffers = self.live_buffers[row][col][0]
+            if "grid" not in buffers:
+                raise ValueError(f"subplot ({row},{col}) is not a contour or heatmap plot")
+            buffers["grid"] = GridAccumulator(x_axis, y_axis, average=average)
+            buffers["gridded"] = True
+
+    def _dash_relayout(self, relayout_data: dict) -> None:
+        """
+        pass the zoom of the x axes (relayoutData of the Dash graph) to live_plot_set_range
+        """
+        n_cols = len(self.live_buffers[0]) if self.live_buffers else 1
+        for key, value in relayout_data.items():
+            matched = re.fullmatch(r"xaxis(\d*)\.(range\[0\]|autorange|range)", key)
+            if matched is None:
+                continue
+            axis_no = int(matched.group(1) or 1) - 1
+            row, col = divmod(axis_no, n_cols)
+            if row >= len(self.live_buffers):
+                continue
+            if matched.group(2) == "autorange":
+                self.live_plot_set_range(row, col, None)
+            else:
+                x_range = value if matched.group(2) == "range" else \
+                    (value, relayout_data.get(key.replace("[0]", "[1]"), value))
+                try:
+                    if ("x", row, col) in self._live_date_axes:
+                        # the range of date axes is given as date strings, the data is kept as epoch ms
+                        x_range = [np.datetime64(str(bound).replace(" ", "T"), "us").astype(np.int64) / 1E3
+                                   for bound in x_range]
+                    self.live_plot_set_range(row, col, (float(x_range[0]), float(x_range[1])))
+                except (TypeError, ValueError):
+                    # category axes are not zoomed in full resolution
+                    pass
 
     @staticmethod
     def sel_pan_color(row: int = None, col: int = None, data_extract: bool = False) \
@@ -842,3 +1356,39 @@ class DataPlot(DataProcess):
             print("wrong format")
             return
         plt.show()
+
+
+def _render_init(usetex: bool, usepgf: bool) -> None:
+    """the initializer of the render_project workers"""
+    plt.switch_backend("agg")
+    DataPlot.load_settings(usetex, usepgf)
+
+
+def _render_df_cols(data_path: Path, plot_path: Path) -> None:
+    """render one record for render_project (in a worker process)"""
+    data_df = pd.read_csv(data_path, sep=r",", index_col=False)
+    fig, _ = DataPlot._df_cols_figure(data_df)
+    plot_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fig.savefig(plot_path)
+    finally:
+        plt.close(fig)
+
+
+def _live_plot_process(queue: multiprocessing.Queue, init_kwargs: dict) -> None:
+    """
+    the main loop of the plotting process (see DataPlot.live_plot_init), the instance here only carries the
+    live plotting state, so no project folder or record is touched
+    """
+    plotter = DataPlot.__new__(DataPlot)
+    plotter._init_live_state()
+    plotter.live_plot_init(**init_kwargs)
+    while True:
+        method, args, kwargs = queue.get()
+        if method == "close":
+            break
+        try:
+            getattr(plotter, method)(*args, **kwargs)
+        except Exception as exc:
+            print(f"live plot process: {method} failed ({exc!r})")
+    plotter.stop_saving()
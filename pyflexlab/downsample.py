@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+"""
+This module provides the visual downsampling of long traces for plotting.
+
+Two methods are provided, both select points of the original data (so the peaks are kept):
+- "minmax": the min and max points of each bucket (the envelope of the trace, exact for lines)
+- "lttb": largest-triangle-three-buckets, one point per bucket maximizing the triangle area with
+    the point selected in the former bucket and the average of the next bucket
+
+Downsampler does it incrementally for a growing (or sliding-window) trace: the buckets are of fixed
+size in the absolute index (doubled when the number of buckets exceeds the budget), so the selected
+points of the finished buckets are cached, and appending new points only recomputes the tail buckets.
+
+Flow:
+    idx = downsample_indices(x, y, 1000, method="lttb")  # offline, whole arrays
+    ds = Downsampler(1000)
+    idx = ds.indices(buffer_x.view(), buffer_y.view(), buffer_y.total)  # live, incremental
+    trace.x, trace.y = x[idx], y[idx]
+"""
+from typing import Literal, Optional
+
+import numpy as np
+
+
+def _is_numeric(arr: np.ndarray) -> bool:
+    return np.issubdtype(np.asarray(arr).dtype, np.number)
+
+
+def minmax_indices(y: np.ndarray, bucket_size: int, offset: int = 0) -> np.ndarray:
+    """
+    the indices of the min and max of each bucket of y (sorted, the last bucket can be partial)
+
+    Args:
+        y (np.ndarray): the data
+        bucket_size (int): the number of points in each bucket
+        offset (int): added to the returned indices
+    """
+    n = len(y)
+    if n == 0:
+        return np.array([], dtype=int)
+    n_full = n // bucket_size
+    y = np.asarray(y, dtype=float)
+    result = []
+    if n_full > 0:
+        blocks = y[:n_full * bucket_size].reshape(n_full, bucket_size)
+        base = np.arange(n_full) * bucket_size
+        i_min = np.argmin(np.where(np.isnan(blocks), np.inf, blocks), axis=1) + base
+        i_max = np.argmax(np.where(np.isnan(blocks), -np.inf, blocks), axis=1) + base
+        result.append(np.sort(np.stack((i_min, i_max), axis=1), axis=1).ravel())
+    if n > n_full * bucket_size:
+        tail = y[n_full * bucket_size:]
+        base = n_full * bucket_size
+        result.append(np.sort([base + np.nanargmin(tail) if not np.all(np.isnan(tail)) else base,
+                               base + np.nanargmax(tail) if not np.all(np.isnan(tail)) else base]))
+    return np.unique(np.concatenate(result)) + offset
+
+
+def lttb_bucket_indices(x: np.ndarray, y: np.ndarray, bounds: np.ndarray, prev: int) -> np.ndarray:
+    """
+    the LTTB selection of the buckets [bounds[i], bounds[i+1]), the last bucket in bounds is only used
+    as the "next bucket" of the former one (not selected)
+
+    Args:
+        x, y (np.ndarray): the data
+        bounds (np.ndarray): the bucket boundaries (indices into x, y)
+        prev (int): the index of the point selected before the first bucket
+    """
+    selected = np.empty(len(bounds) - 2, dtype=int)
+    for i in range(len(bounds) - 2):
+        lo, hi, nhi = bounds[i], bounds[i + 1], bounds[i + 2]
+        if nhi > hi:
+            avg_x, avg_y = x[hi:nhi].mean(), y[hi:nhi].mean()
+        else:  # no next bucket (end of data)
+            avg_x, avg_y = x[hi - 1], y[hi - 1]
+        area = np.abs((x[prev] - avg_x) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (avg_y - y[prev]))
+        prev = lo + int(np.argmax(np.nan_to_num(area, nan=-1)))
+        selected[i] = prev
+    return selected
+
+
+def downsample_indices(x: Optional[np.ndarray], y: np.ndarray, n_out: int,
+                       method: Literal["minmax", "lttb"] = "minmax") -> np.ndarray:
+    """
+    the indices of about n_out points selected for plotting (all indices if not more than n_out points)
+
+    Args:
+        x (np.ndarray): the x data (None or non-numeric for evenly spaced)
+        y (np.ndarray): the y data
+        n_out (int): the number of points to keep
+        method (str): "minmax" or "lttb"
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3 or not _is_numeric(y):
+        return np.arange(n)
+    if method == "minmax":
+        return minmax_indices(y, int(np.ceil(n / (n_out // 2))))
+    x = np.arange(n, dtype=float) if x is None or not _is_numeric(x) else np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    bounds = np.append(np.linspace(1, n - 1, n_out - 1).astype(int), n)
+    return np.concatenate(([0], lttb_bucket_indices(x, y, bounds, 0), [n - 1]))
+
+
+class Downsampler:
+    """
+    incremental downsampling of a growing trace (indices of a TraceBuffer view)
+    """
+
+    def __init__(self, budget: int = 1000, method: Literal["minmax", "lttb"] = "minmax"):
+        """
+        Args:
+            budget (int): the number of buckets (about the pixels of the plot width), minmax gives
+                up to 2 points per bucket and lttb 1, no downsampling for traces shorter than 2 * budget
+            method (str): "minmax" or "lttb"
+        """
+        self.budget = budget
+        self.method = method
+        self.bucket_size = 1
+        self._cache = np.array([], dtype=int)
+        """the selected absolute indices of the finished buckets"""
+        self._n_done = 0
+        """the number of finished buckets (in absolute bucket number)"""
+
+    def reset(self) -> None:
+        self.bucket_size = 1
+        self._cache = np.array([], dtype=int)
+        self._n_done = 0
+
+    def indices(self, x: np.ndarray, y: np.ndarray, total: Optional[int] = None) -> np.ndarray:
+        """
+        the indices (into the given arrays) of the points to plot
+
+        Args:
+            x, y (np.ndarray): the current data of the trace (the window of the buffer)
+            total (int): the number of points ever appended (TraceBuffer.total), default to len(y)
+        """
+        n = len(y)
+        total = n if total is None else total
+        if n <= 2 * self.budget or not _is_numeric(y):
+            return np.arange(n)
+        offset = total - n
+        if len(self._cache) and self._cache[-1] >= total:
+            # the trace has been replaced
+            self.reset()
+        if self.bucket_size == 1 and self._n_done == 0:
+            self.bucket_size = 2 ** int(np.ceil(np.log2(max(n / self.budget, 1))))
+        while -(-total // self.bucket_size) - offset // self.bucket_size > self.budget:
+            self.bucket_size *= 2
+            self._cache = np.array([], dtype=int)
+            self._n_done = 0
+        bs = self.bucket_size
+        first = offset // bs
+        if self._n_done < first:
+            self._n_done = first
+        self._cache = self._cache[self._cache >= offset]
+        n_complete = total // bs
+        # the lttb selection of a bucket depends on the average of the next one
+        final_upto = n_complete if self.method == "minmax" else max(n_complete - 1, self._n_done)
+        if self._n_done < final_upto:
+            new = self._select(x, y, self._n_done, final_upto, offset)
+            self._cache = np.concatenate((self._cache, new))
+            self._n_done = final_upto
+        last_bucket = (total - 1) // bs
+        tail = self._select(x, y, self._n_done, last_bucket + 1, offset)
+        idx = np.concatenate((self._cache, tail)) - offset
+        return np.unique(np.concatenate(([0], idx[(idx >= 0) & (idx < n)], [n - 1])))
+
+    def _select(self, x: np.ndarray, y: np.ndarray, b_start: int, b_end: int, offset: int) -> np.ndarray:
+        """the absolute indices selected in the absolute buckets [b_start, b_end)"""
+        if b_end <= b_start:
+            return np.array([], dtype=int)
+        bs = self.bucket_size
+        n = len(y)
+        lo = max(b_start * bs - offset, 0)
+        hi = min(b_end * bs - offset, n)
+        if hi <= lo:
+            return np.array([], dtype=int)
+        # the first bucket can be cut by the window, the others are aligned to the absolute index
+        first_end = min(b_start * bs - offset + bs, hi)
+        if self.method == "minmax":
+            result = [minmax_indices(y[lo:first_end], first_end - lo, lo)]
+            if first_end < hi:
+                result.append(minmax_indices(y[first_end:hi], bs, first_end))
+            return np.concatenate(result) + offset
+        xf = np.arange(n, dtype=float) if not _is_numeric(x) else np.asarray(x, dtype=float)
+        yf = np.asarray(y, dtype=float)
+        prev = int(self._cache[-1] - offset) if len(self._cache) and self._cache[-1] >= offset else lo
+        bounds = np.concatenate(([lo], np.arange(first_end, hi, bs), [hi, min(hi + bs, n)]))
+        return lttb_bucket_indices(xf, yf, bounds, prev) + offset
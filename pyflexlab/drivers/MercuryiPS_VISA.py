@@ -1,5 +1,5 @@
 """
-Added temperature reading parameters
+Added temperature reading parameters and a cached field snapshot (field_snapshot)
 based on the Oxford MercuryiPS driver Qcodes 0.45.0
 """
 
@@ -344,6 +344,12 @@ class OxfordMercuryiPS(VisaInstrument):
 
         self._field_limits = field_limits if field_limits else lambda x, y, z: True
 
+        # cache of the measured field, shared by all the *_measured parameters
+        self.field_snapshot_ttl: float = 0.2
+        """the max age (s) of the cached field snapshot used by the getters"""
+        self._field_snapshot: FieldVector | None = None
+        self._field_snapshot_time: float = -np.inf
+
         self._target_vector = FieldVector(
             x=self.GRPX.field(), y=self.GRPY.field(), z=self.GRPZ.field()
         )
@@ -469,14 +475,59 @@ class OxfordMercuryiPS(VisaInstrument):
         self.GRPY.field_ramp_rate(rate.y)
         self.GRPZ.field_ramp_rate(rate.z)
 
-    def _get_measured(self, coordinates: list[str]) -> float | list[float]:
+    def field_snapshot(self, max_age: float | None = None) -> FieldVector:
         """
-        Get the measured value of a coordinate. Measures all three fields
-        and computes whatever coordinate we asked for.
+        Return the measured field vector, reading the three axes in one pass
+        only if the cached snapshot is older than max_age. A fresh read also
+        refreshes the cache of all the *_measured parameters and field_measured,
+        so that the derived coordinates cost no extra query.
+
+        Args:
+            max_age: the max age (s) of the snapshot to be reused, default to
+              self.field_snapshot_ttl, 0 to force a new reading
         """
-        meas_field = FieldVector(
+        if max_age is None:
+            max_age = self.field_snapshot_ttl
+        now = time.perf_counter()
+        if self._field_snapshot is not None and now - self._field_snapshot_time < max_age:
+            return self._field_snapshot
+
+        snapshot = FieldVector(
             x=self.GRPX.field(), y=self.GRPY.field(), z=self.GRPZ.field()
         )
+        self._field_snapshot = snapshot
+        self._field_snapshot_time = time.perf_counter()
+
+        coords = ["x", "y", "z", "r", "theta", "phi", "rho"]
+        for coord, value in zip(coords, snapshot.get_components(*coords)):
+            getattr(self, f"{coord}_measured").cache.set(value)
+        self.field_measured.cache.set(self._copy_vector(snapshot))
+        return snapshot
+
+    @property
+    def field_snapshot_time(self) -> float:
+        """
+        The time (time.perf_counter) when the cached snapshot was read
+        """
+        return self._field_snapshot_time
+
+    def invalidate_field_snapshot(self) -> None:
+        """
+        Drop the cached snapshot so that the next reading queries the instrument
+        """
+        self._field_snapshot = None
+        self._field_snapshot_time = -np.inf
+
+    @staticmethod
+    def _copy_vector(vec: FieldVector) -> FieldVector:
+        return FieldVector(**dict(zip("xyz", vec.get_components("x", "y", "z"))))
+
+    def _get_measured(self, coordinates: list[str], max_age: float | None = None) -> float | list[float]:
+        """
+        Get the measured value of a coordinate. Uses the snapshot of all three
+        fields and computes whatever coordinate we asked for.
+        """
+        meas_field = self.field_snapshot(max_age)
 
         if len(coordinates) == 1:
             return meas_field.get_components(*coordinates)[0]
@@ -484,9 +535,7 @@ class OxfordMercuryiPS(VisaInstrument):
             return meas_field.get_components(*coordinates)
 
     def _get_field(self) -> FieldVector:
-        return FieldVector(
-            x=self.x_measured(), y=self.y_measured(), z=self.z_measured()
-        )
+        return self._copy_vector(self.field_snapshot())
 
     def _set_target(self, coordinate: str, target: float) -> None:
         """
@@ -571,7 +620,7 @@ class OxfordMercuryiPS(VisaInstrument):
         sequential ramping procedure. This function is BLOCKING.
         """
         meas_vals: npt.NDArray[np.floating] = np.array(
-            self._get_measured(["x", "y", "z"])
+            self._get_measured(["x", "y", "z"], max_age=0)
         )
         targ_vals: npt.NDArray[np.floating] = np.array(
             self._target_vector.get_components("x", "y", "z")
@@ -592,11 +641,9 @@ class OxfordMercuryiPS(VisaInstrument):
 
     def update_field(self) -> None:
         """
-        Update all the field components.
+        Update all the field components (one fresh snapshot refreshes all of them).
         """
-        coords = ["x", "y", "z", "r", "theta", "phi", "rho"]
-        _ = self._get_field()
-        [getattr(self, f"{i}_measured").get() for i in coords]
+        self.field_snapshot(max_age=0)
 
     def is_ramping(self) -> bool:
         """
@@ -652,7 +699,7 @@ class OxfordMercuryiPS(VisaInstrument):
                 ', "safe" or "simul_block".'
             )
 
-        meas_vals = self._get_measured(["x", "y", "z"])
+        meas_vals = self._get_measured(["x", "y", "z"], max_age=0)
         # we asked for three coordinates, so we know that we got a list
         meas_vals = cast(list[float], meas_vals)
 
@@ -669,6 +716,7 @@ class OxfordMercuryiPS(VisaInstrument):
             "safe": self._ramp_safely,
             "simul_block": self._ramp_simultaneously_blocking,
         }[mode]()
+        self.invalidate_field_snapshot()
 
     def _set_target_and_ramp(self, coordinate: str, mode: str, target: float) -> None:
         """Convenient method to combine setting target and ramping"""
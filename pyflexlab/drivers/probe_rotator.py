@@ -4,13 +4,16 @@
 # make sure to use same architecture for the dll and python(32/64 bit here)
 import functools
 import platform
+import threading
 import time
 from typing import Optional
 
 from pathlib import Path
 import ctypes
+import numpy as np
 from .. import constants
 from ..constants import print_progress_bar
+from ..slow_logger import SlowChannelLogger
 
 
 def avoid_running(method):
@@ -44,7 +47,15 @@ class RotatorProbe:
         self._to_zero_spd = -15
         self.speed = 2
         self._pulse_ratio = 50000  # 360 degrees / pulses
+        self.pulses_per_speed = 1000  # pulses/s per unit of speed, initial guess calibrated by each tracked motion
         self.serial_port = 0  # default serial port for usb
+        # the DLL calls (and the reused buffers) are serialized, the motion tracker polls from its own thread
+        self.lock = threading.RLock()
+        # reused buffers for the frequent queries
+        self._pulse_buf = (ctypes.c_int32 * self._max_axes)()
+        self._status_buf = ctypes.c_int32()
+        self.tracker: Optional[MotionTracker] = None
+        """the tracker of the last motion"""
         if not self.dll_path.exists():
             raise FileNotFoundError(f'WJ_API.dll not found at {self.dll_path}')
         self.wj_api = ctypes.WinDLL(str(self.dll_path))  # can pass Path-like after Python 3.12
@@ -55,6 +66,7 @@ class RotatorProbe:
 
         # define return type and arguments types for functions
         self.__declare_functions()
+        self.angle_set = self.curr_angle()
 
     def __del__(self):
         self.exit()
@@ -87,19 +99,25 @@ class RotatorProbe:
         """
         if axis_no is None:
             axis_no = self.axis_num
-        status = ctypes.c_int32()
-        self.wj_api.WJ_Get_Axis_Status(ctypes.c_int32(axis_no), ctypes.byref(status))
-        return status.value == 1
+        with self.lock:
+            self.wj_api.WJ_Get_Axis_Status(ctypes.c_int32(axis_no), ctypes.byref(self._status_buf))
+            return self._status_buf.value == 1
 
-    def curr_angle(self, *, axis_no: Optional[int] = None) -> float:
+    def curr_pulses(self, *, axis_no: Optional[int] = None) -> int:
         """
-        Returns the current angle of the rotator
+        Returns the current pulse count of the rotator
         """
         if axis_no is None:
             axis_no = self.axis_num
-        pulse_array = (ctypes.c_int32 * self._max_axes)()
-        self.wj_api.WJ_Get_Axes_Pulses(pulse_array)
-        angle = list(pulse_array)[0] / self._pulse_ratio * 360
+        with self.lock:
+            self.wj_api.WJ_Get_Axes_Pulses(self._pulse_buf)
+            return self._pulse_buf[axis_no - 1]
+
+    def curr_angle(self, *, axis_no: Optional[int] = None) -> float:
+        """
+        Returns the current angle of the rotator
+        """
+        angle = self.curr_pulses(axis_no=axis_no) / self._pulse_ratio * 360
         # embed angle overflow control here
         if not (self._lower_limit <= angle <= self._upper_limit):
             self.emergency_stop()
@@ -113,7 +131,8 @@ class RotatorProbe:
         if axis_no is None:
             axis_no = self.axis_num
         speed = ctypes.c_int32()
-        self.wj_api.WJ_Get_Axis_Vel(ctypes.c_int32(axis_no), ctypes.byref(speed))
+        with self.lock:
+            self.wj_api.WJ_Get_Axis_Vel(ctypes.c_int32(axis_no), ctypes.byref(speed))
         self.speed = speed.value
         return speed.value
 
@@ -124,38 +143,51 @@ class RotatorProbe:
         """
         if axis_no is None:
             axis_no = self.axis_num
-        self.wj_api.WJ_Set_Axis_Vel(ctypes.c_int32(axis_no), ctypes.c_int32(value))
+        with self.lock:
+            self.wj_api.WJ_Set_Axis_Vel(ctypes.c_int32(axis_no), ctypes.c_int32(value))
         self.speed = value
         print("Speed set to: ", value)
 
+    def expected_rate(self) -> float:
+        """
+        the expected angular speed (deg/s) from the configured speed
+        """
+        return abs(self.speed) * self.pulses_per_speed / self._pulse_ratio * 360
+
     @avoid_running
-    def ramp_angle(self, angle, *, progress=False, axis_no=None, wait=False) -> None:
+    def ramp_angle(self, angle, *, progress=False, axis_no=None, wait=False, track=False) -> None:
         """
-        Moves the rotator to the specified angle
+        Moves the rotator to the specified angle, the motion is followed by a MotionTracker (self.tracker)
 
         Args:
             angle (in degrees, 360): the angle to move to
             axis_no: the axis number (1)
             wait: whether to wait for the motion to finish
             progress: (overwrite wait if True)whether to continuously monitor the motion
+            track: (only when not waiting) keep sampling the angle in the background (continuous sweeps,
+                use self.tracker.value_at(t) to get the angle at the time of a reading), stop by self.tracker.stop()
         """
         if axis_no is None:
             axis_no = self.axis_num
-        initial_angle = self.curr_angle(axis_no=axis_no)
-        delta_angle = angle - initial_angle
-        delta_pulse = int(delta_angle * self._pulse_ratio / 360)
-        self.wj_api.WJ_Move_Axis_Pulses(ctypes.c_int32(axis_no), ctypes.c_int32(delta_pulse))
+        if self.tracker is not None:
+            self.tracker.stop()
+        initial_pulses = self.curr_pulses(axis_no=axis_no)
+        delta_pulse = int(round(angle * self._pulse_ratio / 360)) - initial_pulses
+        self.angle_set = angle
+        self.tracker = MotionTracker(self, angle, axis_no=axis_no)
+        with self.lock:
+            self.wj_api.WJ_Move_Axis_Pulses(ctypes.c_int32(axis_no), ctypes.c_int32(delta_pulse))
         if wait or progress:
-            while self.if_running(axis_no=axis_no):
-                time.sleep(1)
-                if progress:
-                    print_progress_bar(self.curr_angle(axis_no=axis_no) - initial_angle, angle - initial_angle)
+            self.tracker.wait(progress=progress)
+        elif track:
+            self.tracker.start()
 
     def emergency_stop(self, axis_no: int = 1):
         """
         Stops the rotator immediately
         """
-        self.wj_api.WJ_Move_Axis_Emergency_Stop(ctypes.c_int32(axis_no))
+        with self.lock:
+            self.wj_api.WJ_Move_Axis_Emergency_Stop(ctypes.c_int32(axis_no))
 
     def __declare_functions(self):
         """
@@ -254,3 +286,99 @@ class RotatorProbe:
 
         self.wj_api.WJ_IO_Input.argtypes = [ctypes.c_int32, ctypes.POINTER(ctypes.c_int32)]
         self.wj_api.WJ_IO_Input.restype = ctypes.c_int32
+
+
+class MotionTracker(SlowChannelLogger):
+    """
+    sample the angle of a rotator motion with timestamps, the polling interval adapts to the speed so
+    that about one sample is taken per resolution (deg), and the next sample is taken at the predicted
+    arrival when closer than that (instead of polling the status every second)
+    """
+
+    def __init__(self, rotator: RotatorProbe, target: float, *, axis_no: Optional[int] = None,
+                 resolution: float = 0.1, min_interval: float = 0.02, max_interval: float = 0.5,
+                 tolerance: Optional[float] = None):
+        """
+        Args:
+            rotator (RotatorProbe): the rotator
+            target (float): the target angle (deg)
+            axis_no (int): the axis number
+            resolution (float): the angle (deg) between samples during the motion
+            min_interval, max_interval (float): the limits of the polling interval (s)
+            tolerance (float): the tolerance (deg) to judge the arrival, default to 2 pulses
+        """
+        self.rotator = rotator
+        self.axis_no = rotator.axis_num if axis_no is None else axis_no
+        self.target = target
+        self.resolution = resolution
+        self.min_interval = min_interval
+        super().__init__(lambda: rotator.curr_angle(axis_no=self.axis_no), interval=max_interval,
+                         target_getter=lambda: self.target,
+                         tolerance=2 * 360 / rotator._pulse_ratio if tolerance is None else tolerance,
+                         name="Theta")
+
+    @property
+    def velocity(self) -> float:
+        """the angular speed (deg/s) between the last two samples, the expected one before two samples"""
+        times, values = self.trace()
+        if len(times) < 2 or times[-1] <= times[-2]:
+            return self.rotator.expected_rate()
+        return float((values[-1] - values[-2]) / (times[-1] - times[-2]))
+
+    @property
+    def remaining(self) -> float:
+        """the remaining angle (deg) to the target"""
+        times, values = self.trace()
+        return float("inf") if len(values) == 0 else abs(self.target - values[-1])
+
+    @property
+    def eta(self) -> float:
+        """the predicted time (s) to arrival from the last sample"""
+        speed = abs(self.velocity)
+        if self.remaining <= self.tolerance:
+            return 0.0
+        return float("inf") if speed == 0 else self.remaining / speed
+
+    def _next_interval(self) -> float:
+        speed = abs(self.velocity)
+        if speed == 0 and self.remaining > self.tolerance:
+            # not started yet (or stalled), expect the configured speed
+            speed = self.rotator.expected_rate()
+        if speed == 0:
+            return self.interval
+        interval = self.resolution / speed
+        if self.eta > 0:
+            interval = min(interval, self.eta)
+        return float(np.clip(interval, self.min_interval, self.interval))
+
+    def calibrate(self) -> None:
+        """
+        update the pulses_per_speed of the rotator from the max speed of the tracked motion
+        """
+        times, values = self.trace()
+        if len(times) < 3 or self.rotator.speed == 0:
+            return
+        speeds = np.abs(np.diff(values) / np.maximum(np.diff(times), 1E-9))
+        if speeds.max() > 0:
+            self.rotator.pulses_per_speed = (speeds.max() / 360 * self.rotator._pulse_ratio
+                                             / abs(self.rotator.speed))
+
+    def wait(self, *, progress: bool = False) -> None:
+        """
+        block until the motion is finished, the status is only queried when the arrival is predicted
+        """
+        if not self.running:
+            self._poll()
+        initial = self.trace()[1][0]
+        while True:
+            if self.eta <= self._next_interval() or self.velocity == 0:
+                if not self.rotator.if_running(axis_no=self.axis_no):
+                    break
+            if progress:
+                print_progress_bar(self.trace()[1][-1] - initial, self.target - initial)
+            time.sleep(self._next_interval())
+            if not self.running:
+                self._poll()
+        if not self.running:
+            self._poll()
+        self.calibrate()
@@ -0,0 +1,858 @@
+#!/usr/bin/env python
+
+"""
+In-process simulated instruments mimicking the driver interfaces used in equip_wrapper.py,
+so that the measurement loops can be developed, tested and benchmarked without the rack.
+
+! only the part of the driver interface used by the wrappers is implemented
+
+The simulated devices are stateful (setpoints, output status, ranges), ramp with finite
+rates (temperature and field), add gaussian noise to the readings and sleep for a
+configurable latency on every access to mimic the bus.
+All readings are derived from one shared sample (SimSample), whose resistance depends on
+the simulated temperature and field.
+
+Usage:
+    set the environment variable PYLAB_SIMULATE=1 (affects all wrappers), or pass sim=True
+    to the wrappers / MeasureManager.load_* methods
+    latency and noise can be tuned via SimBackend, e.g.
+        SimBackend.latency["sr830"] = 0.005
+        SimBackend.command_latency["2182.voltage"] = 0.1
+        SimBackend.time_scale = 60  # run ramps 60 times faster
+"""
+import time
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+
+class SimBackend:
+    """
+    global configuration of all the simulated instruments
+    """
+    latency: dict[str, float] = {"sr830": 0.012, "2182": 0.008, "6500": 0.01, "6221": 0.008,
+                                 "6430": 0.015, "2400": 0.01, "2450": 0.01, "itc503": 0.03,
+                                 "mercury_itc": 0.04, "mercury_ips": 0.05}
+    """default latency (s) per device kind"""
+    command_latency: dict[str, float] = {}
+    """latency (s) overriding the default for specific commands, as {"kind.command": latency}"""
+    noise: float = 1E-3
+    """relative noise of the readings"""
+    temperature_noise: float = 2E-3
+    """absolute noise (K) of the temperature readings"""
+    field_noise: float = 1E-5
+    """absolute noise (T) of the field readings"""
+    time_scale: float = 1
+    """the speed of the simulated time (ramps and relaxations) relative to the real time"""
+    line_freq: float = 50
+    rng = np.random.default_rng()
+
+    @staticmethod
+    def delay(kind: str, command: str = "") -> None:
+        """
+        sleep for the latency of the command
+        """
+        latency = SimBackend.command_latency.get(f"{kind}.{command}", SimBackend.latency.get(kind, 0))
+        if latency > 0:
+            time.sleep(latency)
+
+    @staticmethod
+    def now() -> float:
+        """
+        the simulated time (s)
+        """
+        return time.perf_counter() * SimBackend.time_scale
+
+    @staticmethod
+    def add_noise(value: float, floor: float = 1E-9) -> float:
+        """
+        add gaussian noise (relative noise with an absolute floor) to the value
+        """
+        return float(value + SimBackend.rng.normal(0, abs(value) * SimBackend.noise + floor))
+
+    @staticmethod
+    def add_temperature_noise(value: float) -> float:
+        return float(value + SimBackend.rng.normal(0, SimBackend.temperature_noise))
+
+    @staticmethod
+    def add_field_noise(value: float) -> float:
+        return float(value + SimBackend.rng.normal(0, SimBackend.field_noise))
+
+    @staticmethod
+    def reset() -> None:
+        """
+        restore the default configuration and clear the simulated sample
+        """
+        SimBackend.command_latency = {}
+        SimBackend.noise = 1E-3
+        SimBackend.temperature_noise = 2E-3
+        SimBackend.field_noise = 1E-5
+        SimBackend.time_scale = 1
+        SimSample.sources = []
+        SimSample.itc = None
+        SimSample.ips = None
+
+
+class SimSample:
+    """
+    the shared simulated sample, R(T, B) = R0 * (1 + alpha * T) * (1 + beta * B^2)
+    current sources and controllers register themselves here when constructed
+    """
+    r0: float = 1000
+    alpha: float = 2E-3
+    beta: float = 5E-2
+    series_resistance: float = 1E6
+    """the series resistor used when a voltage source (SR830) is used as current source"""
+    sources: list = []
+    itc: Optional[Any] = None
+    ips: Optional[Any] = None
+
+    @staticmethod
+    def temperature() -> float:
+        return SimSample.itc.sample_temperature() if SimSample.itc is not None else 300
+
+    @staticmethod
+    def field() -> float:
+        return SimSample.ips.sample_field() if SimSample.ips is not None else 0
+
+    @staticmethod
+    def resistance() -> float:
+        return (SimSample.r0 * (1 + SimSample.alpha * SimSample.temperature())
+                * (1 + SimSample.beta * SimSample.field() ** 2))
+
+    @staticmethod
+    def current(ac: bool) -> float:
+        """
+        total current flowing through the sample (rms for ac)
+        """
+        return sum(src.sim_current(ac) for src in SimSample.sources)
+
+
+class _Ramp:
+    """
+    a value approaching its target with first-order relaxation (time constant tau) and a
+    maximum rate (per second), tau=0 means a linear ramp
+    """
+
+    def __init__(self, value: float, *, rate: float = np.inf, tau: float = 0):
+        self._value = value
+        self.target = value
+        self.rate = rate
+        self.tau = tau
+        self._t = SimBackend.now()
+
+    @property
+    def value(self) -> float:
+        now = SimBackend.now()
+        dt, self._t = now - self._t, now
+        if dt <= 0:
+            # no time passed (frozen / stepped clock), only an instant ramp moves
+            if self.tau == 0 and np.isinf(self.rate):
+                self._value = self.target
+            return self._value
+        diff = self.target - self._value
+        step = diff if self.tau == 0 else diff * (1 - np.exp(-dt / self.tau))
+        if np.isfinite(self.rate):
+            step = np.clip(step, -self.rate * dt, self.rate * dt)
+        self._value += float(step)
+        return self._value
+
+    @value.setter
+    def value(self, value: float):
+        self._value = value
+        self._t = SimBackend.now()
+
+    def set(self, target: float) -> None:
+        _ = self.value  # advance to now before changing the target
+        self.target = target
+
+    @property
+    def ramping(self) -> bool:
+        return abs(self.value - self.target) > 1E-9
+
+
+class _SimStateful:
+    """
+    pymeasure-like instrument, the instrument properties are stored in self._state and accessed
+    as attributes, each access costs the latency of the device
+    """
+    kind = "generic"
+    _defaults: dict = {}
+    _coercers: dict[str, Callable] = {}
+
+    def __init__(self, address: str = "", **kwargs):
+        object.__setattr__(self, "_state", dict(self._defaults))
+        self.address = address
+
+    def __getattr__(self, name):
+        state = self.__dict__.get("_state", {})
+        if name in state:
+            SimBackend.delay(self.kind, name)
+            return state[name]
+        raise AttributeError(f"{type(self).__name__} has no attribute {name}")
+
+    def __setattr__(self, name, value):
+        if name in self._state:
+            SimBackend.delay(self.kind, name)
+            self._state[name] = self._coercers[name](value) if name in self._coercers else value
+        else:
+            object.__setattr__(self, name, value)
+
+    def write(self, command: str) -> None:
+        SimBackend.delay(self.kind, "write")
+
+    def ask(self, command: str) -> str:
+        SimBackend.delay(self.kind, "ask")
+        return ""
+
+    def clear(self) -> None:
+        SimBackend.delay(self.kind, "clear")
+
+    def shutdown(self) -> None:
+        pass
+
+    def __del__(self):
+        pass
+
+
+class _SimParam:
+    """
+    qcodes-like parameter, get by p() and set by p(value)
+    """
+
+    def __init__(self, kind: str, name: str, value: Any = None, *,
+                 get_func: Optional[Callable[[], Any]] = None, set_func: Optional[Callable[[Any], None]] = None):
+        self.kind = kind
+        self.name = name
+        self._value = value
+        self._get_func = get_func
+        self._set_func = set_func
+
+    def __call__(self, *args):
+        SimBackend.delay(self.kind, self.name)
+        if not args:
+            return self.get_raw()
+        self.set(args[0])
+
+    def get_raw(self):
+        return self._get_func() if self._get_func is not None else self._value
+
+    def get(self):
+        return self()
+
+    def set(self, value) -> None:
+        if self._set_func is not None:
+            self._set_func(value)
+        self._value = value
+
+
+class _SimQcodes:
+    """
+    qcodes-like instrument, parameters are added as _SimParam attributes
+    """
+    kind = "generic"
+
+    def __init__(self, name: str = "", address: str = "", **kwargs):
+        self.name = name
+        self.address = address
+
+    def add_param(self, name: str, value: Any = None, **kwargs) -> _SimParam:
+        param = _SimParam(self.kind, name, value, **kwargs)
+        setattr(self, name, param)
+        return param
+
+    def write(self, command: str) -> None:
+        SimBackend.delay(self.kind, "write")
+
+    def ask(self, command: str) -> str:
+        SimBackend.delay(self.kind, "ask")
+        return ""
+
+    def print_readable_snapshot(self, update: bool = False) -> None:
+        print(f"{self.name} (simulated)")
+        for key, value in vars(self).items():
+            if isinstance(value, _SimParam):
+                print(f"{key}: {value.get_raw()}")
+
+    def close(self) -> None:
+        pass
+
+    def __del__(self):
+        pass
+
+
+def _closest_range(ranges: list[float]) -> Callable[[float], float]:
+    """
+    return a function to choose the smallest range covering the value
+    """
+    ranges = sorted(ranges)
+
+    def coercer(value: float) -> float:
+        for rng in ranges:
+            if abs(value) <= rng:
+                return rng
+        return ranges[-1]
+
+    return coercer
+
+
+"""
+Meters
+"""
+
+
+class SimSR830(_SimStateful):
+    kind = "sr830"
+    _defaults = {"sensitivity": 1.0, "reference_source_trigger": "SINE", "reference_source": "Internal",
+                 "harmonic": 1, "sine_voltage": 0.004, "frequency": 13.671, "filter_slope": 24,
+                 "time_constant": 0.3, "input_config": "A - B", "input_coupling": "AC",
+                 "input_grounding": "Float", "input_notch_config": "None", "reserve": "Normal",
+                 "filter_synchronous": False}
+
+    def __init__(self, address: str = "", **kwargs):
+        super().__init__(address)
+        SimSample.sources.append(self)
+
+    def sim_current(self, ac: bool) -> float:
+        """SR830 used as an ac voltage source with a series resistor"""
+        if not ac or self._state["reference_source"] != "Internal":
+            return 0
+        return self._state["sine_voltage"] / SimSample.series_resistance
+
+    def snap(self, *params) -> list[float]:
+        SimBackend.delay(self.kind, "snap")
+        x = SimBackend.add_noise(SimSample.current(ac=True) * SimSample.resistance())
+        y = SimBackend.add_noise(0)
+        values = {"X": x, "Y": y, "R": float(np.hypot(x, y)), "THETA": float(np.degrees(np.arctan2(y, x)))}
+        return [values[p.upper()] for p in params]
+
+
+class _SimChannel:
+    def __init__(self, parent):
+        self.parent = parent
+
+    def setup_voltage(self, *args, **kwargs) -> None:
+        SimBackend.delay(self.parent.kind, "setup_voltage")
+
+
+class Sim2182(_SimStateful):
+    kind = "2182"
+    _defaults = {"active_channel": 1, "channel_function": "voltage", "voltage_nplc": 5}
+
+    def __init__(self, address: str = "", **kwargs):
+        super().__init__(address)
+        self.ch_1 = _SimChannel(self)
+        self.ch_2 = _SimChannel(self)
+
+    def reset(self) -> None:
+        SimBackend.delay(self.kind, "reset")
+        self._state.update(self._defaults)
+
+    @property
+    def voltage(self) -> float:
+        # integration time adds to the bus latency
+        time.sleep(self._state["voltage_nplc"] / SimBackend.line_freq)
+        SimBackend.delay(self.kind, "voltage")
+        return SimBackend.add_noise(SimSample.current(ac=False) * SimSample.resistance())
+
+
+class Sim6500(_SimStateful):
+    kind = "6500"
+    _defaults = {"autozero_enabled": True, "mode": "voltage", "terminals_used": "FRONT"}
+
+    def auto_range(self) -> None:
+        SimBackend.delay(self.kind, "auto_range")
+
+    def auto_range_status(self) -> bool:
+        SimBackend.delay(self.kind, "auto_range_status")
+        return True
+
+    def enable_filter(self, *args, **kwargs) -> None:
+        SimBackend.delay(self.kind, "enable_filter")
+
+    def measure_voltage(self, max_voltage: float = 1, ac: bool = False) -> None:
+        self._state["mode"] = "voltage"
+
+    def measure_current(self, max_current: float = 1E-2, ac: bool = False) -> None:
+        self._state["mode"] = "current"
+
+    def measure_frequency(self) -> None:
+        self._state["mode"] = "frequency"
+
+    @property
+    def voltage(self) -> float:
+        SimBackend.delay(self.kind, "voltage")
+        return SimBackend.add_noise(SimSample.current(ac=False) * SimSample.resistance())
+
+    @property
+    def current(self) -> float:
+        SimBackend.delay(self.kind, "current")
+        return SimBackend.add_noise(SimSample.current(ac=False))
+
+    @property
+    def frequency(self) -> float:
+        SimBackend.delay(self.kind, "frequency")
+        return SimBackend.add_noise(13.671)
+
+
+"""
+Source meters
+"""
+
+
+class Sim6221(_SimStateful):
+    kind = "6221"
+    _defaults = {"source_range": 2E-3, "source_current": 0, "waveform_amplitude": 0, "waveform_frequency": 13.671,
+                 "source_compliance": 10, "waveform_function": "sine", "waveform_offset": 0,
+                 "waveform_phasemarker_phase": 0, "waveform_phasemarker_line": 3, "waveform_use_phasemarker": True,
+                 "waveform_ranging": "best", "output_low_grounded": True, "source_auto_range": True,
+                 "delta_unit": "V", "delta_buffer_points": 10, "delta_delay": 0.02, "delta_cycles": "INF",
+                 "delta_measurement_sets": 1, "delta_compliance_abort": True, "delta_cold_switch": False,
+                 "delta_high_source": 0}
+    _coercers = {"source_range": _closest_range([2E-9 * 10 ** i for i in range(8)] + [1E-1])}
+
+    def __init__(self, address: str = "", **kwargs):
+        super().__init__(address)
+        self._source_enabled = False
+        self._wave_running = False
+        SimSample.sources.append(self)
+
+    def sim_current(self, ac: bool) -> float:
+        if ac:
+            return self._state["waveform_amplitude"] / np.sqrt(2) if self._wave_running else 0
+        return self._state["source_current"] if self._source_enabled else 0
+
+    def enable_source(self) -> None:
+        SimBackend.delay(self.kind, "enable_source")
+        self._source_enabled = True
+
+    def disable_source(self) -> None:
+        SimBackend.delay(self.kind, "disable_source")
+        self._source_enabled = False
+
+    def waveform_arm(self) -> None:
+        SimBackend.delay(self.kind, "waveform_arm")
+
+    def waveform_start(self) -> None:
+        SimBackend.delay(self.kind, "waveform_start")
+        self._wave_running = True
+
+    def waveform_abort(self) -> None:
+        SimBackend.delay(self.kind, "waveform_abort")
+        self._wave_running = False
+
+    def waveform_duration_set_infinity(self) -> None:
+        SimBackend.delay(self.kind, "waveform_duration_set_infinity")
+
+    def delta_arm(self) -> None:
+        SimBackend.delay(self.kind, "delta_arm")
+
+    def delta_start(self) -> None:
+        SimBackend.delay(self.kind, "delta_start")
+
+    @property
+    def delta_sense(self) -> float:
+        SimBackend.delay(self.kind, "delta_sense")
+        return SimBackend.add_noise(self._state["delta_high_source"] * SimSample.resistance())
+
+    def shutdown(self) -> None:
+        self._source_enabled = False
+        self._wave_running = False
+
+
+class _SimKeithleySMU(_SimQcodes):
+    """
+    common model of the DC source meters: the sample is driven by the source value,
+    and the sense value is derived from the sample resistance (limited by the compliance)
+    """
+
+    def __init__(self, name: str = "", address: str = "", **kwargs):
+        super().__init__(name, address)
+        self._output = False
+        self._mode = "CURR"
+        self._set = {"CURR": 0.0, "VOLT": 0.0}
+        self._compliance = {"CURR": 1E-4, "VOLT": 1.0}  # compliance of the sensed quantity
+        SimSample.sources.append(self)
+
+    def sim_current(self, ac: bool) -> float:
+        if ac or not self._output:
+            return 0
+        if self._mode == "CURR":
+            return self._set["CURR"]
+        return float(np.clip(self._set["VOLT"] / SimSample.resistance(),
+                             -self._compliance["CURR"], self._compliance["CURR"]))
+
+    def _measure(self, quantity: str) -> float:
+        if not self._output:
+            return SimBackend.add_noise(0)
+        curr = self.sim_current(False)
+        if quantity == "CURR":
+            return SimBackend.add_noise(curr, 1E-12)
+        if quantity == "VOLT":
+            if self._mode == "VOLT":
+                return SimBackend.add_noise(self._set["VOLT"])
+            return SimBackend.add_noise(float(np.clip(curr * SimSample.resistance(),
+                                                      -self._compliance["VOLT"], self._compliance["VOLT"])))
+        return SimBackend.add_noise(SimSample.resistance())
+
+    def _set_output(self, value) -> None:
+        self._output = value in (True, 1, "1", "on", "ON")
+
+    def _set_mode(self, mode: str) -> None:
+        self._mode = "CURR" if mode.upper().startswith("CURR") else "VOLT"
+
+    def _setter(self, key: str, quantity: str) -> Callable[[float], None]:
+        def set_value(value):
+            getattr(self, key)[quantity] = value
+        return set_value
+
+    def reset(self) -> None:
+        SimBackend.delay(self.kind, "reset")
+        self._output = False
+        self._mode = "CURR"
+        self._set = {"CURR": 0.0, "VOLT": 0.0}
+
+
+class Sim6430(_SimKeithleySMU):
+    kind = "6430"
+
+    def __init__(self, name: str = "", address: str = "", **kwargs):
+        super().__init__(name, address)
+        curr_ranges = _closest_range([1E-12 * 10 ** i for i in range(11)] + [1E-1])
+        volt_ranges = _closest_range([0.2, 2, 20, 200])
+        self.add_param("output_enabled", get_func=lambda: self._output, set_func=self._set_output)
+        self.add_param("source_mode", get_func=lambda: self._mode, set_func=self._set_mode)
+        self.add_param("source_current", get_func=lambda: self._set["CURR"], set_func=self._setter("_set", "CURR"))
+        self.add_param("source_voltage", get_func=lambda: self._set["VOLT"], set_func=self._setter("_set", "VOLT"))
+        self.add_param("source_current_compliance", get_func=lambda: self._compliance["CURR"],
+                       set_func=self._setter("_compliance", "CURR"))
+        self.add_param("source_voltage_compliance", get_func=lambda: self._compliance["VOLT"],
+                       set_func=self._setter("_compliance", "VOLT"))
+        self._ranges = {"CURR": 1E-6, "VOLT": 0.2}
+        self.add_param("source_current_range", get_func=lambda: self._ranges["CURR"],
+                       set_func=lambda v: self._ranges.update({"CURR": curr_ranges(v)}))
+        self.add_param("source_voltage_range", get_func=lambda: self._ranges["VOLT"],
+                       set_func=lambda v: self._ranges.update({"VOLT": volt_ranges(v)}))
+        self.add_param("source_delay", 0)
+        self.add_param("sense_mode", "CURR:DC")
+        self.add_param("sense_autorange", True)
+        self.add_param("sense_current_range", 1E-6)
+        self.add_param("sense_voltage_range", 2)
+        self.add_param("sense_resistance_range", 2E5)
+        self.add_param("sense_resistance_offset_comp_enabled", False)
+        self.add_param("autozero", "on")
+        self.add_param("nplc", 1)
+        self.add_param("filter_moving_enabled", False)
+        self.add_param("filter_moving", 10)
+        self.add_param("sense_current", get_func=lambda: self._measure("CURR"))
+        self.add_param("sense_voltage", get_func=lambda: self._measure("VOLT"))
+        self.add_param("sense_resistance", get_func=lambda: self._measure("RES"))
+
+
+class Sim2400(_SimKeithleySMU):
+    kind = "2400"
+
+    def __init__(self, name: str = "", address: str = "", **kwargs):
+        super().__init__(name, address)
+        self._ranges = {"CURR": 1E-6, "VOLT": 0.2}
+        curr_ranges = _closest_range([1E-6 * 10 ** i for i in range(7)])
+        volt_ranges = _closest_range([0.2, 2, 20, 200])
+        self.add_param("output", get_func=lambda: self._output, set_func=self._set_output)
+        self.add_param("mode", get_func=lambda: self._mode, set_func=self._set_mode)
+        self.add_param("sense", '"VOLT:DC","CURR:DC"')
+        self.add_param("rangei", get_func=lambda: self._ranges["CURR"],
+                       set_func=lambda v: self._ranges.update({"CURR": curr_ranges(v)}))
+        self.add_param("rangev", get_func=lambda: self._ranges["VOLT"],
+                       set_func=lambda v: self._ranges.update({"VOLT": volt_ranges(v)}))
+        self.add_param("compliancei", get_func=lambda: self._compliance["CURR"],
+                       set_func=self._setter("_compliance", "CURR"))
+        self.add_param("compliancev", get_func=lambda: self._compliance["VOLT"],
+                       set_func=self._setter("_compliance", "VOLT"))
+        # like the real 2400, the getter reads the measured value and the setter sets the source
+        self.add_param("curr", get_func=lambda: self._measure("CURR"), set_func=self._setter("_set", "CURR"))
+        self.add_param("volt", get_func=lambda: self._measure("VOLT"), set_func=self._setter("_set", "VOLT"))
+        self.add_param("resistance", get_func=lambda: self._measure("RES"))
+        self.add_param("nplcv", 1)
+        self.add_param("nplci", 1)
+
+
+class _SimSubmodule:
+    def __init__(self, parent: _SimQcodes):
+        self.kind = parent.kind
+
+    def add_param(self, name: str, value: Any = None, **kwargs) -> _SimParam:
+        param = _SimParam(self.kind, name, value, **kwargs)
+        setattr(self, name, param)
+        return param
+
+
+class Sim2450(_SimKeithleySMU):
+    kind = "2450"
+
+    def __init__(self, name: str = "", address: str = "", **kwargs):
+        super().__init__(name, address)
+        self._range = {"CURR": 1E-6, "VOLT": 0.2}
+        self._sense_function = "voltage"
+        func_name = {"CURR": "current", "VOLT": "voltage"}
+        self.add_param("output_enabled", get_func=lambda: self._output, set_func=self._set_output)
+        self.add_param("source_function", get_func=lambda: func_name[self._mode], set_func=self._set_mode)
+        self.add_param("sense_function", get_func=lambda: self._sense_function, set_func=self._set_sense_function)
+        self.add_param("terminals", "front")
+        self.source = _SimSubmodule(self)
+        self.source.add_param("function", get_func=lambda: func_name[self._mode], set_func=self._set_mode)
+        self.source.add_param("range", get_func=lambda: self._range[self._mode],
+                              set_func=lambda v: self._range.update({self._mode: abs(v)}))
+        self.source.add_param("auto_range", True)
+        self.source.add_param("limit", get_func=lambda: self._compliance["VOLT" if self._mode == "CURR" else "CURR"],
+                              set_func=lambda v: self._compliance.update(
+                                  {"VOLT" if self._mode == "CURR" else "CURR": v}))
+        self.source.add_param("current", get_func=lambda: self._set["CURR"], set_func=self._setter("_set", "CURR"))
+        self.source.add_param("voltage", get_func=lambda: self._set["VOLT"], set_func=self._setter("_set", "VOLT"))
+        self.sense = _SimSubmodule(self)
+        self.sense.add_param("function", get_func=lambda: self._sense_function, set_func=self._set_sense_function)
+        self.sense.add_param("range", 1)
+        self.sense.add_param("auto_range", True)
+        self.sense.add_param("auto_zero_enabled", True)
+        self.sense.add_param("nplc", 1)
+        self.sense._measure = self._measure_sense
+
+    def _set_sense_function(self, function: str) -> None:
+        self._sense_function = function
+
+    def _measure_sense(self) -> float:
+        SimBackend.delay(self.kind, "measure")
+        return self._measure({"current": "CURR", "voltage": "VOLT"}.get(self._sense_function, "RES"))
+
+
+"""
+Temperature controllers and magnet
+"""
+
+
+class SimITC503(_SimStateful):
+    kind = "itc503"
+    _defaults = {"control_mode": "RU", "front_panel_display": "temperature 1", "auto_pid": True,
+                 "proportional_band": 0, "integral_action_time": 0, "derivative_action_time": 0,
+                 "heater_gas_mode": "AM", "version": "ITC503 Version 1.1 (simulated)",
+                 "heater": 0, "heater_voltage": 0, "gasflow": 0}
+    tau: float = 30
+    """the relaxation time (simulated s) of the temperature"""
+    offsets: tuple[float, float, float] = (0, 0.05, 0.1)
+    """offsets of the three sensors to the controlled temperature"""
+
+    def __init__(self, address: str = "", clear_buffer: bool = True, **kwargs):
+        super().__init__(address)
+        self._temp = _Ramp(300, tau=self.tau)
+        # the last constructed ITC is considered as the one at the sample (the lower one for ITCs)
+        SimSample.itc = self
+
+    def sample_temperature(self) -> float:
+        return self._temp.value
+
+    @property
+    def temperature_setpoint(self) -> float:
+        SimBackend.delay(self.kind, "temperature_setpoint")
+        return self._temp.target
+
+    @temperature_setpoint.setter
+    def temperature_setpoint(self, temp: float):
+        SimBackend.delay(self.kind, "temperature_setpoint")
+        self._temp.set(temp)
+
+    def _sensor(self, idx: int) -> float:
+        SimBackend.delay(self.kind, f"temperature_{idx + 1}")
+        return SimBackend.add_temperature_noise(self._temp.value + self.offsets[idx])
+
+    @property
+    def temperature_1(self) -> float:
+        return self._sensor(0)
+
+    @property
+    def temperature_2(self) -> float:
+        return self._sensor(1)
+
+    @property
+    def temperature_3(self) -> float:
+        return self._sensor(2)
+
+
+class SimMercuryITC(_SimQcodes):
+    kind = "mercury_itc"
+    tau: float = 60
+    """the relaxation time (simulated s) of the probe temperature"""
+
+    def __init__(self, name: str = "mercury_itc", address: str = "", **kwargs):
+        super().__init__(name, address)
+        self._probe = _Ramp(300, tau=self.tau)
+        self._vti = _Ramp(300, tau=self.tau / 2)
+        self._ramp_rate = 5.0  # K/min
+        self._ramp_mode = "OFF"
+        self.add_param("probe_temp", get_func=lambda: SimBackend.add_temperature_noise(self._probe.value))
+        self.add_param("temp_setpoint", get_func=lambda: self._probe.target, set_func=self._probe.set)
+        self.add_param("vti_temp", get_func=lambda: SimBackend.add_temperature_noise(self._vti.value))
+        self.add_param("vti_temp_setpoint", get_func=lambda: self._vti.target, set_func=self._vti.set)
+        self.add_param("probe_ramp_rate", get_func=lambda: self._ramp_rate, set_func=self._set_ramp_rate)
+        self.add_param("probe_temp_ramp_mode", get_func=lambda: self._ramp_mode, set_func=self._set_ramp_mode)
+        self.add_param("vti_ramp_rate", 5.0)
+        self.add_param("vti_temp_ramp_mode", "OFF")
+        self._pressure = _Ramp(8, tau=10)
+        self.add_param("pressure", get_func=lambda: SimBackend.add_noise(self._pressure.value))
+        self.add_param("pressure_setpoint", get_func=lambda: self._pressure.target, set_func=self._pressure.set)
+        self.add_param("gas_flow", 20.0)
+        self.add_param("gas_flow_setpoint", 20.0)
+        self.add_param("probe_heater", 0)
+        self.add_param("vti_heater", 0)
+        for loop in ("temp", "vti_temp", "pres"):
+            self.add_param(f"{loop}_loop_P", 1.0)
+            self.add_param(f"{loop}_loop_I", 1.0)
+            self.add_param(f"{loop}_loop_D", 0.0)
+            self.add_param(f"{loop}_PID_control", "ON")
+            self.add_param(f"{loop}_PID_fromtable", "OFF")
+        SimSample.itc = self
+
+    def sample_temperature(self) -> float:
+        return self._probe.value
+
+    def _set_ramp_rate(self, rate: float) -> None:
+        self._ramp_rate = rate
+        self._apply_ramp()
+
+    def _set_ramp_mode(self, mode: str) -> None:
+        self._ramp_mode = mode
+        self._apply_ramp()
+
+    def _apply_ramp(self) -> None:
+        self._probe.rate = self._ramp_rate / 60 if self._ramp_mode == "ON" else np.inf
+
+    @property
+    def temp_PID(self) -> tuple:
+        return self.temp_loop_P(), self.temp_loop_I(), self.temp_loop_D()
+
+    @temp_PID.setter
+    def temp_PID(self, value: tuple):
+        self.temp_loop_P(value[0])
+        self.temp_loop_I(value[1])
+        self.temp_loop_D(value[2])
+
+    def calculate_vti_temp(self, probe_temp: float) -> float:
+        # same table as the real driver
+        vti_list = np.array([1.3, 1.5, 2, 4, 15, 40, 90, 190, 290])
+        probe_list = np.array([1.5, 1.7, 6, 10, 20, 50, 100, 200, 300])
+        return np.interp(probe_temp, probe_list, vti_list)
+
+
+class _SimIPSGroup(_SimSubmodule):
+    """
+    one axis of the Mercury iPS, the output of the power supply (leads) ramps linearly and
+    the magnet follows it only when the switch heater is on (otherwise it is persistent)
+    """
+
+    def __init__(self, parent: _SimQcodes):
+        super().__init__(parent)
+        self._leads = _Ramp(0, rate=0.2 / 60)
+        self._persistent = 0.0
+        self._heater = "OFF"
+        self._target = 0.0
+        self._action = "HOLD"
+        self.add_param("sw_heater", get_func=lambda: self._heater, set_func=self._set_heater)
+        self.add_param("field_target", get_func=lambda: self._target, set_func=self._set_target)
+        self.add_param("field_ramp_rate", get_func=lambda: self._leads.rate, set_func=self._set_rate)
+        self.add_param("field", get_func=lambda: SimBackend.add_field_noise(self._leads.value))
+        self.add_param("field_persistent", get_func=lambda: SimBackend.add_field_noise(self.magnet_field()))
+        self.add_param("current", get_func=lambda: self._leads.value * 10)
+        self.add_param("current_persistent", get_func=lambda: self.magnet_field() * 10)
+        self.add_param("voltage", 0.0)
+        self.add_param("ATOB", 10.0)
+        self.add_param("ramp_status", get_func=self._get_action, set_func=self._set_action)
+
+    def magnet_field(self) -> float:
+        if self._heater == "ON":
+            self._persistent = self._leads.value
+        return self._persistent
+
+    def _set_heater(self, switch: str) -> None:
+        self.magnet_field()  # freeze the magnet field at the moment of switching off
+        self._heater = switch
+
+    def _set_target(self, target: float) -> None:
+        self._target = target
+
+    def _set_rate(self, rate: float) -> None:
+        _ = self._leads.value
+        self._leads.rate = rate
+
+    def _get_action(self) -> str:
+        if self._action in ("TO SET", "TO ZERO") and not self._leads.ramping:
+            self._action = "HOLD"
+        return self._action
+
+    def _set_action(self, action: str) -> None:
+        self._action = action
+        if action == "TO SET":
+            self._leads.set(self._target)
+        elif action == "TO ZERO":
+            self._leads.set(0)
+        elif action in ("HOLD", "CLAMP"):
+            self._leads.set(self._leads.value)
+
+
+class SimMercuryiPS(_SimQcodes):
+    kind = "mercury_ips"
+
+    def __init__(self, name: str = "mips", address: str = "", **kwargs):
+        super().__init__(name, address)
+        self._limits: Callable[[float, float, float], bool] = lambda x, y, z: True
+        self.field_snapshot_ttl: float = 0.2
+        self._field_snapshot: Optional[dict[str, float]] = None
+        self._field_snapshot_time: float = -np.inf
+        for axis in ("X", "Y", "Z"):
+            group = _SimIPSGroup(self)
+            setattr(self, f"GRP{axis}", group)
+            self.add_param(f"{axis.lower()}_measured", get_func=group.field.get_raw)
+            self.add_param(f"{axis.lower()}_target", get_func=group.field_target.get_raw,
+                           set_func=self._target_setter(axis))
+        SimSample.ips = self
+
+    def sample_field(self) -> float:
+        return self.GRPZ.magnet_field()
+
+    def _target_setter(self, axis: str) -> Callable[[float], None]:
+        def set_target(value: float) -> None:
+            targets = {ax: getattr(self, f"GRP{ax}").field_target.get_raw() for ax in ("X", "Y", "Z")}
+            targets[axis] = value
+            if not self._limits(targets["X"], targets["Y"], targets["Z"]):
+                raise ValueError(f"Cannot set {axis} target to {value}, that would violate the field_limits.")
+            getattr(self, f"GRP{axis}").field_target.set(value)
+        return set_target
+
+    def field_snapshot(self, max_age: Optional[float] = None) -> dict[str, float]:
+        """
+        same as the driver, return the measured field (x, y, z) reusing the snapshot within max_age
+        """
+        if max_age is None:
+            max_age = self.field_snapshot_ttl
+        if self._field_snapshot is not None and time.perf_counter() - self._field_snapshot_time < max_age:
+            return self._field_snapshot
+        self._field_snapshot = {axis.lower(): getattr(self, f"GRP{axis}").field() for axis in ("X", "Y", "Z")}
+        self._field_snapshot_time = time.perf_counter()
+        return self._field_snapshot
+
+    @property
+    def field_snapshot_time(self) -> float:
+        return self._field_snapshot_time
+
+    def invalidate_field_snapshot(self) -> None:
+        self._field_snapshot = None
+        self._field_snapshot_time = -np.inf
+
+    def set_new_field_limits(self, limit_func: Callable[[float, float, float], bool]) -> None:
+        self._limits = limit_func
+
+    def ramp(self, mode: str = "safe") -> None:
+        SimBackend.delay(self.kind, "ramp")
+        for axis in ("X", "Y", "Z"):
+            getattr(self, f"GRP{axis}").ramp_status.set("TO SET")
+        self.invalidate_field_snapshot()
+
+    def is_ramping(self) -> bool:
+        return any(getattr(self, f"GRP{axis}").ramp_status.get_raw() != "HOLD" for axis in ("X", "Y", "Z"))
@@ -18,9 +18,12 @@ each wrapper provides the following methods(some only for source meters):
 - get_output_status: get the current output value
 - sense: set the meter to sense current or voltage
 - shutdown: shutdown the equipment
-- ramp_output: ramp the output to the target value
+- ramp_output: ramp the output to the target value (slew-rate limited, steps within safe_step)
 * the member "meter" is provided for directly accessing the equipment driver
 * the member "info_dict" is provided for storing the information of the equipment
+* all wrappers accept sim=True (or env PYLAB_SIMULATE=1) to use the simulated drivers in drivers/simulated.py
+* the wrappers of the slowly varying instruments (iPS, ITCs) serialize the instrument access with the member "lock",
+    so the background loggers (slow_logger.py) and the main thread do not interleave queries on the same session
 
 Flow:
     Wrapperxxxx(GPIB)
@@ -33,23 +36,32 @@ Actions that can be optimized for quicker operation:
 - switch operation
 - range and compliance setting
 """
+import functools
+import threading
 import time
 from typing import Literal, Optional, Tuple, Any
 from abc import ABC, abstractmethod
 
 import numpy as np
-from pymeasure.instruments.srs import SR830
-from pymeasure.instruments.oxfordinstruments import ITC503
-from pymeasure.instruments.keithley import KeithleyDMM6500
-from pymeasure.instruments.keithley import Keithley2182
-from qcodes.instrument_drivers.Keithley import Keithley2400, Keithley2450
 
-from .drivers.MercuryiPS_VISA import OxfordMercuryiPS
-from .drivers.mercuryITC import MercuryITC
-from .drivers.Keithley_6430 import Keithley_6430
-from .drivers.keithley6221 import Keithley6221
+# the instrument drivers (pymeasure / qcodes) are imported when the instruments are loaded
+from .drivers import simulated
+from .stability import StabilityDetector
+from .temp_planner import ThermalPlanner
 
-from .constants import convert_unit, print_progress_bar, switch_dict
+from .constants import convert_unit, print_progress_bar, switch_dict, is_simulated
+
+
+def _locked(method):
+    """
+    hold the instrument lock of the wrapper (self.lock) during the method, only used for the short queries /
+    settings, the waiting loops take the lock per query so the background loggers can still read in between
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class Meter(ABC):
@@ -63,11 +75,28 @@ class Meter(ABC):
     LAST. shutdown method
     """
 
+    line_freq: float = 50
+    """the power line frequency (Hz), used to convert the nplc into time"""
+    last_source_change: float = -np.inf
+    """the time (time.perf_counter) of the last source change, shared by all meters"""
+
     @abstractmethod
     def __init__(self):
         self.info_dict = {}
         self.meter = None
 
+    @staticmethod
+    def mark_source_change() -> None:
+        """record the time of a source change (called after setting any source)"""
+        Meter.last_source_change = time.perf_counter()
+
+    def settle_time(self) -> float:
+        """
+        the time (s) needed after a source change for a reading to reflect the new value,
+        computed from the cached configuration (info_dict), 0.03 s if not modelled for the meter
+        """
+        return 0.03
+
     @abstractmethod
     def setup(self, function: Literal["sense", "source"], *vargs, **kwargs):
         pass
@@ -81,8 +110,17 @@ class Meter(ABC):
     def info_sync(self):
         self.info_dict.update({})
 
-    def sense_delay(self, type_str: Literal["curr", "volt"], *, delay: float = 0.03):
-        time.sleep(delay)
+    def sense_delay(self, type_str: Literal["curr", "volt"], *, delay: Optional[float] = None):
+        """
+        sense after the settle time has passed since the last source change (only the remaining time is waited)
+
+        Args:
+            delay (float): a fixed delay (s) before sensing, overwrite the settle time if given
+        """
+        if delay is None:
+            delay = self.settle_time() - (time.perf_counter() - Meter.last_source_change)
+        if delay > 0:
+            time.sleep(delay)
         return self.sense(type_str=type_str)
 
     @abstractmethod
@@ -97,12 +135,17 @@ class Meter(ABC):
 
 
 class SourceMeter(Meter):
+    ramp_step_time: float = 0.02
+    """the time spent on each safe_step during a ramp when no rate is given"""
+
     @abstractmethod
     def __init__(self):
         super().__init__()
         self.info_dict.update({"output_type": "curr"})
         self.output_target = 0
         self.safe_step = 1E-6  # step threshold, used for a default ramp
+        self.ramp_rate = None  # slew rate (A/s or V/s, or dict for both) for ramp_output, None for safe_step / ramp_step_time
+        self._ramp_cache = {}
 
     @abstractmethod
     def output_switch(self, switch: bool | Literal["on", "off", "ON", "OFF"]):
@@ -145,18 +188,23 @@ class SourceMeter(Meter):
         self.meter.__del__()
 
     def ramp_output(self, type_str: Literal["curr", "volt", "V", "I"], value: float | str, *, freq: Optional[float | str] = None,
-                    compliance: Optional[float | str] = None, interval: Optional[float | str] = None, sleep=0.2, from_curr=True, no_progress=False) -> None:
+                    compliance: Optional[float | str] = None, interval: Optional[float | str] = None,
+                    rate: Optional[float | str] = None, sleep: Optional[float] = None, from_curr=True,
+                    no_progress=False) -> None:
         """
-        ramp the output to the target value
+        ramp the output to the target value with a limited slew rate, each step is no larger than
+        the interval (default to safe_step). The first and last steps go through uni_output (range,
+        compliance, etc.), the steps in between only push the value if the meter supports it (_push_value),
+        so pass the compliance explicitly to get the fast path for dc sources
 
         Args:
             type_str: "curr" or "volt"
             value: the target value
             freq: the frequency of the output (if ac)
-            interval: the step interval between each step
-            sleep: the time interval(s) between each step
-            value: the target value
             compliance: the compliance value
+            interval: the max step between each step, default to safe_step
+            rate: the slew rate (A/s or V/s), default to ramp_rate (or safe_step / ramp_step_time)
+            sleep: (overwrite rate if given) the fixed time interval(s) between each step
             from_curr: whether to ramp from the current value(default) or from 0
             no_progress: whether to suppress the progress bar
         """
@@ -170,25 +218,59 @@ class SourceMeter(Meter):
         curr_val = self.get_output_status()[0]
         if curr_val == value:
             self.uni_output(value, freq=freq, type_str=type_str, compliance=compliance)
+            self.mark_source_change()
             return
+
+        safe_step = self.safe_step[type_str] if isinstance(self.safe_step, dict) else self.safe_step
         if interval is None:
-            if abs(curr_val - value) > 20:
-                arr = np.arange(curr_val, value, 0.2*np.sign(value - curr_val))
-            else:
-                arr = np.linspace(curr_val, value, 70)
-        elif isinstance(interval, (float, str)):
-            interval = convert_unit(interval, "")[0]
-            interval = abs(interval) * np.sign(value - curr_val)
-            arr = np.arange(curr_val, value, interval)
-            arr = np.concatenate((arr, [value]))
+            step = safe_step
+        elif isinstance(interval, (float, int, str)):
+            step = abs(convert_unit(interval, "")[0])
         else:
             raise ValueError("interval should be a float or str or just left as default")
+        if rate is None:
+            rate = self.ramp_rate[type_str] if isinstance(self.ramp_rate, dict) else self.ramp_rate
+            if rate is None:
+                rate = safe_step / self.ramp_step_time
+        rate = abs(convert_unit(rate, "")[0])
+        if self._native_ramp(type_str, value, rate=rate, freq=freq, compliance=compliance):
+            self.mark_source_change()
+            return
 
+        n_steps = max(int(np.ceil(abs(value - curr_val) / step - 1E-9)), 1)
+        arr = np.linspace(curr_val, value, n_steps + 1)[1:]
+        step_time = sleep if sleep is not None else abs(value - curr_val) / rate / n_steps
+        self._ramp_cache = {}
+        deadline = time.perf_counter()
         for idx, i in enumerate(arr):
-            self.uni_output(i, freq=freq, type_str=type_str, compliance=compliance)
-            if not no_progress:
-                print_progress_bar((idx + 1) / len(arr) * 100, 100, prefix="Ramping Meter:")
-            time.sleep(sleep)
+            if idx == 0 or idx == n_steps - 1 or not self._push_value(i, type_str=type_str, freq=freq,
+                                                                       compliance=compliance):
+                self.uni_output(i, freq=freq, type_str=type_str, compliance=compliance)
+                self._ramp_cache = {}  # range etc. may be changed by uni_output
+            if not no_progress and n_steps > 1:
+                print_progress_bar((idx + 1) / n_steps * 100, 100, prefix="Ramping Meter:")
+            if idx < n_steps - 1:
+                # pace against the deadline so that the bus latency is counted in the step time
+                deadline += step_time
+                time.sleep(max(deadline - time.perf_counter(), 0))
+        self.mark_source_change()
+
+    def _push_value(self, value: float, *, type_str: Literal["curr", "volt"], freq: Optional[float | str] = None,
+                    compliance: Optional[float | str] = None) -> bool:
+        """
+        only set the output value without any range/compliance/mode check, used for the middle steps of
+        ramp_output. Return False if the value cannot be pushed directly (then uni_output will be used).
+        self._ramp_cache can be used to store the range etc. read once per ramp
+        """
+        return False
+
+    def _native_ramp(self, type_str: Literal["curr", "volt"], value: float, *, rate: float,
+                     freq: Optional[float | str] = None, compliance: Optional[float | str] = None) -> bool:
+        """
+        ramp the output with the ramp/sweep function of the instrument itself, return False if not supported
+        (then the ramp is done step by step by ramp_output)
+        """
+        return False
 
 
 class ACSourceMeter(SourceMeter):
@@ -222,9 +304,13 @@ class Wrapper6221(ACSourceMeter, DCSourceMeter):
     shutdown()
     """
 
-    def __init__(self, GPIB: str = "GPIB0::12::INSTR"):
+    def __init__(self, GPIB: str = "GPIB0::12::INSTR", *, sim: Optional[bool] = None):
         super().__init__()
-        self.meter = Keithley6221(GPIB)
+        if is_simulated(sim):
+            self.meter = simulated.Sim6221(GPIB)
+        else:
+            from .drivers.keithley6221 import Keithley6221
+            self.meter = Keithley6221(GPIB)
         self.output_target = 0
         self.safe_step = 1E-6
         self.info_dict = {"GPIB": GPIB,
@@ -383,6 +469,25 @@ class Wrapper6221(ACSourceMeter, DCSourceMeter):
             self.meter.delta_start()
             return self.meter.delta_high_source
 
+    def _push_value(self, value: float, *, type_str: Literal["curr", "volt"], freq: Optional[float | str] = None,
+                    compliance: Optional[float | str] = None) -> bool:
+        if self.mea_mode != "normal" or not self.info_dict["output_status"] or value == 0:
+            return False
+        if "range" not in self._ramp_cache:
+            self._ramp_cache["range"] = self.meter.source_range
+        range_curr = self._ramp_cache["range"]
+        if abs(range_curr) * 1.05 <= abs(value) or abs(value) <= abs(range_curr) / 100:
+            return False
+        if self.info_dict["ac_dc"] == "ac" and freq is not None and freq == self.info_dict["frequency"]:
+            self.meter.waveform_amplitude = value * np.sqrt(2)
+        elif self.info_dict["ac_dc"] == "dc" and freq is None and compliance is not None:
+            # compliance is fixed during the ramp, the auto compliance scales with the value
+            self.meter.source_current = value
+        else:
+            return False
+        self.output_target = value
+        return True
+
     def rms_output(self, value: float | str, *, freq: Optional[float | str] = None, compliance: Optional[float | str] = None,
                    type_str: Literal["curr"] = "curr"):
         """
@@ -465,19 +570,24 @@ class Wrapper2182(Meter):
     sense()
     """
 
-    def __init__(self, GPIB: str = "GPIB0::7::INSTR"):
+    def __init__(self, GPIB: str = "GPIB0::7::INSTR", *, sim: Optional[bool] = None):
         super().__init__()
-        self.meter = Keithley2182(GPIB, read_termination="\n")
-        self.setup()
+        if is_simulated(sim):
+            self.meter = simulated.Sim2182(GPIB)
+        else:
+            from pymeasure.instruments.keithley import Keithley2182
+            self.meter = Keithley2182(GPIB, read_termination="\n")
         self.info_dict = {"GPIB": GPIB,
                           "channel": 1,
                           "sense_type": "volt"}
+        self.setup()
 
-    def setup(self, function: Literal["sense"] = "sense", *, channel: Literal[0, 1, 2] = 1) -> None:
+    def setup(self, function: Literal["sense"] = "sense", *, channel: Literal[0, 1, 2] = 1, nplc: float = 5) -> None:
         self.meter.reset()
         self.meter.active_channel = channel
         self.meter.channel_function = "voltage"
-        self.meter.voltage_nplc = 5
+        self.meter.voltage_nplc = nplc
+        self.info_dict.update({"channel": channel, "nplc": nplc})
         # source_2182.sample_continuously()
         # source_2182.ch_1.voltage_offset_enabled = True
         # source_2182.ch_1.acquire_voltage_reference()
@@ -489,6 +599,10 @@ class Wrapper2182(Meter):
         """
         pass
 
+    def settle_time(self) -> float:
+        """one integration period (the reading in progress at the source change is not settled)"""
+        return self.info_dict["nplc"] / self.line_freq
+
     def sense(self, type_str: Literal["volt"] = "volt") -> float:
         return self.meter.voltage
 
@@ -502,9 +616,13 @@ class Wrapper6500(Meter):
     sense()
     """
 
-    def __init__(self, GPIB: str = "GPIB0::16::INSTR"):
+    def __init__(self, GPIB: str = "GPIB0::16::INSTR", *, sim: Optional[bool] = None):
         super().__init__()
-        self.meter = KeithleyDMM6500(GPIB)
+        if is_simulated(sim):
+            self.meter = simulated.Sim6500(GPIB)
+        else:
+            from pymeasure.instruments.keithley import KeithleyDMM6500
+            self.meter = KeithleyDMM6500(GPIB)
         self.setup("sense")
         self.info_dict = {"GPIB": GPIB,
                           "channel": 1,
@@ -562,9 +680,13 @@ class Wrapper6500(Meter):
 
 
 class WrapperSR830(ACSourceMeter):
-    def __init__(self, GPIB: str = "GPIB0::8::INSTR", reset=True):
+    def __init__(self, GPIB: str = "GPIB0::8::INSTR", reset=True, *, sim: Optional[bool] = None):
         super().__init__()
-        self.meter = SR830(GPIB)
+        if is_simulated(sim):
+            self.meter = simulated.SimSR830(GPIB)
+        else:
+            from pymeasure.instruments.srs import SR830
+            self.meter = SR830(GPIB)
         self.output_target = 0
         self.info_dict = {"GPIB": GPIB}
         self.safe_step = 2E-3
@@ -640,6 +762,13 @@ class WrapperSR830(ACSourceMeter):
             self.meter.harmonic = harmonic
         self.info_sync()
 
+    settle_tau = {6: 5, 12: 7, 18: 9, 24: 10}
+    """the number of time constants to settle within 1% for each filter slope (dB/oct)"""
+
+    def settle_time(self) -> float:
+        """the time constant multiplied by the settling factor of the filter slope"""
+        return self.info_dict["time_constant"] * self.settle_tau.get(int(self.info_dict["filter_slope"]), 10)
+
     def sense(self, type_str: Literal["volt", "curr"] = "volt") -> list:
         return self.meter.snap("X", "Y", "R", "THETA")
 
@@ -668,6 +797,15 @@ class WrapperSR830(ACSourceMeter):
         self.output_target = convert_unit(value, "V")[0]
         return self.get_output_status()[0]
 
+    def _push_value(self, value: float, *, type_str: Literal["curr", "volt"], freq: Optional[float | str] = None,
+                    compliance: Optional[float | str] = None) -> bool:
+        if type_str != "volt" or (freq is not None and freq != self.info_dict["frequency"]):
+            return False
+        self.meter.sine_voltage = value
+        self.info_dict["output_value"] = value
+        self.output_target = value
+        return True
+
     def rms_output(self, value: float | str, *, freq: Optional[float | str] = None, compliance: Optional[float | str] = None,
                    type_str: Literal["volt"] = "volt"):
         assert type_str == "volt", "SR830 is a voltage source, so the output is always voltage"
@@ -685,9 +823,13 @@ class WrapperSR830(ACSourceMeter):
 
 
 class Wrapper6430(DCSourceMeter):
-    def __init__(self, GPIB: str = "GPIB0::26::INSTR"):
+    def __init__(self, GPIB: str = "GPIB0::26::INSTR", *, sim: Optional[bool] = None):
         super().__init__()
-        self.meter = Keithley_6430("Keithley6430", GPIB)
+        if is_simulated(sim):
+            self.meter = simulated.Sim6430("Keithley6430", GPIB)
+        else:
+            from .drivers.Keithley_6430 import Keithley_6430
+            self.meter = Keithley_6430("Keithley6430", GPIB)
         self.info_dict = {}
         self.output_target = 0
         self.safe_step = {"volt": 2E-1, "curr": 5E-6}
@@ -709,8 +851,15 @@ class Wrapper6430(DCSourceMeter):
             "sense_resist_range": self.meter.sense_resistance_range(),
             "sense_resist_offset_comp": self.meter.sense_resistance_offset_comp_enabled(),
             "autozero": self.meter.autozero(),
+            "nplc": self.meter.nplc(),
+            "filter_moving": self.meter.filter_moving() if self.meter.filter_moving_enabled() else 1,
         })
 
+    def settle_time(self) -> float:
+        """the source delay and the integration periods filled by the moving average filter"""
+        return (self.info_dict["source_delay"]
+                + self.info_dict["nplc"] * self.info_dict["filter_moving"] / self.line_freq)
+
     def setup(self, function: Literal["sense", "source"] = "sense", *, auto_zero: str = "on"):
         if function == "source":
             self.meter.reset()
@@ -762,6 +911,21 @@ class Wrapper6430(DCSourceMeter):
         self.output_target = convert_unit(value, "")[0]
         return self.get_output_status()[0]
 
+    def _push_value(self, value: float, *, type_str: Literal["curr", "volt"], freq: Optional[float | str] = None,
+                    compliance: Optional[float | str] = None) -> bool:
+        # compliance is fixed during the ramp, the auto compliance scales with the value
+        if (compliance is None or value == 0 or self.info_dict["output_type"] != type_str
+                or not self.info_dict["output_status"]):
+            return False
+        if type_str not in self._ramp_cache:
+            self._ramp_cache[type_str] = {"curr": self.meter.source_current_range, "volt": self.meter.source_voltage_range}[type_str]()
+        range_curr = self._ramp_cache[type_str]
+        if abs(value) <= range_curr / 100 or abs(value) >= range_curr:
+            return False
+        {"curr": self.meter.source_current, "volt": self.meter.source_voltage}[type_str](value)
+        self.output_target = value
+        return True
+
     def dc_output(self, value: float | str, *, compliance: Optional[float | str] = None,
                   fix_range: Optional[float | str] = None, type_str: Literal["curr", "volt"]):
         value = convert_unit(value, "")[0]
@@ -818,9 +982,13 @@ class Wrapper6430(DCSourceMeter):
 
 
 class Wrapper2400(DCSourceMeter):
-    def __init__(self, GPIB: str = "GPIB0::24::INSTR"):
+    def __init__(self, GPIB: str = "GPIB0::24::INSTR", *, sim: Optional[bool] = None):
         super().__init__()
-        self.meter = Keithley2400("Keithley2401", GPIB)
+        if is_simulated(sim):
+            self.meter = simulated.Sim2400("Keithley2401", GPIB)
+        else:
+            from qcodes.instrument_drivers.Keithley import Keithley2400
+            self.meter = Keithley2400("Keithley2401", GPIB)
         self.info_dict = {}
         self.output_target = 0
         self.safe_step = {"volt": 1E-2, "curr": 2E-6}
@@ -837,8 +1005,13 @@ class Wrapper2400(DCSourceMeter):
             "sense_curr_range": self.meter.rangei(),
             "sense_volt_range": self.meter.rangev(),
             "sense_type": self.meter.sense().lower(),
+            "nplc": max(self.meter.nplcv(), self.meter.nplci()),
         })
 
+    def settle_time(self) -> float:
+        """one integration period"""
+        return self.info_dict["nplc"] / self.line_freq
+
     def setup(self, function: Literal["sense", "source"] = "sense", reset: bool = False):
         self.meter.write("*CLS")
         self.meter.write(":TRAC:FEED:CONT NEV")  # disables data buffer
@@ -888,6 +1061,21 @@ class Wrapper2400(DCSourceMeter):
         self.output_target = convert_unit(value, "")[0]
         return self.get_output_status()[0]
 
+    def _push_value(self, value: float, *, type_str: Literal["curr", "volt"], freq: Optional[float | str] = None,
+                    compliance: Optional[float | str] = None) -> bool:
+        # compliance is fixed during the ramp, the auto compliance scales with the value
+        if (compliance is None or value == 0 or self.info_dict["output_type"] != type_str
+                or not self.info_dict["output_status"]):
+            return False
+        if type_str not in self._ramp_cache:
+            self._ramp_cache[type_str] = {"curr": self.meter.rangei, "volt": self.meter.rangev}[type_str]()
+        range_curr = self._ramp_cache[type_str]
+        if abs(value) <= range_curr / 100 or abs(value) >= range_curr:
+            return False
+        {"curr": self.meter.curr, "volt": self.meter.volt}[type_str](value)
+        self.output_target = value
+        return True
+
     def dc_output(self, value: float | str, *, fix_range: Optional[float | str] = None,
                   compliance: Optional[float | str] = None, type_str: Literal["curr", "volt"]):
         value = convert_unit(value, "")[0]
@@ -946,12 +1134,16 @@ class Wrapper2400(DCSourceMeter):
 
 class Wrapper2450(DCSourceMeter):
     ##TODO: not tested yet
-    def __init__(self, GPIB: str = "GPIB0::18::INSTR"):
+    def __init__(self, GPIB: str = "GPIB0::18::INSTR", *, sim: Optional[bool] = None):
         super().__init__()
-        try:
-            self.meter = Keithley2450("Keithley2450", GPIB)
-        except:
-            self.meter = Keithley2450("Keithley2450_2", GPIB)
+        if is_simulated(sim):
+            self.meter = simulated.Sim2450("Keithley2450", GPIB)
+        else:
+            from qcodes.instrument_drivers.Keithley import Keithley2450
+            try:
+                self.meter = Keithley2450("Keithley2450", GPIB)
+            except:
+                self.meter = Keithley2450("Keithley2450_2", GPIB)
         self.info_dict = {}
         self.output_target = 0
         self.safe_step = {"volt": 1E-2, "curr": 2E-6}
@@ -966,8 +1158,13 @@ class Wrapper2450(DCSourceMeter):
             "sense_range": self.meter.sense.range(),
             "sense_type": self.meter.sense_function().lower().replace("current", "curr").replace("voltage", "volt").replace("resistance", "resist"),
             "sense_autozero": self.meter.sense.auto_zero_enabled(),
+            "nplc": self.meter.sense.nplc(),
         })
 
+    def settle_time(self) -> float:
+        """one integration period"""
+        return self.info_dict["nplc"] / self.line_freq
+
     def setup(self, function: Literal["sense", "source"] = "sense"):
         if function == "source":
             self.meter.reset()
@@ -1013,6 +1210,21 @@ class Wrapper2450(DCSourceMeter):
         self.output_target = convert_unit(value, "")[0]
         return self.get_output_status()[0]
 
+    def _push_value(self, value: float, *, type_str: Literal["curr", "volt"], freq: Optional[float | str] = None,
+                    compliance: Optional[float | str] = None) -> bool:
+        # compliance is fixed during the ramp, the auto compliance scales with the value
+        if (compliance is None or value == 0 or self.info_dict["output_type"] != type_str
+                or not self.info_dict["output_status"]):
+            return False
+        if type_str not in self._ramp_cache:
+            self._ramp_cache[type_str] = {"curr": self.meter.source.range, "volt": self.meter.source.range}[type_str]()
+        range_curr = self._ramp_cache[type_str]
+        if abs(value) <= range_curr / 100 or abs(value) >= range_curr:
+            return False
+        {"curr": self.meter.source.current, "volt": self.meter.source.voltage}[type_str](value)
+        self.output_target = value
+        return True
+
     def dc_output(self, value: float | str, *, fix_range: Optional[float | str] = None,
                   compliance: Optional[float | str] = None, type_str: Literal["curr", "volt"]):
         value = convert_unit(value, "")[0]
@@ -1105,9 +1317,18 @@ class Magnet(ABC):
 class WrapperIPS(Magnet):
     """
     Wrapper for MercuryIPS (only z axis magnetic field is considered)
+
+    The wrapper tracks the state of the magnet (switch heater, lead field vs persistent field and the ramp
+    status of GRPZ) so that:
+    - the heater is only switched (and waited for) when the field really needs to change
+    - the leads are matched to the persistent field before the heater is switched on
+    - the end of a ramp is judged by the HOLD status of the controller instead of polling the field
+    - the magnet can optionally be left persistent (leads to zero) between distant points
     """
     def __init__(self, address: str = "TCPIP0::10.97.24.237::7020::SOCKET",
-                 if_print: bool = False, limit_sphere: float = 11) -> None:
+                 if_print: bool = False, limit_sphere: float = 11, *, field_ttl: float = 0.2,
+                 heater_wait: float = 310, heater_off_wait: float = 60,
+                 sim: Optional[bool] = None) -> None:
         """
         load Mercury iPS instrument according to the address, store it in self.instrs["ips"]
 
@@ -1115,8 +1336,25 @@ class WrapperIPS(Magnet):
             address (str): the address of the instrument
             if_print (bool): whether to print the snapshot of the instrument
             limit_sphere (float): the limit of the field
-        """
-        self.ips = OxfordMercuryiPS("mips", address)
+            field_ttl (float): the max age (s) of the cached field reading, readings within it share one query
+            heater_wait (float): the time (s) for the switch heater to open after switched on
+            heater_off_wait (float): the time (s) for the switch to close after the heater switched off
+            sim (bool): whether to use the simulated instrument (default to env PYLAB_SIMULATE)
+        """
+        self.lock = threading.RLock()
+        """serialize the instrument access of the main thread and the background loggers"""
+        if is_simulated(sim):
+            self.ips = simulated.SimMercuryiPS("mips", address)
+        else:
+            from .drivers.MercuryiPS_VISA import OxfordMercuryiPS
+            self.ips = OxfordMercuryiPS("mips", address)
+        self.ips.field_snapshot_ttl = field_ttl
+        self.heater_wait = heater_wait
+        self.heater_off_wait = heater_off_wait
+        # the heater is regarded as settled if it is found on/off at the beginning
+        self._heater_switch_time = -np.inf
+        self._heater_on: bool = False
+        self.sw_heater()
         if if_print:
             self.ips.print_readable_snapshot(update=True)
 
@@ -1126,13 +1364,19 @@ class WrapperIPS(Magnet):
         self.ips.set_new_field_limits(spherical_limit)
 
     @property
+    @_locked
     def field(self) -> float | tuple[float]:
         """
-        return the current field of the magnet (only z direction considered)
+        return the current field of the magnet (only z direction considered),
+        the persistent field if the heater is off, otherwise the field of the leads
+        (readings within field_ttl share one snapshot of all axes)
         """
-        return self.ips.z_measured()
+        if not self._heater_on:
+            return self.ips.GRPZ.field_persistent()
+        return self.ips.field_snapshot()["z"]
 
     @property
+    @_locked
     def field_set(self) -> float | tuple[float]:
         """
         set the target field (only z direction considered)
@@ -1140,6 +1384,7 @@ class WrapperIPS(Magnet):
         return self.ips.z_target()
 
     @field_set.setter
+    @_locked
     def field_set(self, field: float | tuple[float]) -> None:
         """
         set the target field (only z direction considered)
@@ -1148,9 +1393,11 @@ class WrapperIPS(Magnet):
         fieldz_target = field if isinstance(field, (float, int)) else field[2]
         self.ips.z_target(fieldz_target)
 
+    @_locked
     def sw_heater(self, switch: Optional[bool | Literal["on", "off", "ON", "OFF"]] = None) -> Optional[bool]:
         """
-        switch the heater of the magnet
+        switch the heater of the magnet (the switching time is recorded for the heater waiting)
+        or return the heater status if switch is None
         """
         if switch is not None:
             switch = switch_dict.get(switch, False) if isinstance(switch, str) else switch
@@ -1158,18 +1405,106 @@ class WrapperIPS(Magnet):
                 self.ips.GRPZ.sw_heater("ON")
             else:
                 self.ips.GRPZ.sw_heater("OFF")
+            if switch != self._heater_on:
+                self._heater_switch_time = time.monotonic()
+            self._heater_on = switch
             print("Heater switched", "on" if switch else "off")
         else:
             match self.ips.GRPZ.sw_heater():
                 case "ON" | "on" | True:
-                    return True
+                    self._heater_on = True
                 case "OFF" | "off" | False:
-                    return False
+                    self._heater_on = False
                 case _:
                     raise ValueError("The heater status is not recognized")
+            return self._heater_on
+
+    @_locked
+    def magnet_state(self) -> dict:
+        """
+        return the state of the magnet: heater (bool), leads (T), persistent (T), status (ramp status)
+        and heater_settled (whether the heater waiting since the last switching is over)
+        """
+        heater = self.sw_heater()
+        wait = self.heater_wait if heater else self.heater_off_wait
+        return {"heater": heater, "leads": self.ips.GRPZ.field(), "persistent": self.ips.GRPZ.field_persistent(),
+                "status": self.status, "heater_settled": time.monotonic() - self._heater_switch_time >= wait}
+
+    def _wait_heater(self) -> None:
+        """
+        wait for the rest of the heater waiting time since the last switching
+        """
+        wait = self.heater_wait if self._heater_on else self.heater_off_wait
+        remain = wait - (time.monotonic() - self._heater_switch_time)
+        if remain <= 0:
+            return
+        total = int(np.ceil(remain))
+        prefix = "waiting for heater" if self._heater_on else "waiting for switch closing"
+        t_end = time.monotonic() + remain
+        for i in range(total):
+            print_progress_bar(i + 1, total, prefix=prefix)
+            time.sleep(max(min(1, t_end - time.monotonic()), 0))
+
+    def _wait_hold(self, expected: float, *, check_interval: float = 1, timeout: Optional[float] = None) -> bool:
+        """
+        wait until the ramp status of the controller turns to HOLD, the progress is estimated by time
+
+        Args:
+            expected (float): the expected time (s) of the ramp
+            check_interval (float): the interval (s) to check the status
+            timeout (float): the max time to wait, default to 2 * expected + 60 s
+        Returns:
+            bool: whether HOLD is reached before timeout
+        """
+        if timeout is None:
+            timeout = 2 * expected + 60
+        t_start = time.monotonic()
+        while True:
+            elapsed = time.monotonic() - t_start
+            if self.status == "HOLD":
+                print_progress_bar(100, 100, prefix="Ramping magnet")
+                return True
+            if elapsed > timeout:
+                print(f"ramp status not HOLD after {timeout:.0f} s")
+                return False
+            print_progress_bar(min(elapsed / expected * 100, 99.9) if expected > 0 else 99.9, 100,
+                               prefix="Ramping magnet", suffix=f"{elapsed:.0f}/{expected:.0f} s")
+            time.sleep(check_interval)
+
+    def _ramp_leads(self, field: float, rate_per_min: float, *, wait: bool = True, tolerance: float = 1e-3) -> None:
+        """
+        ramp the output of the power supply (the magnet follows only when the heater is on)
+        """
+        with self.lock:
+            self.ips.GRPZ.field_ramp_rate(rate_per_min / 60)
+            start = self.ips.GRPZ.field()
+            self.field_set = field
+            self.ips.ramp(mode="simul")
+        if wait:
+            expected = abs(field - start) / rate_per_min * 60
+            timeout = 2 * expected + 60
+            t_start = time.monotonic()
+            held = self._wait_hold(expected, timeout=timeout)
+            # the ramp status can not be trusted (e.g. HOLD / CLAMP before the target), wait for the field itself
+            # within the same timeout
+            field_now = self._read_leads()
+            if held and abs(field_now - field) >= tolerance:
+                print("HOLD reached but the field is not at the target, waiting")
+            while abs(field_now - field) >= tolerance:
+                if time.monotonic() - t_start > timeout:
+                    raise RuntimeError(f"the field ({field_now} T) did not reach the target {field} T "
+                                       f"within {timeout:.0f} s, check the magnet")
+                time.sleep(1)
+                field_now = self._read_leads()
+
+    @_locked
+    def _read_leads(self) -> float:
+        """read the field of the leads (a fresh query)"""
+        return self.ips.field_snapshot(max_age=0)["z"]
 
     #=======suitable for Z-axis only ips========
     @property
+    @_locked
     def status(self) -> Literal["HOLD", "TO SET", "CLAMP", "TO ZERO"]:
         """
         return the status of the magnet
@@ -1177,6 +1512,7 @@ class WrapperIPS(Magnet):
         return self.ips.GRPZ.ramp_status()
 
     @status.setter
+    @_locked
     def status(self, status: Literal["HOLD", "TO SET", "CLAMP", "TO ZERO"]) -> None:
         """
         set the status of the magnet
@@ -1186,7 +1522,7 @@ class WrapperIPS(Magnet):
 
     def ramp_to_field(self, field: float | int | tuple[float] | list[float], *,
                       rate: float | tuple[float] = (0.2,) * 3, wait: bool = True,
-                      tolerance: float = 1e-3) -> None:
+                      tolerance: float = 1e-3, leave_persistent: bool = False) -> None:
         """
         ramp the magnetic field to the target value with the rate, current the field is only in Z direction limited by the actual instrument setting
         (currently only B_z can be ramped)
@@ -1196,50 +1532,58 @@ class WrapperIPS(Magnet):
             rate (float): the rate of the field change (T/min)
             wait (bool): whether to wait for the ramping to finish
             tolerance (float): the tolerance of the field (T)
+            leave_persistent (bool): (only if wait) whether to switch off the heater and ramp the leads to zero
+                after reaching the target, useful for long measurements at a fixed field
         """
-        if not self.sw_heater():
-            self.sw_heater("on")
-            for i in range(310):
-                print_progress_bar(i, 310, prefix="waiting for heater")
-                time.sleep(1)
-        else:
-            pass
-
-        if abs(self.field_set - field) < tolerance:
-            return
-        if isinstance(rate, (float,int)):
+        field = field if isinstance(field, (float, int)) else field[2]
+        if isinstance(rate, (float, int)):
             assert rate <= 0.2, "The rate is too high, the maximum rate is 0.2 T/min"
-            self.ips.GRPZ.field_ramp_rate(rate/60)
+            rate_z = rate
         else:
             assert max(rate) <= 0.2, "The rate is too high, the maximum rate is 0.2 T/min"
-            self.ips.GRPZ.field_ramp_rate(rate[2]/60)
+            rate_z = rate[2]
         #self.ips.GRPX.field_ramp_rate(rate[0]/60)
         #self.ips.GRPY.field_ramp_rate(rate[1]/60)
         # no x and y field for now (see the setter method for details)
-        self.field_set = field
 
-        self.ips.ramp(mode="simul")
+        state = self.magnet_state()
+        if not state["heater"]:
+            if abs(state["persistent"] - field) < tolerance:
+                # the magnet is already persistent at the target, no need to touch the heater
+                return
+            # match the leads to the persistent field before opening the switch
+            if abs(state["leads"] - state["persistent"]) >= tolerance:
+                self._wait_heater()  # the switch must be closed before the leads change
+                print("matching the leads to the persistent field")
+                self._ramp_leads(state["persistent"], 0.2, tolerance=tolerance)
+            self.sw_heater("on")
+        elif abs(self.field_set - field) < tolerance and state["status"] == "HOLD" \
+                and abs(state["leads"] - field) < tolerance:
+            self._leave_persistent(leave_persistent, wait, field, tolerance)
+            return
+        self._wait_heater()
+
+        self._ramp_leads(field, rate_z, wait=wait, tolerance=tolerance)
         if wait:
-            # the is_ramping() method is not working properly, so we use the following method to wait for the ramping
-            # to finish
-            time_arr = [0]
-            field_arr = [self.field]
-            count = 0
-            step_count = 1
-            stability_counter = 13  # [s]
-            while count < stability_counter:
-                time_arr.append(step_count)
-                field_arr.append(self.field)
-                if self.if_reach_target(tolerance):
-                    count += 1
-                else:
-                    count = 0
-                print_progress_bar(count, stability_counter, prefix="Stablizing",
-                                   suffix=f"B: {self.field} T")
-                time.sleep(1)
-                step_count += 1
             print("ramping finished")
+        self._leave_persistent(leave_persistent, wait, field, tolerance)
 
+    def _leave_persistent(self, leave_persistent: bool, wait: bool, field: float, tolerance: float) -> None:
+        """
+        switch off the heater and ramp the leads to zero (without waiting for the leads),
+        only if the leads are confirmed at the target field
+        """
+        if not (leave_persistent and wait):
+            return
+        leads = self._read_leads()
+        if abs(leads - field) >= tolerance:
+            raise RuntimeError(f"the leads ({leads} T) are not at the target {field} T, the heater is kept on")
+        self.sw_heater("off")
+        self._wait_heater()
+        with self.lock:
+            self.ips.GRPZ.field_ramp_rate(0.2 / 60)
+            self.status = "TO ZERO"
+        print("magnet left persistent, leads ramping to zero")
 
 """
 Wrappers for ITC are following
@@ -1248,10 +1592,60 @@ Wrappers for ITC are following
 
 class ITC(ABC):
     # parent class to incorporate both two ITCs
+    channels: tuple[str, ...] = ()
+    """the channels that can be read into the snapshot"""
+    snapshot_ttl: float = 0.3
+    """the max age (s) of a snapshot tick, readings within one tick share the same query"""
+    _snapshot: dict[str, float] = {}
+    _snapshot_time: float = -np.inf
+    stability_log: list[dict]
+    """the log of each wait_for_temperature of this ITC, including the time saved by the predictive mode"""
+    lock: threading.RLock
+    """serialize the instrument access (and the snapshot) of the main thread and the background loggers"""
+
     @abstractmethod
     def __init__(self, address: str):
         pass
 
+    @abstractmethod
+    def _read_channel(self, channel: str) -> float:
+        """read one channel from the instrument"""
+        pass
+
+    @_locked
+    def snapshot(self, channels: Optional[tuple[str, ...] | list[str]] = None, *,
+                 max_age: Optional[float] = None) -> dict[str, float]:
+        """
+        return the readings of the channels within the current tick, a new tick is started if the
+        current one is older than max_age. Channels are read lazily, each at most once per tick
+
+        Args:
+            channels (tuple[str]): the channels needed, default to all channels
+            max_age (float): the max age (s) of the tick, default to snapshot_ttl, 0 to force a new tick
+        """
+        if max_age is None:
+            max_age = self.snapshot_ttl
+        if channels is None:
+            channels = self.channels
+        if time.perf_counter() - self._snapshot_time >= max_age:
+            self._snapshot = {}
+            self._snapshot_time = time.perf_counter()
+        for channel in channels:
+            if channel not in self._snapshot:
+                self._snapshot[channel] = self._read_channel(channel)
+        return {channel: self._snapshot[channel] for channel in channels}
+
+    @property
+    def snapshot_time(self) -> float:
+        """the time (time.perf_counter) when the current snapshot tick started"""
+        return self._snapshot_time
+
+    @_locked
+    def invalidate_snapshot(self) -> None:
+        """drop the current tick, the next reading will query the instrument"""
+        self._snapshot = {}
+        self._snapshot_time = -np.inf
+
     @property
     @abstractmethod
     def temperature(self):
@@ -1302,7 +1696,7 @@ class ITC(ABC):
         pass
 
     def wait_for_temperature(self, temp, *, check_interval=1, stability_counter=21,
-                             thermalize_counter=17):
+                             thermalize_counter=17, mode: Literal["predictive", "counter"] = "counter"):
         """
         wait for the temperature to stablize for a certain time length
 
@@ -1312,6 +1706,10 @@ class ITC(ABC):
             stability_counter (int): the number of times the temperature is within the delta range
                 to consider the temperature stablized
             thermalize_counter (int): the number of times to thermalize the sample
+            mode (Literal["predictive", "counter"]): "counter" (default) waits for the fixed counters only,
+                "predictive" also fits the trace to a settling model (see stability.py) and stops once the
+                fit is settled within the band, the counters are kept as a fallback; the time already
+                spent settled within the band is deducted from the thermalizing
         """
 
         def tolerance_T(T: float):
@@ -1323,37 +1721,61 @@ class ITC(ABC):
             else:
                 return 0.007
 
+        # every check takes one fresh tick, shared by the trend, correction and stability logic
+        self.invalidate_snapshot()
+        temp_now = self.temperature
         trend: Literal["up", "down", "up-huge", "down-huge"]
-        if abs(self.temperature - temp) < tolerance_T(temp):
+        if abs(temp_now - temp) < tolerance_T(temp):
             return
-        elif self.temperature < temp - 100:
+        elif temp_now < temp - 100:
             trend = "up-huge"
-        elif self.temperature > temp + 100:
+        elif temp_now > temp + 100:
             trend = "down-huge"
-        elif self.temperature < temp:
+        elif temp_now < temp:
             trend = "up"
         else:
             trend = "down"
 
+        detector = StabilityDetector(temp, ITC.dynamic_delta(temp)) if mode == "predictive" else None
+        t_start = time.monotonic()
+        predicted = False
         i = 0
         while i < stability_counter:
-            self.correction_ramping(self.temperature, trend)
-            if abs(self.temperature - temp) < ITC.dynamic_delta(temp):
+            self.invalidate_snapshot()
+            temp_now = self.temperature
+            self.correction_ramping(temp_now, trend)
+            if abs(temp_now - temp) < ITC.dynamic_delta(temp):
                 i += 1
             elif i >= 5:
                 i -= 5
+            if detector is not None and detector.update(time.monotonic(), temp_now):
+                predicted = True
+                break
             print_progress_bar(i, stability_counter, prefix="Stablizing",
-                               suffix=f"Temperature: {self.temperature:.2f} K")
+                               suffix=f"Temperature: {temp_now:.2f} K"
+                                      + ("" if detector is None else f" ({detector.status_str()})"))
             time.sleep(check_interval)
-        print("Temperature stablized")
-        for i in range(thermalize_counter):
-            print_progress_bar(i + 1, thermalize_counter, prefix="Thermalizing",
+        # the counter would need at least the remaining counts
+        saved = (stability_counter - i) * check_interval if predicted else 0
+        print(f"Temperature stablized" + (f" (predicted, {saved:.0f} s saved)" if predicted else ""))
+
+        n_thermalize = thermalize_counter
+        if detector is not None:
+            n_thermalize = max(thermalize_counter - int(detector.settled_duration // check_interval), 0)
+            saved += (thermalize_counter - n_thermalize) * check_interval
+        for i in range(n_thermalize):
+            self.invalidate_snapshot()
+            print_progress_bar(i + 1, n_thermalize, prefix="Thermalizing",
                                suffix=f"Temperature: {self.temperature:.2f} K")
             time.sleep(check_interval)
         print("Thermalizing finished")
+        self.stability_log.append({"target": temp, "mode": mode, "predicted": predicted,
+                                  "elapsed": time.monotonic() - t_start, "saved": saved,
+                                  "tau": None if detector is None or detector.fit is None else detector.fit["tau"]})
 
     def ramp_to_temperature(self, temp, *, delta=0.02, check_interval=1, stability_counter=21, thermalize_counter=17,
-                            pid: Optional[dict] = None, ramp_rate=None, wait=True):
+                            pid: Optional[dict] = None, ramp_rate=None, wait=True,
+                            stability_mode: Literal["predictive", "counter"] = "counter"):
         """ramp temperature to the target value (not necessary sample temperature)"""
         self.temperature_set = temp
         if pid is not None:
@@ -1361,7 +1783,7 @@ class ITC(ABC):
         if wait:
             self.wait_for_temperature(temp, check_interval=check_interval,
                                       stability_counter=stability_counter,
-                                      thermalize_counter=thermalize_counter)
+                                      thermalize_counter=thermalize_counter, mode=stability_mode)
 
     @staticmethod
     def dynamic_delta(temp) -> float:
@@ -1382,20 +1804,45 @@ class ITCMercury(ITC):
     self.correction_ramping: modify pressure according to the temperature and trend
     self.calculate_vti_temp (in driver): automatically calculate the set VTI temperature
     """
-    def __init__(self, address="TCPIP0::10.97.27.13::7020::SOCKET"):
-        self.mercury = MercuryITC("mercury_itc", address)
+    channels = ("probe", "vti", "pressure")
+    planner: Optional[ThermalPlanner] = None
+    """attach a ThermalPlanner to record every waited ramp (and plan the steps with plan=True)"""
+    _planned_pres: Optional[float] = None
+
+    def __init__(self, address="TCPIP0::10.97.27.13::7020::SOCKET", *, sim: Optional[bool] = None):
+        self.stability_log = []
+        self.lock = threading.RLock()
+        if is_simulated(sim):
+            self.mercury = simulated.SimMercuryITC("mercury_itc", address)
+        else:
+            from .drivers.mercuryITC import MercuryITC
+            self.mercury = MercuryITC("mercury_itc", address)
+
+    def _read_channel(self, channel: str) -> float:
+        match channel:
+            case "probe":
+                return self.mercury.probe_temp()
+            case "vti":
+                return self.mercury.vti_temp()
+            case "pressure":
+                return self.mercury.pressure()
+            case _:
+                raise ValueError(f"channel {channel} not recognized")
 
     @property
     def pres(self):
-        return self.mercury.pressure()
+        return self.snapshot(["pressure"])["pressure"]
 
+    @_locked
     def set_pres(self, pres: float):
         self.mercury.pressure_setpoint(pres)
 
     @property
+    @_locked
     def flow(self):
         return self.mercury.gas_flow()
 
+    @_locked
     def set_flow(self, flow: float):
         """
         set the gas flow, note the input value is percentage, from 0 to 99.9 (%)
@@ -1405,10 +1852,12 @@ class ITCMercury(ITC):
         self.mercury.gas_flow(flow)
 
     @property
+    @_locked
     def pid(self):
         return {"P": self.mercury.temp_loop_P(), "I": self.mercury.temp_loop_I(),
                 "D": self.mercury.temp_loop_D()}
 
+    @_locked
     def set_pid(self, pid: dict):
         """
         set the pid of probe temp loop
@@ -1416,13 +1865,15 @@ class ITCMercury(ITC):
         self.mercury.temp_PID = (pid["P"], pid["I"], pid["D"])
         self.pid_control("ON")
 
+    @_locked
     def pid_control(self, control: Literal["ON", "OFF"]):
         self.mercury.temp_PID_control(control)
 
     @property
     def temperature(self):
-        return self.mercury.probe_temp()
+        return self.snapshot(["probe"])["probe"]
 
+    @_locked
     def set_temperature(self, temp, vti_diff=None):
         """set the target temperature for sample"""
         self.mercury.temp_setpoint(temp)
@@ -1432,22 +1883,26 @@ class ITCMercury(ITC):
             self.mercury.vti_temp_setpoint(self.mercury.calculate_vti_temp(temp))
 
     @property
+    @_locked
     def temperature_set(self):
         return self.mercury.temp_setpoint()
 
     @temperature_set.setter
+    @_locked
     def temperature_set(self, temp):
         self.set_temperature(temp)
 
     @property
     def vti_temperature(self):
-        return self.mercury.vti_temp()
+        return self.snapshot(["vti"])["vti"]
 
+    @_locked
     def set_vti_temperature(self, temp):
         self.mercury.vti_temp_setpoint(temp)
 
     def ramp_to_temperature(self, temp, *, delta=0.01, check_interval=1, stability_counter=10, thermalize_counter=7,
-                            pid=None, ramp_rate=None, wait=True, vti_diff: Optional[float] = 5):
+                            pid=None, ramp_rate=None, wait=True, vti_diff: Optional[float] = 5,
+                            stability_mode: Literal["predictive", "counter"] = "counter", plan: bool = False):
         """ramp temperature to the target value (not necessary sample temperature)
 
         Args:
@@ -1460,32 +1915,59 @@ class ITCMercury(ITC):
             ramp_rate (float, [K/min]): the rate to ramp the temperature
             wait (bool): whether to wait for the ramping to finish
             vti_diff (float, None to ignore VTI): the difference between the sample temperature and the VTI temperature
+            stability_mode (Literal["predictive", "counter"]): the mode of wait_for_temperature
+            plan (bool): whether to use the VTI offset, pressure and ramp rate planned by the attached planner
+                (see temp_planner.py), the explicitly given ramp_rate is still respected
         """
         temp = convert_unit(temp, "K")[0]
+        start = self.temperature
+        action = dict(ThermalPlanner.DEFAULT_ACTION)
+        if plan:
+            if self.planner is None:
+                print("no planner attached, use the default action")
+            else:
+                action = self.planner.plan(start, temp)
+                print(f"planned action: {action}")
+        if ramp_rate is None:
+            ramp_rate = action["ramp_rate"]
+        action["ramp_rate"] = ramp_rate
         self.temperature_set = temp
+        if action["vti_scale"] != 1:
+            self.set_vti_temperature(ThermalPlanner.vti_setpoint(temp, action))
+        self._planned_pres = action["pres"]
+        if action["pres"] is not None:
+            self.set_pres(action["pres"])
         if pid is not None:
             self.set_pid(pid)
 
-        if ramp_rate is not None:
-            self.mercury.probe_ramp_rate(ramp_rate)
-            # self.mercury.vti_heater_rate(ramp_rate)
-            self.mercury.probe_temp_ramp_mode("ON")  # ramp_mode means limited ramping rate mode
-        else:
-            self.mercury.probe_temp_ramp_mode("OFF")
+        with self.lock:
+            if ramp_rate is not None:
+                self.mercury.probe_ramp_rate(ramp_rate)
+                # self.mercury.vti_heater_rate(ramp_rate)
+                self.mercury.probe_temp_ramp_mode("ON")  # ramp_mode means limited ramping rate mode
+            else:
+                self.mercury.probe_temp_ramp_mode("OFF")
         if wait:
+            n_log = len(self.stability_log)
             self.wait_for_temperature(temp, check_interval=check_interval,
                                       stability_counter=stability_counter,
-                                      thermalize_counter=thermalize_counter)
+                                      thermalize_counter=thermalize_counter, mode=stability_mode)
+            if self.planner is not None and len(self.stability_log) > n_log:
+                self.planner.record(start, temp, action, self.stability_log[-1]["elapsed"])
 
+    @_locked
     def correction_ramping(self, temp: float, trend: Literal["up", "down", "up-huge", "down-huge"]):
         """
         Correct the sensor choosing or pressure when ramping through the temperature threshold
+        (the planned pressure is kept if the step is planned)
 
         Args:
             temp (float): the current temperature
             trend (Literal["up","down","up-huge","down-huge"]): the trend of the temperature
         """
-        if trend == "up-huge":
+        if self._planned_pres is not None:
+            self.set_pres(self._planned_pres)
+        elif trend == "up-huge":
             self.set_pres(8)
         elif trend == "down-huge":
             if temp >= 5:
@@ -1506,13 +1988,30 @@ class ITCs(ITC):
 
     There are two ITC503 incorporated in the setup, named up and down. The up one measures the temperature of the heat switch(up R1), PT2(up R2), leaving R3 no specific meaning. The down one measures the temperature of the sorb(down R1), POT LOW(down R2), POT HIGH(down R3).
     """
-
-    def __init__(self, address_up: str = "GPIB0::23::INSTR", address_down: str = "GPIB0::24::INSTR", clear_buffer=True):
-        self.itc_up = ITC503(address_up, clear_buffer=clear_buffer)
-        self.itc_down = ITC503(address_down, clear_buffer=clear_buffer)
+    channels = ("sw", "pt2", "sorb", "pot_low", "pot_high")
+    _channel_map = {"sw": ("itc_up", "temperature_1"), "pt2": ("itc_up", "temperature_2"),
+                    "sorb": ("itc_down", "temperature_1"), "pot_low": ("itc_down", "temperature_2"),
+                    "pot_high": ("itc_down", "temperature_3")}
+
+    def __init__(self, address_up: str = "GPIB0::23::INSTR", address_down: str = "GPIB0::24::INSTR", clear_buffer=True,
+                 *, sim: Optional[bool] = None):
+        self.stability_log = []
+        self.lock = threading.RLock()
+        if is_simulated(sim):
+            itc_class = simulated.SimITC503
+        else:
+            from pymeasure.instruments.oxfordinstruments import ITC503
+            itc_class = ITC503
+        self.itc_up = itc_class(address_up, clear_buffer=clear_buffer)
+        self.itc_down = itc_class(address_down, clear_buffer=clear_buffer)
         self.itc_up.control_mode = "RU"
         self.itc_down.control_mode = "RU"
 
+    def _read_channel(self, channel: str) -> float:
+        itc_name, attr = self._channel_map[channel]
+        return getattr(getattr(self, itc_name), attr)
+
+    @_locked
     def chg_display(self, itc_name, target):
         """
         This function is used to change the front display of the ITC503
@@ -1534,10 +2033,12 @@ class ITCs(ITC):
             self.itc_down.front_panel_display = target
 
     @property
+    @_locked
     def temperature_set(self):
         return self.itc_down.temperature_setpoint
 
     @temperature_set.setter
+    @_locked
     def temperature_set(self, temp):
         """
         set the target temperature for sample, as for other parts' temperature, use the methods for each ITC
@@ -1548,6 +2049,7 @@ class ITCs(ITC):
         """
         self.itc_down.temperature_setpoint = temp
 
+    @_locked
     def ramp_to_temperature_selective(self, temp, itc_name: Literal["up", "down"], P=None, I=None, D=None):
         """
         used to ramp the temperature of the ITCs, this method will wait for the temperature to stablize and thermalize for a certain time length
@@ -1572,16 +2074,19 @@ class ITCs(ITC):
         print(f"temperature setted to {temp}")
 
     @property
+    @_locked
     def version(self):
         """ Returns the version of the ITC503. """
         return [self.itc_up.version, self.itc_down.version]
 
     @property
+    @_locked
     def control_mode(self):
         """ Returns the control mode of the ITC503. """
         return [self.itc_up.control_mode, self.itc_down.control_mode]
 
     @control_mode.setter
+    @_locked
     def control_mode(self, mode: tuple[Literal["LU", "RU", "LL", "RL"], Literal["all", "up", "down"]]):
         """ Sets the control mode of the ITC503. A two-element list is required. The second elecment is "all" or "up"
         or "down" to specify which ITC503 to set."""
@@ -1594,11 +2099,13 @@ class ITCs(ITC):
             self.itc_down.control_mode = mode[0]
 
     @property
+    @_locked
     def heater_gas_mode(self):
         """ Returns the heater gas mode of the ITC503. """
         return [self.itc_up.heater_gas_mode, self.itc_down.heater_gas_mode]
 
     @heater_gas_mode.setter
+    @_locked
     def heater_gas_mode(self, mode: tuple[Literal["MANUAL", "AM", "MA", "AUTO"], Literal["all", "up", "down"]]):
         """ Sets the heater gas mode of the ITC503. A two-element list is required. The second elecment is "all" or
         "up" or "down" to specify which ITC503 to set."""
@@ -1611,40 +2118,48 @@ class ITCs(ITC):
             self.itc_down.heater_gas_mode = mode[0]
 
     @property
+    @_locked
     def heater_power(self):
         """ Returns the heater power of the ITC503. """
         return [self.itc_up.heater, self.itc_down.heater]
 
     @property
+    @_locked
     def heater_voltage(self):
         """ Returns the heater voltage of the ITC503. """
         return [self.itc_up.heater_voltage, self.itc_down.heater_voltage]
 
     @property
+    @_locked
     def gas_flow(self):
         """ Returns the gasflow of the ITC503. """
         return [self.itc_up.gasflow, self.itc_down.gasflow]
 
     @property
+    @_locked
     def proportional_band(self):
         """ Returns the proportional band of the ITC503. """
         return [self.itc_up.proportional_band, self.itc_down.proportional_band]
 
     @property
+    @_locked
     def integral_action_time(self):
         """ Returns the integral action time of the ITC503. """
         return [self.itc_up.integral_action_time, self.itc_down.integral_action_time]
 
     @property
+    @_locked
     def derivative_action_time(self):
         """ Returns the derivative action time of the ITC503. """
         return [self.itc_up.derivative_action_time, self.itc_down.derivative_action_time]
 
     @property
+    @_locked
     def pid(self):
         """ Returns the PID of the ITC503. """
         return tuple(zip(self.proportional_band, self.integral_action_time, self.derivative_action_time))
 
+    @_locked
     def set_pid(self, pid: dict, mode: Literal["all", "up", "down"] = "down"):
         """ Sets the PID of the ITC503. A three-element list is required. The second elecment is "all" or "up" or "down" to specify which ITC503 to set.
         The P,I,D here are the proportional band (K), integral action time (min), and derivative action time(min), respectively.
@@ -1671,11 +2186,13 @@ class ITCs(ITC):
         return f"{mode} PID(power percentage): 100*(E/{pid['P']}+E/{pid['P']}*t/60{pid['I']}-dE*60{pid['D']}/{pid['P']}), [K,min,min]"
 
     @property
+    @_locked
     def auto_pid(self):
         """ Returns the auto pid of the ITC503. """
         return [self.itc_up.auto_pid, self.itc_down.auto_pid]
 
     @auto_pid.setter
+    @_locked
     def auto_pid(self, mode):
         """ Sets the auto pid of the ITC503. A two-element list is required. The second elecment is "all" or "up" or
         "down" to specify which ITC503 to set."""
@@ -1688,11 +2205,13 @@ class ITCs(ITC):
             self.itc_down.auto_pid = mode[0]
 
     @property
+    @_locked
     def temperature_setpoint(self):
         """ Returns the temperature setpoint of the ITC503. """
         return [self.itc_up.temperature_setpoint, self.itc_down.temperature_setpoint]
 
     @temperature_setpoint.setter
+    @_locked
     def temperature_setpoint(self, temperature):
         """ Sets the temperature setpoint of the ITC503. A two-element list is required. The second elecment is "all"
         or "up" or "down" to specify which ITC503 to set."""
@@ -1706,17 +2225,17 @@ class ITCs(ITC):
 
     @property
     def temperatures(self):
-        """ Returns the temperatures of the whole device as a dict. """
-        return {"sw": self.itc_up.temperature_1, "pt2": self.itc_up.temperature_2, "sorb": self.itc_down.temperature_1,
-                "pot_low": self.itc_down.temperature_2, "pot_high": self.itc_down.temperature_3}
+        """ Returns the temperatures of the whole device as a dict (from the current snapshot tick). """
+        return self.snapshot()
 
     @property
+    @_locked
     def temperature(self):
-        """ Returns the precise temperature of the sample """
-        if self.temperatures["pot_high"] < 1.9:
-            return self.temperatures["pot_low"]
-        elif self.temperatures["pot_high"] >= 1.9:
-            return self.temperatures["pot_high"]
+        """ Returns the precise temperature of the sample (only the needed channels are read) """
+        pot_high = self.snapshot(["pot_high"])["pot_high"]
+        if pot_high < 1.9:
+            return self.snapshot(["pot_low"])["pot_low"]
+        return pot_high
 
     def correction_ramping(self, temp: float, trend: Literal["up", "down", "up-huge", "down-huge"]):
         pass
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+
+"""
+This module provides the data buffers behind the live plots of DataPlot.
+
+Each coordinate (x / y / z) of a live trace is kept in a TraceBuffer: appends are amortized O(1)
+(the storage grows by doubling instead of copying the whole history on every point), and with
+max_points the buffer works as a sliding window over a storage of twice the window, so the window
+is always a contiguous view (no copy) and the old points are dropped in one move per max_points appends.
+The traces of the figure only receive the views when the display is refreshed.
+
+Each buffer also counts the values appended (total), so a consumer keeping its own cursor can fetch
+only the new values (since) e.g. to send delta updates to a browser.
+
+The contour / heatmap traces are fed by a GridAccumulator instead: each point goes directly into its
+cell of a dense z matrix (averaging the repeats), so the trace receives the matrix and plotly does not
+need to re-grid all the scattered points on every refresh.
+
+Flow:
+    buf = TraceBuffer(max_points=1000)
+    buf.extend([1, 2, 3])
+    trace.x = buf.view()
+    new_values, cursor = buf.since(cursor), buf.total
+
+    grid = GridAccumulator(x_axis=sweep_plan)  # or no axes for growing them from the data
+    grid.add([x], [y], [z])
+    trace.x, trace.y, trace.z = grid.view()
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+class TraceBuffer:
+    """
+    growable array with an optional sliding window of the last max_points values
+    """
+
+    def __init__(self, *, max_points: Optional[int] = None, capacity: int = 256):
+        """
+        Args:
+            max_points (int): the size of the window, None for keeping all values
+            capacity (int): the initial capacity of the storage
+        """
+        self.max_points = max_points
+        self._capacity = capacity
+        self._data: Optional[np.ndarray] = None
+        self._start = 0
+        self._end = 0
+        self.total = 0
+        """the number of values appended since the last clear, used as the cursor of the consumers"""
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def clear(self) -> None:
+        self._data = None
+        self._start = self._end = self.total = 0
+
+    def set_max_points(self, max_points: Optional[int]) -> None:
+        """change the window size (the values out of the new window are dropped)"""
+        self.max_points = max_points
+        if max_points is not None and len(self) > max_points:
+            self._start = self._end - max_points
+
+    def extend(self, values: Sequence | np.ndarray) -> None:
+        """append the values"""
+        values = np.atleast_1d(np.asarray(values))
+        if values.size == 0:
+            return
+        self.total += values.size
+        if self._data is None:
+            dtype = np.float64 if np.issubdtype(values.dtype, np.number) else object
+            self._data = np.empty(max(self._capacity, values.size), dtype=dtype)
+        elif self._data.dtype != object and not np.issubdtype(values.dtype, np.number):
+            self._data = self._data.astype(object)
+        if self.max_points is not None and values.size >= self.max_points:
+            # the new values fill the whole window
+            values = values[-self.max_points:]
+            self._start = self._end = 0
+        n_new = self._end + values.size
+        if n_new > len(self._data):
+            keep = self.view()
+            if self.max_points is not None:
+                # slide the window to the front of a storage of twice the window
+                keep = keep[max(len(keep) + values.size - self.max_points, 0):]
+                size = max(2 * self.max_points, len(self._data))
+            else:
+                size = max(2 * len(self._data), len(keep) + values.size)
+            data = np.empty(size, dtype=self._data.dtype) if size != len(self._data) else self._data
+            data[:len(keep)] = keep
+            self._data = data
+            self._start, self._end = 0, len(keep)
+        self._data[self._end:self._end + values.size] = values
+        self._end += values.size
+        if self.max_points is not None and len(self) > self.max_points:
+            self._start = self._end - self.max_points
+
+    def replace(self, values: Sequence | np.ndarray) -> None:
+        """replace all values"""
+        self.clear()
+        self.extend(values)
+
+    def since(self, cursor: int) -> np.ndarray:
+        """the values appended after the cursor (a former total), limited to the ones still kept"""
+        n_new = min(self.total - cursor, len(self))
+        return self.view()[len(self) - n_new:] if n_new > 0 else np.array([])
+
+    def view(self) -> np.ndarray:
+        """the current values (a view, valid until the next append)"""
+        if self._data is None:
+            return np.array([])
+        return self._data[self._start:self._end]
+
+
+class GridAccumulator:
+    """
+    dense 2d grid of the z values of scattered (x, y, z) points, for the contour / heatmap live plots
+    """
+
+    def __init__(self, x_axis: Optional[Sequence[float]] = None, y_axis: Optional[Sequence[float]] = None, *,
+                 average: bool = True, digits: int = 8):
+        """
+        Args:
+            x_axis, y_axis (Sequence[float]): the known grid values (e.g. a SweepPlan), the points are put to the
+                nearest ones. None for growing the axis with every new value (rounded to digits)
+            average (bool): average the repeated points of a cell, otherwise keep the last one
+            digits (int): the significant digits to tell the values of a growing axis apart
+        """
+        self.average = average
+        self.digits = digits
+        self._fixed: list[Optional[np.ndarray]] = [None, None]
+        self._values: list[list[float]] = [[], []]
+        self._index: list[dict[float, int]] = [{}, {}]
+        self._sum = np.zeros((0, 0))
+        self._count = np.zeros((0, 0), dtype=int)
+        self.total = 0
+        """the number of points added since the last clear"""
+        self.set_axes(x_axis, y_axis)
+
+    def set_axes(self, x_axis: Optional[Sequence[float]] = None, y_axis: Optional[Sequence[float]] = None) -> None:
+        """set the known grid values (the accumulated points are cleared)"""
+        for axis_no, axis in enumerate((x_axis, y_axis)):
+            if axis is not None:
+                axis = np.unique(np.fromiter(axis, dtype=float))
+                self._fixed[axis_no] = axis
+            else:
+                self._fixed[axis_no] = None
+        self.clear()
+
+    def clear(self) -> None:
+        for axis_no in range(2):
+            fixed = self._fixed[axis_no]
+            self._values[axis_no] = [] if fixed is None else fixed.tolist()
+            self._index[axis_no] = {}
+        self._sum = np.zeros((max(len(self._values[1]), 16), max(len(self._values[0]), 16)))
+        self._count = np.zeros(self._sum.shape, dtype=int)
+        self.total = 0
+
+    def _axis_index(self, axis_no: int, value: float) -> int:
+        fixed = self._fixed[axis_no]
+        if fixed is not None:
+            # the nearest grid value
+            idx = int(np.searchsorted(fixed, value))
+            if idx == len(fixed) or (idx > 0 and value - fixed[idx - 1] < fixed[idx] - value):
+                idx -= 1
+            return idx
+        key = float(f"{value:.{self.digits}g}")
+        idx = self._index[axis_no].get(key)
+        if idx is None:
+            idx = self._index[axis_no][key] = len(self._values[axis_no])
+            self._values[axis_no].append(key)
+        return idx
+
+    def _ensure_shape(self, n_y: int, n_x: int) -> None:
+        """grow the storage by doubling"""
+        if n_y <= self._sum.shape[0] and n_x <= self._sum.shape[1]:
+            return
+        shape = (max(self._sum.shape[0] * (2 if n_y > self._sum.shape[0] else 1), n_y),
+                 max(self._sum.shape[1] * (2 if n_x > self._sum.shape[1] else 1), n_x))
+        z_sum, count = np.zeros(shape), np.zeros(shape, dtype=int)
+        z_sum[:self._sum.shape[0], :self._sum.shape[1]] = self._sum
+        count[:self._count.shape[0], :self._count.shape[1]] = self._count
+        self._sum, self._count = z_sum, count
+
+    def add(self, x: Sequence[float], y: Sequence[float], z: Sequence[float]) -> None:
+        """add the points (x[i], y[i], z[i]), the non-finite ones are skipped"""
+        for xi, yi, zi in zip(np.atleast_1d(x), np.atleast_1d(y), np.atleast_1d(z)):
+            xi, yi, zi = float(xi), float(yi), float(zi)
+            if not (np.isfinite(xi) and np.isfinite(yi) and np.isfinite(zi)):
+                continue
+            ix, iy = self._axis_index(0, xi), self._axis_index(1, yi)
+            self._ensure_shape(iy + 1, ix + 1)
+            if self.average:
+                self._sum[iy, ix] += zi
+                self._count[iy, ix] += 1
+            else:
+                self._sum[iy, ix] = zi
+                self._count[iy, ix] = 1
+            self.total += 1
+
+    def view(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """the sorted x values, y values and the z matrix (shape (len(y), len(x)), nan for empty cells)"""
+        xs, ys = np.array(self._values[0]), np.array(self._values[1])
+        z_sum, count = self._sum[:len(ys), :len(xs)], self._count[:len(ys), :len(xs)]
+        z = np.divide(z_sum, count, out=np.full(z_sum.shape, np.nan), where=count > 0)
+        order_x, order_y = np.argsort(xs, kind="stable"), np.argsort(ys, kind="stable")
+        return xs[order_x], ys[order_y], z[np.ix_(order_y, order_x)]
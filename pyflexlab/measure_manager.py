@@ -4,18 +4,22 @@
 initialzed right before the measurement, as there may be a long time between loading and measuremnt, leading to
 possibilities of parameter changing"""
 import copy
+import csv
 from itertools import product
-from typing import Literal, Generator, Optional, Sequence
+from typing import Callable, Literal, Generator, Optional, Sequence
 import gc
+import time
 import numpy as np
-import pyvisa
 import pandas as pd
 from pathlib import Path
 import re
 from .drivers.probe_rotator import RotatorProbe
 from .file_organizer import print_help_if_needed, FileOrganizer
 from .data_plot import DataPlot
-from .constants import convert_unit, print_progress_bar, gen_seq, constant_generator, combined_generator_list, rename_duplicates, time_generator
+from .ramp_coordinator import RampCoordinator
+from .slow_logger import SlowChannelLogger
+from .running_stats import RunningStats
+from .constants import convert_unit, print_progress_bar, SweepPlan, constant_generator, combined_generator_list, rename_duplicates, time_generator
 from .equip_wrapper import ITCs, ITCMercury, WrapperSR830, Wrapper2400, Wrapper6430, Wrapper2182, Wrapper6221, Wrapper2450, Meter, SourceMeter, WrapperIPS
 
 
@@ -37,6 +41,7 @@ class MeasureManager(DataPlot):
             "sr830": WrapperSR830
         }
         self.instrs: dict[str, list[Meter] | ITCs | WrapperIPS | RotatorProbe] = {}
+        self.slow_loggers: dict[str, SlowChannelLogger] = {}
         # load params for plotting in measurement
         DataPlot.load_settings(False, False)
 
@@ -48,13 +53,14 @@ class MeasureManager(DataPlot):
         return self._out_database_dir_proj
 
     def load_meter(self, meter_no: Literal["sr830", "6221", "2182", "2182a", "2400", "2401", "6430", "2450"],
-                   *address: str) -> None:
+                   *address: str, sim: Optional[bool] = None) -> None:
         """
         load the instrument according to the address, store it in self.instrs[meter]
 
         Args:
             meter_no (str): the name of the instrument
             address (str): the address of the instrument
+            sim (bool): whether to use the simulated instrument (default to env PYLAB_SIMULATE)
         """
         # some meters can not be loaded twice, so del old one first
         meter_no = meter_no.lower()
@@ -65,7 +71,7 @@ class MeasureManager(DataPlot):
 
         self.instrs[meter_no] = []
         for addr in address:
-            self.instrs[meter_no].append(self.meter_wrapper_dict[meter_no](addr))
+            self.instrs[meter_no].append(self.meter_wrapper_dict[meter_no](addr, sim=sim))
             try:
                 self.instrs[meter_no][-1].setup(function="source")
             except:
@@ -80,19 +86,20 @@ class MeasureManager(DataPlot):
         print("Curr Angle:", self.instrs["rotator"].curr_angle())
         print("Curr Velocity:", self.instrs["rotator"].spd())
 
-    def load_ITC503(self, gpib_up: str, gpib_down: str) -> None:
+    def load_ITC503(self, gpib_up: str, gpib_down: str, *, sim: Optional[bool] = None) -> None:
         """
         load ITC503 instruments according to the addresses, store them in self.instrs["itc503"] in corresponding order. Also store the ITC503 instruments in self.instrs["itc"] for convenience to call
 
         Args:
             gpib_up (str): the address of the upper ITC503
             gpib_down (str): the address of the lower ITC503
+            sim (bool): whether to use the simulated instrument (default to env PYLAB_SIMULATE)
         """
-        self.instrs["itc503"] = ITCs(gpib_up, gpib_down)
+        self.instrs["itc503"] = ITCs(gpib_up, gpib_down, sim=sim)
         self.instrs["itc"] = self.instrs["itc503"]
 
     def load_mercury_ips(self, address: str = "TCPIP0::10.97.24.237::7020::SOCKET", if_print: bool = False,
-                         limit_sphere: float = 11) -> None:
+                         limit_sphere: float = 11, *, sim: Optional[bool] = None) -> None:
         """
         load Mercury iPS instrument according to the address, store it in self.instrs["ips"]
 
@@ -100,15 +107,18 @@ class MeasureManager(DataPlot):
             address (str): the address of the instrument
             if_print (bool): whether to print the snapshot of the instrument
             limit_sphere (float): the limit of the field
+            sim (bool): whether to use the simulated instrument (default to env PYLAB_SIMULATE)
         """
-        self.instrs["ips"] = WrapperIPS(address, if_print=if_print, limit_sphere=limit_sphere)
+        self.instrs["ips"] = WrapperIPS(address, if_print=if_print, limit_sphere=limit_sphere, sim=sim)
 
-    def load_mercury_itc(self, address: str = "TCPIP0::10.101.28.24::7020::SOCKET") -> None:
+    def load_mercury_itc(self, address: str = "TCPIP0::10.101.28.24::7020::SOCKET", *,
+                         sim: Optional[bool] = None) -> None:
         """
         load Mercury iPS instrument according to the address, store it in self.instrs["ips"]
+        (sim: whether to use the simulated instrument, default to env PYLAB_SIMULATE)
         """
         #self.instrs["mercury_itc"] = MercuryITC(address)
-        self.instrs["mercury_itc"] = ITCMercury(address)
+        self.instrs["mercury_itc"] = ITCMercury(address, sim=sim)
         self.instrs["itc"] = self.instrs["mercury_itc"]
         #print(self.instrs["mercury_itc"].modules)
 
@@ -167,22 +177,17 @@ class MeasureManager(DataPlot):
 
         # core functional part
         if ac_dc == "dc":
-            if sweepmode == "0-max-0":
-                value_gen = self.sweep_values(0, max_value, step_value, mode="start-end-start")
-            elif sweepmode == "0--max-max-0":
-                value_gen = self.sweep_values(-max_value, max_value, step_value, mode="0-start-end-0")
-            elif sweepmode == "0-max--max-max-0":
-                value_gen = self.sweep_values(max_value, -max_value, step_value, mode="0-start-end-start-0")
-            elif sweepmode == "manual":
+            if sweepmode == "manual":
                 value_gen = (i for i in convert_unit(sweep_table, "")[0])
                 instr.ramp_output(source_type, sweep_table[0], interval=safe_step, compliance=compliance)
             else:
-                raise ValueError("sweepmode not recognized")
+                value_gen = SweepPlan.from_mode(sweepmode, max_value, step_value)
             for value_i in value_gen:
                 if ramp_step:
                     instr.ramp_output(source_type, value_i, interval=safe_step, compliance=compliance,no_progress=True)
                 else:
                     instr.uni_output(value_i, compliance=compliance, type_str=source_type)
+                    Meter.mark_source_change()
                 yield value_i
         elif ac_dc == "ac":
             if resistor is not None:  # automatically regard the source value as current and set output mode to volt
@@ -190,10 +195,10 @@ class MeasureManager(DataPlot):
                     volt_gen = (i * resistor for i in convert_unit(sweep_table, "")[0])
                     instr.ramp_output("volt", sweep_table[0] * resistor, interval=safe_step, compliance=compliance)
                 else:
-                    volt_gen = (i for i in
-                                list(np.arange(0, max_value * resistor, step_value)) + [max_value * resistor])
+                    volt_gen = SweepPlan().add_segment(0, max_value * resistor, step_value)
                 for value_i in volt_gen:
                     instr.uni_output(value_i, freq=freq, type_str="volt")
+                    Meter.mark_source_change()
                     yield value_i
             else:
                 if meter == "6221" or isinstance(meter, Wrapper6221):
@@ -202,12 +207,13 @@ class MeasureManager(DataPlot):
                     value_gen = (i for i in convert_unit(sweep_table, "")[0])
                     instr.ramp_output(source_type, sweep_table[0], interval=safe_step, freq=freq, compliance=compliance)
                 else:
-                    value_gen = (i for i in list(np.arange(0, max_value, step_value)) + [max_value])
+                    value_gen = SweepPlan().add_segment(0, max_value, step_value)
                 for value_i in value_gen:
                     if ramp_step:
                         instr.ramp_output(source_type, value_i, interval=safe_step, freq=freq, compliance=compliance,no_progress=True)
                     else:
                         instr.uni_output(value_i, freq=freq, compliance=compliance, type_str=source_type)
+                        Meter.mark_source_change()
                     yield value_i
 
     def ext_sweep_apply(self, ext_type: Literal["temp", "mag", "B", "T", "angle", "Theta"], *,
@@ -245,18 +251,10 @@ class MeasureManager(DataPlot):
         if min_value is not None:
             min_value = convert_unit(min_value, "")[0]
 
-        if sweepmode == "0-max-0":
-            value_gen = self.sweep_values(0, max_value, step_value, mode="start-end-start")
-        elif sweepmode == "0--max-max-0":
-            value_gen = self.sweep_values(-max_value, max_value, step_value, mode="0-start-end-0")
-        elif sweepmode == "0-max--max-max-0":
-            value_gen = self.sweep_values(max_value, -max_value, step_value, mode="0-start-end-start-0")
-        elif sweepmode == "min-max":
-            value_gen = self.sweep_values(min_value, max_value, step_value, mode="start-end")
-        elif sweepmode == "manual":
+        if sweepmode == "manual":
             value_gen = (i for i in convert_unit(sweep_table, "")[0])
         else:
-            raise ValueError("sweepmode not recognized")
+            value_gen = SweepPlan.from_mode(sweepmode, max_value, step_value, min_value=min_value)
 
         for value_i in value_gen:
             if ext_type == "temp":
@@ -268,7 +266,10 @@ class MeasureManager(DataPlot):
             yield value_i
 
     def sense_apply(self, sense_type: Literal["volt", "curr", "temp", "mag", "V", "I", "T", "B", "H", "angle", "Theta"],
-                    meter: str | Meter = None, *, if_during_vary=False, vary_criteria: int = 10) \
+                    meter: str | Meter = None, *, if_during_vary=False, vary_criteria: int = 10,
+                    continuous: bool = False, log_interval: float = 0.2, log_path: Optional[Path] = None,
+                    stable_time: float = 10, n_samples: int = 1, sigma_clip: Optional[float] = None,
+                    raw_path: Optional[Path] = None) \
             -> Generator[float, None, None]:
         """
         sense the current using the source meter, initializations will be done for volt/curr meters
@@ -278,7 +279,19 @@ class MeasureManager(DataPlot):
             meter ("str") (applicable only for volt or curr): the meter to be used, use "-0", "-1" to specify the meter if necessary
             if_during_vary (bool): whether the sense is bonded with a varying temp/field, this will limit the generator,
                 and the sense will be stopped when the temp/field is stable (not available for meters and rotator)
-            vary_criteria (int): the criteria (no of steps) to judge if the field/temperature is stable
+            vary_criteria (int): the criteria (no of rows) to judge if the field/temperature is stable
+                (not used in continuous mode, see stable_time)
+            continuous (bool): (only with if_during_vary) poll the temp/field/angle in a background logger and
+                yield the logged trace interpolated at the time of each row, so no query is made in the loop,
+                the logger is kept in self.slow_loggers
+            log_interval (float): the polling interval (s) of the background logger
+            log_path (Path): the csv file to save the log of the background logger after the vary
+            stable_time (float): (only in continuous mode) the time (s) the logged value should stay within
+                the tolerance to judge it as stable
+            n_samples (int): (only for meters) the number of readings per point, if larger than 1, the readings
+                are reduced online to [means..., stds..., counts...] (see RunningStats) instead of the value
+            sigma_clip (float): reject the readings further than sigma_clip * std from the mean (with n_samples)
+            raw_path (Path): the csv file to append the raw readings to (with n_samples), None to discard them
         Returns:
             float | tuple[float]: the sensed value (tuple for sr830 ac sense)
         """
@@ -292,14 +305,20 @@ class MeasureManager(DataPlot):
             instr.setup(function="sense")
             if isinstance(meter, WrapperSR830) and sense_type == "curr":
                 instr.setup(function="sense", input_config="I (1 MOhm)", input_grounding="Ground")
-            while True:
-                yield instr.sense_delay(type_str=sense_type)
+            if n_samples <= 1:
+                while True:
+                    yield instr.sense_delay(type_str=sense_type)
+            else:
+                yield from self._sampled_sense(instr, sense_type, n_samples, sigma_clip, raw_path)
         elif sense_type == "temp":
             instr = self.instrs["itc"]
             print(f"Sense Meter/Instr: {instr}")
             if not if_during_vary:
                 while True:
                     yield instr.temperature
+            elif continuous:
+                yield from self._continuous_vary(lambda: instr.temperature, lambda: instr.temperature_set,
+                                                 instr.dynamic_delta, "T", stable_time, log_interval, log_path)
             else:
                 timer_i = 0
                 while timer_i < vary_criteria:
@@ -314,6 +333,9 @@ class MeasureManager(DataPlot):
             if not if_during_vary:
                 while True:
                     yield instr.field
+            elif continuous:
+                yield from self._continuous_vary(lambda: instr.field, lambda: instr.field_set,
+                                                 0.001, "B", stable_time, log_interval, log_path)
             else:
                 timer_i = 0
                 while timer_i < vary_criteria:
@@ -329,19 +351,101 @@ class MeasureManager(DataPlot):
             if not if_during_vary:
                 while True:
                     yield instr.curr_angle()
+            elif continuous:
+                # switch to the motion tracker of the sweep once it is sampling in the background
+                # (the motion is usually started after the first row)
+                yield from self._continuous_vary(instr.curr_angle, lambda: instr.angle_set,
+                                                 0.03, "Theta", stable_time, log_interval, log_path,
+                                                 tracker_getter=lambda: instr.tracker)
             else:
                 timer_i = 0
                 while timer_i < vary_criteria:
-                    # only z field is considered
-                    if abs(instr.curr_angle() - instr.angle_set) < 0.03:
+                    angle = instr.curr_angle()
+                    if abs(angle - instr.angle_set) < 0.03:
                         timer_i += 1
                     else:
                         timer_i = 0
-                    yield instr.curr_angle()
+                    yield angle
+
+    def _continuous_vary(self, getter, target_getter, tolerance, name: str, stable_time: float,
+                         log_interval: float, log_path: Optional[Path], *,
+                         tracker_getter: Optional[Callable[[], Optional[SlowChannelLogger]]] = None) \
+            -> Generator[float, None, None]:
+        """
+        the generator of the continuous vary mode, the row time is estimated as the middle between the
+        former and current call (the meters of the row are read in between)
+
+        Args:
+            stable_time (float): the time (s) the logged value should stay within the tolerance
+            tracker_getter (Callable): return the logger already sampling the channel in the background (e.g. the
+                motion tracker of the rotator), checked on every row, the own logger is stopped and the running
+                one is used from then on
+        """
+        logger = SlowChannelLogger(getter, interval=log_interval, target_getter=target_getter,
+                                   tolerance=tolerance, name=name)
+        used = [logger]
+        self.slow_loggers[name] = logger
+        logger.start()
+        t_prev = time.time()
+        try:
+            while True:
+                tracker = None if tracker_getter is None else tracker_getter()
+                if tracker is not None and tracker is not logger and tracker.running:
+                    logger.stop()
+                    logger = tracker
+                    used.append(tracker)
+                    self.slow_loggers[name] = tracker
+                if logger.stable_count * logger.interval >= stable_time:
+                    break
+                t_now = time.time()
+                yield logger.value_at((t_prev + t_now) / 2)
+                t_prev = t_now
+        finally:
+            logger.stop()
+            if log_path is not None and len(used) == 1:
+                logger.save(log_path)
+            elif log_path is not None:
+                pd.concat([used_logger.to_df() for used_logger in used]).sort_values("epoch").to_csv(
+                    log_path, sep=",", index=False, float_format="%.12f")
+
+    @staticmethod
+    def _sampled_sense(instr: Meter, sense_type: str, n_samples: int, sigma_clip: Optional[float],
+                       raw_path: Optional[Path]) -> Generator[list[float], None, None]:
+        """
+        the generator of the sense with several readings per point, only the summary is kept
+        (the raw readings are written to raw_path point by point if given)
+        """
+        stats = RunningStats(sigma_clip=sigma_clip)
+        raw_file = None
+        if raw_path is not None:
+            raw_file = open(raw_path, "w", newline="", encoding="utf-8")
+            raw_writer = csv.writer(raw_file)
+        try:
+            point = 0
+            while True:
+                stats.reset()
+                rows = []
+                for idx in range(n_samples):
+                    value = instr.sense_delay(type_str=sense_type)
+                    accepted = stats.add(value)
+                    if raw_file is not None:
+                        rows.append([point, idx, *np.atleast_1d(value).tolist(), int(accepted.all())])
+                if raw_file is not None:
+                    if point == 0:
+                        n_values = len(rows[0]) - 3
+                        raw_writer.writerow(["point", "sample", *[f"value{i}" for i in range(n_values)],
+                                             "accepted"])
+                    raw_writer.writerows(rows)
+                    raw_file.flush()
+                point += 1
+                yield stats.summary()
+        finally:
+            if raw_file is not None:
+                raw_file.close()
 
     def record_init(self, measure_mods: tuple[str], *var_tuple: float | str,
                     manual_columns: Optional[list[str]] = None, return_df: bool = False,
-                    special_folder: Optional[str] = None, with_timer: bool = True) \
+                    special_folder: Optional[str] = None, with_timer: bool = True, sense_stats: bool = False) \
             -> tuple[Path, int, Path] | tuple[Path, int, pd.DataFrame, Path]:
         """
         initialize the record of the measurement and the csv file;
@@ -354,6 +458,8 @@ class MeasureManager(DataPlot):
             return_df (bool): if the final record dataframe will be returned (default not, and saved as a member)
             special_folder (str): the special folder to store the record file (last subfolder, parents[0])
             with_timer (bool): whether to contain time generator
+            sense_stats (bool): whether the senses record the statistics of several readings,
+                the columns of each sense are then followed by the "_std" and "_n" columns
         Returns:
             Path: the file path
             int: the number of columns of the record
@@ -385,8 +491,13 @@ class MeasureManager(DataPlot):
             for name, detail in zip(list(pure_name_lst), mod_detail_lst):
                 if detail["source_sense"] == "source":
                     columns_lst.append(f"{name}_source")
-                elif detail["source_sense"] == "sense" and ac_dc == "ac":  # note the "sense" is assumed here
-                    columns_lst += ["X", "Y", "R", "Theta"]
+                elif detail["source_sense"] == "sense":
+                    # note the "sense" is assumed here
+                    sense_columns = ["X", "Y", "R", "Theta"] if ac_dc == "ac" else [name]
+                    if sense_stats:
+                        sense_columns = (sense_columns + [f"{i}_std" for i in sense_columns]
+                                         + [f"{i}_n" for i in sense_columns])
+                    columns_lst += sense_columns
                 else:
                     columns_lst.append(name)
 
@@ -442,8 +553,11 @@ class MeasureManager(DataPlot):
                          sweep_tables: list[list[float | str, ...]] | tuple[tuple[float | str, ...]] = None,
                          special_name: str = None, with_timer: bool = True, no_start_vary: bool = False,
                          ramp_intervals: list[float] | tuple[float] = None, vary_criteria: int = 10,
-                         field_ramp_rate: float = 0.2,
-                         special_mea: Literal["normal", "delta"] = "normal") -> dict:
+                         stable_time: float = 10, field_ramp_rate: float = 0.2,
+                         special_mea: Literal["normal", "delta"] = "normal", concurrent_ramp: bool = False,
+                         ramp_dependencies: Optional[dict[str, list[str]]] = None,
+                         continuous_vary: bool = False, n_samples: int = 1, sigma_clip: Optional[float] = None,
+                         raw_samples: bool = False) -> dict:
         """
         do the preset of measurements and return the generators, filepath and related info
         1. meter setup should be done before calling this method, they will be bound to generators
@@ -471,15 +585,30 @@ class MeasureManager(DataPlot):
             with_timer (bool): whether to contain time generator
             no_start_vary (bool): vary without starting from a fixed start
             ramp_intervals (list[float]): the intervals for ramping the source, used with care, note the correspondence
-            vary_criteria (int): the criteria (no of steps) to judge if the field/temperature is stable
+            vary_criteria (int): the criteria (no of rows) to judge if the field/temperature is stable,
+                used when continuous_vary is False
+            stable_time (float): the time (s) the logged T/B/Theta should stay within the tolerance to judge it
+                as stable, used instead of vary_criteria when continuous_vary is True (the rows are not
+                a fixed time step there)
             field_ramp_rate (float): the rate of the field ramp (T/min)
             special_mea (Literal["normal", "delta"]): whether to do the special measurement, "delta" means the delta current-reversal measurement
+            concurrent_ramp (bool): whether to ramp the fixed sources and T/B/Theta (fixed values or vary starts)
+                concurrently, the timeline is returned as "ramp_timeline"
+            ramp_dependencies (dict[str, list[str]]): the ordering constraints for concurrent ramps, the ramps are
+                named "src0", "src1"... (by the order of sources), "T", "B", "Theta",
+                e.g. {"B": ["src0"]} to finish ramping source 0 before the field changes
+            continuous_vary (bool): whether to log the varying T/B/Theta in the background and interpolate them
+                at the time of each row (see sense_apply), the logs are saved beside the csv file
+            n_samples (int): the number of readings of each sense meter per point, if larger than 1, only the mean,
+                std and count of the readings are recorded (columns "V", "V_std", "V_n", ...)
+            sigma_clip (float): reject the readings further than sigma_clip * std from the mean (with n_samples)
+            raw_samples (bool): whether to also save the raw readings (with n_samples) to "<file>_sense<idx>_raw.csv"
 
         Returns:
             dict: a dictionary containing the list of generators, dataframe csv filepath and record number
                 keys: "gen_lst"(combined list generator), "swp_idx" (indexes for sweeping generator, not including vary),
                 "file_path"(csv file), "record_num"(num of record data columns, without time),
-                "tmp_vary", "mag_vary", "angle_vary"
+                "tmp_vary", "mag_vary", "angle_vary", "ramp_timeline" (None if not concurrent_ramp)
                 (the function used to begin the varying of T/B/Theta,
                     e.g. start magnetic field varying by calling mag_vary(),
                     add reverse=True to reverse the varying direction, used to do circular varying)
@@ -504,14 +633,20 @@ class MeasureManager(DataPlot):
                                      sr830_current_resistor=sr830_current_resistor, if_combine_gen=if_combine_gen,
                                      sweep_tables=list(sweep_tables), special_name=special_name, with_timer=with_timer,
                                      no_start_vary=no_start_vary, ramp_intervals=ramp_intervals,
-                                     vary_criteria=vary_criteria, field_ramp_rate=field_ramp_rate)
+                                     vary_criteria=vary_criteria, stable_time=stable_time, field_ramp_rate=field_ramp_rate,
+                                     special_mea=special_mea, concurrent_ramp=concurrent_ramp,
+                                     ramp_dependencies=ramp_dependencies, continuous_vary=continuous_vary,
+                                     n_samples=n_samples, sigma_clip=sigma_clip, raw_samples=raw_samples)
             elif isinstance(sweep_tables, np.ndarray):
                 return self.get_measure_dict(measure_mods, *var_tuple,
                                              wrapper_lst=wrapper_lst, compliance_lst=compliance_lst,
                                              sr830_current_resistor=sr830_current_resistor, if_combine_gen=if_combine_gen,
                                              sweep_tables=sweep_tables.tolist(), special_name=special_name, with_timer=with_timer,
                                              no_start_vary=no_start_vary, ramp_intervals=ramp_intervals,
-                                             vary_criteria=vary_criteria, field_ramp_rate=field_ramp_rate)
+                                             vary_criteria=vary_criteria, stable_time=stable_time, field_ramp_rate=field_ramp_rate,
+                                             special_mea=special_mea, concurrent_ramp=concurrent_ramp,
+                                             ramp_dependencies=ramp_dependencies, continuous_vary=continuous_vary,
+                                             n_samples=n_samples, sigma_clip=sigma_clip, raw_samples=raw_samples)
             else:
                 raise TypeError("unsupported sweep_tables type")
 
@@ -520,9 +655,21 @@ class MeasureManager(DataPlot):
         assert len(src_lst) == len(compliance_lst), "The number of sources and compliance should be the same"
 
         # init record dataframe
-        file_path, record_num, record_plot_path = self.record_init(measure_mods, *var_tuple, special_folder = special_name)
+        file_path, record_num, record_plot_path = self.record_init(measure_mods, *var_tuple, special_folder = special_name,
+                                                                   sense_stats=n_samples > 1)
         rec_lst = [time_generator()] if with_timer else []
 
+        # ramps are launched directly, or collected and run concurrently after all modules are parsed
+        coordinator = RampCoordinator() if concurrent_ramp else None
+        if ramp_dependencies is None:
+            ramp_dependencies = {}
+
+        def launch_ramp(ramp_name: str, func, *args, **kwargs):
+            if coordinator is None:
+                func(*args, **kwargs)
+            else:
+                coordinator.add(ramp_name, func, *args, depends_on=ramp_dependencies.get(ramp_name), **kwargs)
+
         # =============assemble the record generators into one list==============
         # note multiple sweeps result in multidimensional mapping
         sweep_idx = []
@@ -545,9 +692,11 @@ class MeasureManager(DataPlot):
 
                 if ramp_intervals is not None:
                     interval = ramp_intervals.pop(0)
-                    wrapper_lst[idx].ramp_output(mod_i, src_mod[mod_i]["fix"], compliance=compliance_lst[idx], interval=interval)
+                    launch_ramp(f"src{idx}", wrapper_lst[idx].ramp_output, mod_i, src_mod[mod_i]["fix"],
+                                compliance=compliance_lst[idx], interval=interval)
                 else:
-                    wrapper_lst[idx].ramp_output(mod_i, src_mod[mod_i]["fix"], compliance=compliance_lst[idx])
+                    launch_ramp(f"src{idx}", wrapper_lst[idx].ramp_output, mod_i, src_mod[mod_i]["fix"],
+                                compliance=compliance_lst[idx])
                 rec_lst.append(constant_generator(src_mod[mod_i]["fix"]))
             elif src_mod[mod_i]["sweep_fix"] == "sweep":
                 if src_mod[mod_i]["mode"] == "manual":
@@ -569,23 +718,26 @@ class MeasureManager(DataPlot):
                 sweep_idx.append(idx)
         # sense part
         for idx, sense_mod in enumerate(sense_lst):
-            rec_lst.append(self.sense_apply(sense_mod["type"], wrapper_lst[idx + len(src_lst)]))
+            rec_lst.append(self.sense_apply(sense_mod["type"], wrapper_lst[idx + len(src_lst)], n_samples=n_samples,
+                                            sigma_clip=sigma_clip,
+                                            raw_path=file_path.with_name(f"{file_path.stem}_sense{idx}_raw.csv")
+                                            if raw_samples else None))
         # others part
         for idx, oth_mod in enumerate(oth_lst):
             if oth_mod["sweep_fix"] == "fixed":
                 if oth_mod["name"] == "T":
-                    self.instrs["itc"].ramp_to_temperature(oth_mod["fix"], wait=True)
+                    launch_ramp("T", self.instrs["itc"].ramp_to_temperature, oth_mod["fix"], wait=True)
                 elif oth_mod["name"] == "B":
-                    self.instrs["ips"].ramp_to_field(oth_mod["fix"], wait=True)
+                    launch_ramp("B", self.instrs["ips"].ramp_to_field, oth_mod["fix"], wait=True)
                 elif oth_mod["name"] == "Theta":
-                    self.instrs["rotator"].ramp_angle(oth_mod["fix"], wait=True)
+                    launch_ramp("Theta", self.instrs["rotator"].ramp_angle, oth_mod["fix"], wait=True)
                 rec_lst.append(self.sense_apply(oth_mod["name"]))
             elif oth_mod["sweep_fix"] == "vary":
                 if oth_mod["name"] == "T":
                     vary_mod.append("T")
                     vary_bound_T = (oth_mod["start"], oth_mod["stop"])
                     if not no_start_vary:
-                        self.instrs["itc"].ramp_to_temperature(oth_mod["start"], wait=True)
+                        launch_ramp("T", self.instrs["itc"].ramp_to_temperature, oth_mod["start"], wait=True)
 
                         def temp_vary(reverse: bool = False, oth_mod = oth_mod):
                             target = oth_mod["start"] if reverse else oth_mod["stop"]
@@ -602,7 +754,7 @@ class MeasureManager(DataPlot):
                             self.instrs["itc"].ramp_to_temperature(target, wait=False)
                 elif oth_mod["name"] == "B":
                     vary_mod.append("B")
-                    self.instrs["ips"].ramp_to_field(oth_mod["start"], wait=True)
+                    launch_ramp("B", self.instrs["ips"].ramp_to_field, oth_mod["start"], wait=True)
                     vary_bound_B = (oth_mod["start"], oth_mod["stop"])
 
                     def mag_vary(reverse: bool = False, oth_mod = oth_mod):
@@ -613,7 +765,7 @@ class MeasureManager(DataPlot):
                         self.instrs["ips"].ramp_to_field(target, rate=field_ramp_rate, wait=False)
                 elif oth_mod["name"] == "Theta":
                     vary_mod.append("Theta")
-                    self.instrs["rotator"].ramp_angle(oth_mod["start"], wait=True)
+                    launch_ramp("Theta", self.instrs["rotator"].ramp_angle, oth_mod["start"], wait=True)
                     vary_bound_Theta = (oth_mod["start"], oth_mod["stop"])
 
                     def angle_vary(reverse: bool = False, oth_mod = oth_mod):
@@ -621,11 +773,13 @@ class MeasureManager(DataPlot):
                         ini = oth_mod["stop"] if reverse else oth_mod["start"]
                         while abs(self.instrs["rotator"].curr_angle() - ini) > 0.3:
                             self.instrs["rotator"].ramp_angle(ini, wait=True)
-                        self.instrs["rotator"].ramp_angle(target, wait=False)
+                        self.instrs["rotator"].ramp_angle(target, wait=False, track=continuous_vary)
                 else:
                     raise ValueError("Vary module not recognized")
 
-                rec_lst.append(self.sense_apply(oth_mod["name"], if_during_vary=True, vary_criteria=vary_criteria))
+                rec_lst.append(self.sense_apply(oth_mod["name"], if_during_vary=True, vary_criteria=vary_criteria,
+                                                continuous=continuous_vary, stable_time=stable_time,
+                                                log_path=file_path.with_name(f"{file_path.stem}_{oth_mod['name']}_log.csv")))
             elif oth_mod["sweep_fix"] == "sweep":
                 if oth_mod["mode"] == "manual":
                     sweep_table = sweep_tables.pop(0)
@@ -638,6 +792,10 @@ class MeasureManager(DataPlot):
                              sweepmode=oth_mod["mode"],
                              sweep_table=sweep_table))
                 sweep_idx.append(idx + len(src_lst) + len(sense_lst))
+        if coordinator is not None:
+            coordinator.run()
+            coordinator.report()
+
         if if_combine_gen:
             total_gen = combined_generator_list(rec_lst)
         else:
@@ -654,7 +812,8 @@ class MeasureManager(DataPlot):
             "vary_mod": vary_mod,
             "tmp_vary": None if "T" not in vary_mod else (temp_vary, lambda: self.instrs["itc"].temperature, lambda: self.instrs["itc"].temperature_set, vary_bound_T),
             "mag_vary": None if "B" not in vary_mod else (mag_vary, lambda: self.instrs["ips"].field, lambda: self.instrs["ips"].field_set, vary_bound_B),
-            "angle_vary": None if "Theta" not in vary_mod else (angle_vary, self.instrs["rotator"].curr_angle, lambda: self.instrs["rotator"].angle_set, vary_bound_Theta)
+            "angle_vary": None if "Theta" not in vary_mod else (angle_vary, self.instrs["rotator"].curr_angle, lambda: self.instrs["rotator"].angle_set, vary_bound_Theta),
+            "ramp_timeline": None if coordinator is None else coordinator.timeline
         }
 
     def watch_sense(self, sense_mods: tuple[str], time_len: Optional[int] = None, time_step: int = 1,
@@ -749,6 +908,7 @@ class MeasureManager(DataPlot):
         """
         return a list of visa resources
         """
+        import pyvisa
         return pyvisa.ResourceManager().list_resources()
 
     @staticmethod
@@ -766,26 +926,25 @@ class MeasureManager(DataPlot):
     @staticmethod
     def sweep_values(start_value: float, end_value: float, step: float,
                      mode: Literal["start-end", "start-end-start", "0-start-end-0", "0-start-end-start-0"]) \
-            -> Generator[float, None, None]:
+            -> SweepPlan:
         """
-        generate sweeping sequence according to the mode
+        generate sweeping sequence according to the mode (a SweepPlan, iterated as floats, with len and values)
         NOTE: the values at ends will be repeated
         """
+        plan = SweepPlan()
         if mode == "start-end":
-            yield from gen_seq(start_value, end_value, step)
+            plan.add_segment(start_value, end_value, step)
         elif mode == "start-end-start":
-            yield from gen_seq(start_value, end_value, step)
-            yield from gen_seq(end_value, start_value, -step)
+            plan.add_segment(start_value, end_value, step).add_segment(end_value, start_value, step)
         elif mode == "0-start-end-0":
-            yield from gen_seq(0, start_value, step)
-            yield from gen_seq(start_value, end_value, step)
-            yield from gen_seq(end_value, 0, -step)
-
+            plan.add_segment(0, start_value, step).add_segment(start_value, end_value, step)
+            plan.add_segment(end_value, 0, step)
         elif mode == "0-start-end-start-0":
-            yield from gen_seq(0, start_value, step)
-            yield from gen_seq(start_value, end_value, step)
-            yield from gen_seq(end_value, start_value, -step)
-            yield from gen_seq(start_value, 0, -step)
+            plan.add_segment(0, start_value, step).add_segment(start_value, end_value, step)
+            plan.add_segment(end_value, start_value, step).add_segment(start_value, 0, step)
+        else:
+            raise ValueError("mode not recognized")
+        return plan
 
     @staticmethod
     def extract_info_mods(measure_mods: tuple[str], *var_tuple: float | str) \
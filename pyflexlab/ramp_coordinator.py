@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+
+"""
+This module provides a coordinator to run independent ramps (source meters, magnetic field,
+temperature, rotator angle, ...) concurrently instead of one after another, so the preparation
+of a measurement only waits for the slowest ramp instead of the sum of all ramps.
+
+Ordering constraints can be declared by depends_on (e.g. the sources should be ramped to zero
+before the field changes), a ramp is launched only after all its dependencies have finished.
+
+Flow:
+    coordinator = RampCoordinator()
+    coordinator.add("src0", wrapper.ramp_output, "curr", 0, compliance=1)
+    coordinator.add("B", ips.ramp_to_field, 1, wait=True, depends_on="src0")
+    coordinator.add("T", itc.ramp_to_temperature, 10, wait=True)
+    coordinator.run()  # wait for all ramps
+    coordinator.report()
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+
+class RampCoordinator:
+    """
+    launch the added ramps in threads (honoring the dependencies), wait for all of them
+    and record the timeline of each ramp
+    """
+
+    def __init__(self):
+        self.tasks: dict[str, dict] = {}
+        self.timeline: dict[str, dict] = {}
+        """{name: {"start", "end", "duration", "status", "error"}}, times relative to the start of run"""
+        self._t0: float = 0.0
+
+    def add(self, name: str, func: Callable, *args, depends_on: Optional[str | list[str] | tuple[str, ...]] = None,
+            **kwargs) -> "RampCoordinator":
+        """
+        add a ramp, the func should block until the ramp is finished (e.g. wait=True)
+
+        Args:
+            name (str): the unique name of the ramp
+            func (Callable): the function doing the ramp, called as func(*args, **kwargs)
+            depends_on (str | list[str]): the ramps that must finish before this one starts
+        """
+        if name in self.tasks:
+            raise ValueError(f"ramp {name} already added")
+        if depends_on is None:
+            depends_on = []
+        elif isinstance(depends_on, str):
+            depends_on = [depends_on]
+        self.tasks[name] = {"func": func, "args": args, "kwargs": kwargs, "depends_on": list(depends_on),
+                            "done": threading.Event()}
+        return self
+
+    def _check_dependencies(self) -> None:
+        """
+        check if all dependencies exist and there is no cycle
+        """
+        for name, task in self.tasks.items():
+            for dep in task["depends_on"]:
+                if dep not in self.tasks:
+                    raise ValueError(f"ramp {name} depends on {dep}, which is not added")
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"circular dependency found at ramp {name}")
+            visiting.add(name)
+            for dep in self.tasks[name]["depends_on"]:
+                visit(dep)
+            visiting.remove(name)
+            visited.add(name)
+
+        for name in self.tasks:
+            visit(name)
+
+    def _run_task(self, name: str) -> None:
+        task = self.tasks[name]
+        record = self.timeline[name]
+        try:
+            for dep in task["depends_on"]:
+                self.tasks[dep]["done"].wait()
+                if self.timeline[dep]["status"] != "done":
+                    record["status"] = "skipped"
+                    record["error"] = f"dependency {dep} {self.timeline[dep]['status']}"
+                    return
+            record["start"] = time.perf_counter() - self._t0
+            record["status"] = "running"
+            task["func"](*task["args"], **task["kwargs"])
+            record["status"] = "done"
+        except Exception as exc:
+            record["status"] = "failed"
+            record["error"] = repr(exc)
+        finally:
+            if record["start"] is not None:
+                record["end"] = time.perf_counter() - self._t0
+                record["duration"] = record["end"] - record["start"]
+            task["done"].set()
+
+    def run(self, *, timeout: Optional[float] = None, raise_error: bool = True) -> dict[str, dict]:
+        """
+        launch all ramps and wait for them, return the timeline
+
+        Args:
+            timeout (float): the max time (s) to wait for all ramps, None for no limit
+            raise_error (bool): whether to raise RuntimeError if any ramp failed
+        """
+        self._check_dependencies()
+        self.timeline = {name: {"start": None, "end": None, "duration": None, "status": "waiting", "error": None}
+                         for name in self.tasks}
+        for task in self.tasks.values():
+            task["done"].clear()
+        self._t0 = time.perf_counter()
+        threads = [threading.Thread(target=self._run_task, args=(name,), name=f"ramp-{name}", daemon=True)
+                   for name in self.tasks]
+        for thread in threads:
+            thread.start()
+        deadline = None if timeout is None else self._t0 + timeout
+        for thread in threads:
+            thread.join(None if deadline is None else max(deadline - time.perf_counter(), 0))
+        unfinished = [name for name, task in self.tasks.items() if not task["done"].is_set()]
+        if unfinished:
+            raise TimeoutError(f"ramps not finished in {timeout} s: {unfinished}")
+        failed = {name: rec["error"] for name, rec in self.timeline.items() if rec["status"] != "done"}
+        if failed and raise_error:
+            raise RuntimeError(f"ramps failed: {failed}")
+        return self.timeline
+
+    def report(self) -> None:
+        """
+        print the timeline of the ramps
+        """
+        total = max((rec["end"] for rec in self.timeline.values() if rec["end"] is not None), default=0)
+        print(f"ramps finished in {total:.2f} s "
+              f"(sequential would be {sum(rec['duration'] or 0 for rec in self.timeline.values()):.2f} s)")
+        for name, rec in self.timeline.items():
+            if rec["start"] is None:
+                print(f"{name:<10} {rec['status']} ({rec['error']})")
+                continue
+            print(f"{name:<10} {rec['start']:8.2f} -> {rec['end']:8.2f} s  {rec['status']}"
+                  + (f" ({rec['error']})" if rec["error"] is not None else ""))
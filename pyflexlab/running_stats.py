@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+"""
+This module provides the streaming statistics used to reduce several readings per point
+(sense_apply with n_samples > 1) into mean, standard deviation and count without keeping the readings.
+
+The statistics are updated by Welford's algorithm (numerically stable, constant memory), optionally
+with sigma-clipping: once enough readings are accumulated, a reading further than sigma_clip * std
+from the current mean is rejected (not counted in the statistics). As the clipping is done online, it
+depends on the order of the readings, which is fine for the repeated readings of one point.
+
+Flow:
+    stats = RunningStats(sigma_clip=3)
+    for _ in range(10):
+        stats.add(meter.sense("volt"))  # scalar or sequence (e.g. X, Y, R, Theta of SR830)
+    stats.mean, stats.std, stats.n
+    stats.reset()
+"""
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+class RunningStats:
+    """
+    element-wise running mean / std / count of scalar or fixed-length readings
+    """
+
+    def __init__(self, *, sigma_clip: Optional[float] = None, clip_after: int = 5):
+        """
+        Args:
+            sigma_clip (float): reject readings further than sigma_clip * std from the mean, None for no clipping
+            clip_after (int): the min number of accepted readings before the clipping starts
+        """
+        self.sigma_clip = sigma_clip
+        self.clip_after = clip_after
+        self._n: Optional[np.ndarray] = None
+        self._mean: Optional[np.ndarray] = None
+        self._m2: Optional[np.ndarray] = None
+        self.rejected: Optional[np.ndarray] = None
+
+    def reset(self) -> None:
+        self._n = self._mean = self._m2 = self.rejected = None
+
+    def add(self, value: float | Sequence[float]) -> np.ndarray:
+        """
+        add one reading, return the mask of the accepted elements
+        """
+        x = np.atleast_1d(np.asarray(value, dtype=float))
+        if self._n is None:
+            self._n = np.zeros(x.shape)
+            self._mean = np.zeros(x.shape)
+            self._m2 = np.zeros(x.shape)
+            self.rejected = np.zeros(x.shape, dtype=int)
+        accept = np.isfinite(x)
+        if self.sigma_clip is not None:
+            std = self._std()
+            clipped = (self._n >= self.clip_after) & (np.abs(x - self._mean) > self.sigma_clip * std)
+            accept &= ~clipped
+            self.rejected += clipped
+        n = self._n + accept
+        delta = np.where(accept, x - self._mean, 0)
+        self._mean = self._mean + np.divide(delta, n, out=np.zeros_like(delta), where=n > 0)
+        self._m2 = self._m2 + delta * np.where(accept, x - self._mean, 0)
+        self._n = n
+        return accept
+
+    def _std(self) -> np.ndarray:
+        return np.sqrt(np.divide(self._m2, self._n - 1, out=np.full(self._m2.shape, np.nan), where=self._n > 1))
+
+    @property
+    def mean(self) -> np.ndarray:
+        return np.where(self._n > 0, self._mean, np.nan)
+
+    @property
+    def std(self) -> np.ndarray:
+        """the sample standard deviation (nan with less than 2 readings)"""
+        return self._std()
+
+    @property
+    def n(self) -> np.ndarray:
+        return self._n.astype(int)
+
+    def summary(self) -> list[float]:
+        """the flattened [means..., stds..., counts...] used as the record of a point"""
+        return [*self.mean.tolist(), *self.std.tolist(), *self.n.tolist()]
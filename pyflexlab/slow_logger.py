@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+"""
+This module provides the logger for slow channels (field, temperature, angle) used in the continuous
+("on-the-fly") vary mode: the slow channel is polled in a background thread with timestamps, and the
+main measurement loop only interpolates the logged trace at the time of each row, so the density of
+the data is limited by the meters instead of the magnet/temperature controller.
+
+The stability judgement of the vary (value within tolerance of the target for some consecutive
+samples) is also done in the logger thread, so no extra query is made in the measurement loop.
+
+Flow:
+    logger = SlowChannelLogger(lambda: ips.field, target_getter=lambda: ips.field_set, tolerance=1E-3)
+    logger.start()
+    (measure, and use logger.value_at(time.time()) for each row)
+    logger.stop()
+    logger.save("field_log.csv")
+    merged_df = merge_by_time(data_df, pd.read_csv("field_log.csv"), "B")  # re-align afterwards if needed
+"""
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .constants import timestr_convert
+
+
+class SlowChannelLogger:
+    """
+    poll a slow channel in a background thread and interpolate the logged trace at given times
+    """
+
+    def __init__(self, getter: Callable[[], float], *, interval: float = 0.2,
+                 target_getter: Optional[Callable[[], float]] = None,
+                 tolerance: Optional[float | Callable[[float], float]] = None, name: str = "slow"):
+        """
+        Args:
+            getter (Callable): the function reading the slow channel
+            interval (float): the polling interval (s)
+            target_getter (Callable): the function reading the target value (for the stability judgement)
+            tolerance (float | Callable): the tolerance of the stability judgement, or a function of the target
+            name (str): the name of the channel (used as the column name when saving)
+        """
+        self.getter = getter
+        self.interval = interval
+        self.target_getter = target_getter
+        self.tolerance = tolerance
+        self.name = name
+        self.stable_count = 0
+        """the number of consecutive samples within the tolerance of the target"""
+        self._times: list[float] = []
+        self._values: list[float] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _poll(self) -> None:
+        """
+        take one sample and update the stability counter
+        """
+        value = float(self.getter())
+        t = time.time()
+        with self._lock:
+            self._times.append(t)
+            self._values.append(value)
+        if self.target_getter is not None and self.tolerance is not None:
+            target = float(self.target_getter())
+            tolerance = self.tolerance(target) if callable(self.tolerance) else self.tolerance
+            self.stable_count = self.stable_count + 1 if abs(value - target) < tolerance else 0
+
+    def _run(self) -> None:
+        next_time = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self._poll()
+            except Exception as exc:
+                print(f"{self.name} logger: reading failed ({exc!r})")
+            next_time += self._next_interval()
+            self._stop.wait(max(next_time - time.monotonic(), 0))
+
+    def _next_interval(self) -> float:
+        """the time (s) to the next sample, overridden by loggers with adaptive polling"""
+        return self.interval
+
+    def start(self) -> None:
+        """
+        take the first sample synchronously and start polling in the background
+        """
+        if self.running:
+            return
+        self._stop.clear()
+        self._poll()
+        self._thread = threading.Thread(target=self._run, name=f"slow-logger-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def trace(self) -> tuple[np.ndarray, np.ndarray]:
+        """return a copy of the logged (epoch times, values)"""
+        with self._lock:
+            return np.array(self._times), np.array(self._values)
+
+    def value_at(self, t: float | np.ndarray) -> float | np.ndarray:
+        """
+        interpolate the logged trace at the epoch time(s) t, times later than the last sample are
+        linearly extrapolated from the last two samples (limited to one polling interval)
+        """
+        times, values = self.trace()
+        if len(times) == 0:
+            return np.nan if np.isscalar(t) else np.full(np.shape(t), np.nan)
+        result = np.interp(t, times, values)
+        if len(times) >= 2 and times[-1] > times[-2]:
+            slope = (values[-1] - values[-2]) / (times[-1] - times[-2])
+            ahead = np.clip(np.asarray(t, dtype=float) - times[-1], 0, self.interval)
+            result = result + slope * ahead
+        return float(result) if np.isscalar(t) else result
+
+    def to_df(self) -> pd.DataFrame:
+        """the logged trace with the time column in the same format as the measurement records"""
+        times, values = self.trace()
+        return pd.DataFrame({"time": [datetime.fromtimestamp(t).isoformat(sep="_", timespec="milliseconds")
+                                      for t in times], "epoch": times, self.name: values})
+
+    def save(self, file_path: Path | str) -> None:
+        self.to_df().to_csv(file_path, sep=",", index=False, float_format="%.12f")
+
+
+def merge_by_time(data_df: pd.DataFrame, log_df: pd.DataFrame, column: str, *, time_col: str = "time",
+                  log_column: Optional[str] = None, format_str: str = "%Y-%m-%d_%H:%M:%S.%f") -> pd.DataFrame:
+    """
+    replace (or add) the column of the data by the slow channel log interpolated at the time of each row
+
+    Args:
+        data_df (pd.DataFrame): the measurement records with the time column
+        log_df (pd.DataFrame): the slow channel log (SlowChannelLogger.save / to_df)
+        column (str): the column of data_df to be filled
+        time_col (str): the time column of data_df (and log_df if no "epoch" column)
+        log_column (str): the value column of log_df, default to the last column
+        format_str (str): the format of the time strings
+    """
+    log_column = log_df.columns[-1] if log_column is None else log_column
+    data_t = np.array([dt.timestamp() for dt in timestr_convert(data_df[time_col], format_str)])
+    if "epoch" in log_df.columns:
+        log_t = log_df["epoch"].to_numpy(dtype=float)
+    else:
+        log_t = np.array([dt.timestamp() for dt in timestr_convert(log_df[time_col], format_str)])
+    merged = data_df.copy()
+    merged[column] = np.interp(data_t, log_t, log_df[log_column].to_numpy(dtype=float))
+    return merged
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+"""
+This module provides a predictive detector for the stabilization of a slowly settling quantity
+(mainly the temperature in ITC.wait_for_temperature).
+
+The recent trace is fitted to a settling model over a grid of time constants tau:
+- first order:  T(t) = T_inf + A * exp(-t/tau)
+- second order (critically damped):  T(t) = T_inf + (A + B * t) * exp(-t/tau)
+for a fixed tau both models are linear in the amplitudes, so each tau costs one least-squares fit,
+the model with the lower BIC is used.
+
+The quantity is considered stable when
+- the fitted value is within the tolerance band around the target
+- the predicted remaining excursion (|T(now) - T_inf|) is below half of the tolerance
+- the drift rate dT/dt is below drift_tol
+which avoids waiting for a fixed number of checks when the trace is already settled, and also
+provides the estimated time to reach the band on slow approaches.
+
+Flow:
+    detector = StabilityDetector(target, tolerance)
+    while not detector.update(time.time(), read_value()):
+        print(detector.eta)
+        time.sleep(1)
+"""
+from typing import Optional
+
+import numpy as np
+
+
+class StabilityDetector:
+    """
+    fit the recent trace to a settling model and judge if it is stable
+    """
+
+    def __init__(self, target: float, tolerance: float, *, drift_tol: Optional[float] = None,
+                 window: float = 300, min_points: int = 8, tau_grid: Optional[np.ndarray] = None):
+        """
+        Args:
+            target (float): the target value
+            tolerance (float): the half width of the band around the target
+            drift_tol (float): the max drift rate (unit/s) to be considered stable, default to tolerance / 30 (s)
+            window (float): only the points in the last window (s) are used for fitting
+            min_points (int): the min number of points before any prediction is made
+            tau_grid (np.ndarray): the time constants (s) to try, default to 1 s ~ 3000 s (log spaced)
+        """
+        self.target = target
+        self.tolerance = abs(tolerance)
+        self.drift_tol = self.tolerance / 30 if drift_tol is None else abs(drift_tol)
+        self.window = window
+        self.min_points = min_points
+        self.tau_grid = np.logspace(0, 3.5, 36) if tau_grid is None else np.asarray(tau_grid, dtype=float)
+        self._t: list[float] = []
+        self._v: list[float] = []
+        self.fit: Optional[dict] = None
+        """{"order", "tau", "coef", "t0", "value", "final", "drift", "rms"} of the last fit"""
+
+    def reset(self, target: Optional[float] = None) -> None:
+        """clear the trace (and optionally change the target)"""
+        if target is not None:
+            self.target = target
+        self._t, self._v = [], []
+        self.fit = None
+
+    def update(self, t: float, value: float) -> bool:
+        """
+        add one point (time in s, value) and return whether the trace is stable
+        """
+        self._t.append(t)
+        self._v.append(value)
+        while self._t[-1] - self._t[0] > self.window and len(self._t) > self.min_points:
+            self._t.pop(0)
+            self._v.pop(0)
+        if len(self._t) < self.min_points:
+            self.fit = None
+            return False
+        self.fit = self._fit(np.asarray(self._t), np.asarray(self._v))
+        return self.is_stable
+
+    @staticmethod
+    def _basis(t: np.ndarray, tau: float, order: int) -> np.ndarray:
+        decay = np.exp(-t / tau)
+        if order == 1:
+            return np.column_stack((np.ones_like(t), decay))
+        return np.column_stack((np.ones_like(t), decay, t * decay))
+
+    def _fit(self, t: np.ndarray, v: np.ndarray) -> dict:
+        """
+        scan the tau grid for both models and return the best fit
+        """
+        t0 = t[0]
+        t_rel = t - t0
+        n = len(t)
+        best = None
+        for order in (1, 2):
+            for tau in self.tau_grid:
+                basis = self._basis(t_rel, tau, order)
+                coef, *_ = np.linalg.lstsq(basis, v, rcond=None)
+                rss = float(np.sum((basis @ coef - v) ** 2))
+                bic = n * np.log(rss / n + 1E-30) + basis.shape[1] * np.log(n)
+                if best is None or bic < best["bic"]:
+                    best = {"order": order, "tau": float(tau), "coef": coef, "bic": bic, "rss": rss}
+        t_now = t_rel[-1]
+        coef, tau = best["coef"], best["tau"]
+        decay = np.exp(-t_now / tau)
+        if best["order"] == 1:
+            value = coef[0] + coef[1] * decay
+            drift = -coef[1] / tau * decay
+        else:
+            value = coef[0] + (coef[1] + coef[2] * t_now) * decay
+            drift = (coef[2] - (coef[1] + coef[2] * t_now) / tau) * decay
+        return {"order": best["order"], "tau": tau, "coef": coef, "t0": float(t0), "value": float(value),
+                "final": float(coef[0]), "drift": float(drift), "rms": float(np.sqrt(best["rss"] / n))}
+
+    def predict(self, t: float) -> float:
+        """the value predicted by the last fit at time t"""
+        if self.fit is None:
+            return float("nan")
+        t_rel = np.atleast_1d(float(t) - self.fit["t0"])
+        return float((self._basis(t_rel, self.fit["tau"], self.fit["order"]) @ self.fit["coef"])[0])
+
+    @property
+    def residual(self) -> float:
+        """the predicted remaining excursion |T(now) - T_inf|"""
+        return float("inf") if self.fit is None else abs(self.fit["value"] - self.fit["final"])
+
+    @property
+    def drift(self) -> float:
+        """the fitted drift rate (unit/s) at the last point"""
+        return float("inf") if self.fit is None else self.fit["drift"]
+
+    @property
+    def is_stable(self) -> bool:
+        if self.fit is None:
+            return False
+        return (abs(self.fit["value"] - self.target) < self.tolerance and self.residual < self.tolerance / 2
+                and abs(self.fit["drift"]) < self.drift_tol)
+
+    @property
+    def eta(self) -> float:
+        """
+        the estimated time (s) from the last point to stability, inf if the fitted final value is out of the band
+        """
+        if self.fit is None or abs(self.fit["final"] - self.target) >= self.tolerance:
+            return float("inf")
+        if self.is_stable:
+            return 0.0
+        # time for the excursion to drop below tolerance/2 and the drift below drift_tol
+        # (the t*exp term of the second order model is approximated by its exponential envelope)
+        tau = self.fit["tau"]
+        t_res = tau * np.log(max(self.residual / (self.tolerance / 2), 1))
+        t_drift = tau * np.log(max(abs(self.fit["drift"]) / self.drift_tol, 1))
+        return float(max(t_res, t_drift))
+
+    @property
+    def settled_duration(self) -> float:
+        """the time (s) the trace has continuously stayed within the band until the last point"""
+        if not self._t:
+            return 0.0
+        start = self._t[-1]
+        for t, v in zip(reversed(self._t), reversed(self._v)):
+            if abs(v - self.target) >= self.tolerance:
+                break
+            start = t
+        return self._t[-1] - start
+
+    def status_str(self) -> str:
+        """short status for the progress bar"""
+        if self.fit is None:
+            return f"collecting ({len(self._t)}/{self.min_points})"
+        return (f"tau: {self.fit['tau']:.0f}s, drift: {self.fit['drift'] * 60:.3g}/min, "
+                f"eta: {self.eta:.0f}s")
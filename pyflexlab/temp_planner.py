@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+
+"""
+This module provides an (opt-in) planner choosing the VTI offset, needle valve pressure and ramp rate
+for each temperature step of ITCMercury, aiming to minimize the time-to-stable.
+
+The planner learns from the logged ramps: every waited ramp_to_temperature of an ITCMercury with a
+planner attached is recorded as (start, target, action, time-to-stable). The time of an action for a
+new step is predicted by a ridge regression of log(time) over the records of the same action
+(features: log of the step size and the target temperature, split by the direction). The action with
+the shortest predicted time is chosen only when both it and the default action have enough support in
+the records and the gain is larger than the margin, otherwise the default action (the existing behaviour: VTI from calculate_vti_temp, pressure from
+correction_ramping, no ramp rate limit) is used.
+
+A toy thermal model (SimThermalModel) is provided for offline evaluation of the planner.
+
+Flow:
+    planner = ThermalPlanner("planner_log.json")
+    itc.planner = planner  # records every waited ramp from now on
+    itc.ramp_to_temperature(10, plan=True)  # use the planned action
+    planner.summary()
+or offline:
+    ThermalPlanner.evaluate(SimThermalModel(), n_train=300, n_test=50)
+"""
+import json
+from pathlib import Path
+from typing import Literal, Optional
+
+import numpy as np
+
+# the same table as MercuryITC.calculate_vti_temp
+VTI_TABLE = np.array([1.3, 1.5, 2, 4, 15, 40, 90, 190, 290])
+PROBE_TABLE = np.array([1.5, 1.7, 6, 10, 20, 50, 100, 200, 300])
+
+
+def default_vti_temp(probe_temp: float) -> float:
+    """the default VTI set point (same as MercuryITC.calculate_vti_temp)"""
+    return float(np.interp(probe_temp, PROBE_TABLE, VTI_TABLE))
+
+
+def default_pressure(temp: float, trend: Literal["up", "down", "up-huge", "down-huge"]) -> float:
+    """the pressure set by ITCMercury.correction_ramping at the given temperature and trend"""
+    if trend == "up-huge":
+        return 8
+    if trend == "down-huge":
+        if temp >= 5:
+            return 25
+        return 8 if temp > 2 else 3
+    return 3 if temp <= 2.3 else 8
+
+
+def get_trend(start: float, target: float) -> Literal["up", "down", "up-huge", "down-huge"]:
+    """the trend used by ITC.wait_for_temperature"""
+    if start < target - 100:
+        return "up-huge"
+    if start > target + 100:
+        return "down-huge"
+    return "up" if start < target else "down"
+
+
+class ThermalPlanner:
+    """
+    learn the time-to-stable of the actions from the logged ramps and plan the action for each step
+
+    an action is a dict {"vti_scale", "pres", "ramp_rate"}:
+        vti_scale: scale of the default probe-VTI difference (1 for default)
+        pres: the fixed needle valve pressure (mbar), None for the default correction_ramping
+        ramp_rate: the probe ramp rate (K/min), None for no limit
+    """
+    DEFAULT_ACTION = {"vti_scale": 1.0, "pres": None, "ramp_rate": None}
+
+    def __init__(self, log_path: Optional[Path | str] = None, *, vti_scales: tuple[float, ...] = (0.8, 1.0, 1.2),
+                 pressures: tuple[Optional[float], ...] = (None, 3, 15),
+                 ramp_rates: tuple[Optional[float], ...] = (None, 5), ridge: float = 0.1,
+                 min_support: float = 5, margin: float = 0.1, explore: float = 0.0, seed: Optional[int] = None):
+        """
+        Args:
+            log_path (Path | str): the json file to load and save the records, None to keep in memory only
+            vti_scales, pressures, ramp_rates: the candidates of the actions (the default ones are always included)
+            ridge (float): the ridge regularization of the regression
+            min_support (float): the min number of records (same action and direction) for a prediction to be trusted
+            margin (float): the min relative gain over the default action to use another action
+            explore (float): the probability to try a random candidate (to collect records for the learning)
+            seed (int): the seed of the random exploration
+        """
+        self.log_path = None if log_path is None else Path(log_path)
+        self.candidates = [{"vti_scale": float(s), "pres": p, "ramp_rate": r}
+                           for s in vti_scales for p in pressures for r in ramp_rates]
+        if self.DEFAULT_ACTION not in self.candidates:
+            self.candidates.insert(0, dict(self.DEFAULT_ACTION))
+        self.ridge = ridge
+        self.min_support = min_support
+        self.margin = margin
+        self.explore = explore
+        self.rng = np.random.default_rng(seed)
+        self.records: list[dict] = []
+        """{"start", "target", "vti_scale", "pres", "ramp_rate", "time"}"""
+        if self.log_path is not None and self.log_path.exists():
+            self.load(self.log_path)
+
+    @staticmethod
+    def action_key(action: dict) -> tuple:
+        return float(action["vti_scale"]), action["pres"], action["ramp_rate"]
+
+    def record(self, start: float, target: float, action: dict, time_to_stable: float) -> None:
+        """
+        add a logged ramp, saved to the log file if given
+        """
+        self.records.append({"start": float(start), "target": float(target), "vti_scale": float(action["vti_scale"]),
+                             "pres": action["pres"], "ramp_rate": action["ramp_rate"], "time": float(time_to_stable)})
+        if self.log_path is not None:
+            self.save(self.log_path)
+
+    @staticmethod
+    def features(start: float, target: float) -> np.ndarray:
+        """the regression features of a step: log of the step size and the target, split by the direction"""
+        down = 1.0 if target < start else 0.0
+        log_delta = np.log(abs(target - start) + 0.01 * target)
+        log_target = np.log(target)
+        return np.array([1 - down, down, (1 - down) * log_delta, down * log_delta,
+                         (1 - down) * log_target, down * log_target])
+
+    def predict(self, start: float, target: float, action: dict) -> tuple[float, float]:
+        """
+        predict the time-to-stable (s) of the action for the step by a ridge regression of log(time)
+        over the records of the same action, return (time, support), the support is the number of
+        records of the action in the same direction (time is nan if no support)
+        """
+        key = self.action_key(action)
+        down = target < start
+        recs = [rec for rec in self.records if self.action_key(rec) == key]
+        support = float(sum((rec["target"] < rec["start"]) == down for rec in recs))
+        if support == 0:
+            return float("nan"), 0.0
+        feats = np.array([self.features(rec["start"], rec["target"]) for rec in recs])
+        log_times = np.log(np.array([rec["time"] for rec in recs]))
+        coef = np.linalg.solve(feats.T @ feats + self.ridge * np.eye(feats.shape[1]), feats.T @ log_times)
+        return float(np.exp(self.features(start, target) @ coef)), support
+
+    def plan(self, start: float, target: float) -> dict:
+        """
+        return the action for the step (the default action unless another one is confidently better)
+        """
+        if self.explore > 0 and self.rng.random() < self.explore:
+            return dict(self.candidates[self.rng.integers(len(self.candidates))])
+        default_time, default_support = self.predict(start, target, self.DEFAULT_ACTION)
+        if default_support < self.min_support:
+            return dict(self.DEFAULT_ACTION)
+        best, best_time = self.DEFAULT_ACTION, default_time
+        for action in self.candidates:
+            pred_time, support = self.predict(start, target, action)
+            if support >= self.min_support and pred_time < best_time:
+                best, best_time = action, pred_time
+        if best_time < default_time * (1 - self.margin):
+            return dict(best)
+        return dict(self.DEFAULT_ACTION)
+
+    @staticmethod
+    def vti_setpoint(target: float, action: dict) -> float:
+        """the VTI set point of the action"""
+        vti = target - action["vti_scale"] * (target - default_vti_temp(target))
+        return float(max(vti, VTI_TABLE[0]))
+
+    def save(self, file_path: Path | str) -> None:
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(self.records, f, indent=1)
+
+    def load(self, file_path: Path | str) -> None:
+        with open(file_path, "r", encoding="utf-8") as f:
+            self.records = json.load(f)
+
+    def summary(self) -> None:
+        """print the mean time-to-stable of each recorded action"""
+        groups: dict[tuple, list[float]] = {}
+        for rec in self.records:
+            groups.setdefault(self.action_key(rec), []).append(rec["time"])
+        print(f"{len(self.records)} records")
+        for key, times in sorted(groups.items(), key=lambda x: np.mean(x[1])):
+            print(f"vti_scale {key[0]:<5} pres {str(key[1]):<5} ramp_rate {str(key[2]):<5} "
+                  f"n {len(times):<4} mean {np.mean(times):8.1f} s")
+
+    @staticmethod
+    def evaluate(model: "SimThermalModel", *, n_train: int = 300, n_test: int = 50, seed: Optional[int] = 0,
+                 **planner_kwargs) -> dict:
+        """
+        offline evaluation: train a planner on random actions simulated by the model, then compare the
+        total time of the planned and default actions on random test steps
+
+        Args:
+            model (SimThermalModel): the thermal model used to simulate the steps
+            n_train (int): the number of random steps for training
+            n_test (int): the number of test steps
+            seed (int): the seed of the random steps
+        """
+        rng = np.random.default_rng(seed)
+        planner = ThermalPlanner(seed=seed, **planner_kwargs)
+        temps = lambda n: np.exp(rng.uniform(np.log(1.5), np.log(300), n))
+        for start, target in zip(temps(n_train), temps(n_train)):
+            action = planner.candidates[rng.integers(len(planner.candidates))]
+            planner.record(start, target, action, model.time_to_stable(start, target, action))
+        default_total = planned_total = 0.0
+        for start, target in zip(temps(n_test), temps(n_test)):
+            default_total += model.time_to_stable(start, target, ThermalPlanner.DEFAULT_ACTION, noise=False)
+            planned_total += model.time_to_stable(start, target, planner.plan(start, target), noise=False)
+        result = {"default_s": default_total, "planned_s": planned_total,
+                  "saved_ratio": 1 - planned_total / default_total}
+        print(f"default {default_total:.0f} s, planned {planned_total:.0f} s, saved {result['saved_ratio']:.1%}")
+        return result
+
+
+class SimThermalModel:
+    """
+    toy model of the time-to-stable of a step, only for the offline evaluation of the planner
+    - cooling rate grows with the pressure and the VTI offset, warming rate drops with the VTI offset
+    - the settling time grows with the pressure and the deviation of the VTI offset from default
+    - a limited ramp rate reduces the overshoot settling but caps the travelling rate
+    """
+
+    def __init__(self, *, cool_rate: float = 1.0, heat_rate: float = 6.0, tau: float = 30,
+                 tolerance: float = 0.01, noise: float = 0.1, seed: Optional[int] = None):
+        self.cool_rate = cool_rate  # K/min at 1 mbar and default VTI
+        self.heat_rate = heat_rate  # K/min at default VTI
+        self.tau = tau  # s
+        self.tolerance = tolerance  # relative band
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+
+    def time_to_stable(self, start: float, target: float, action: dict, *, noise: bool = True) -> float:
+        delta = abs(target - start)
+        pres = action["pres"] if action["pres"] is not None else default_pressure(target, get_trend(start, target))
+        if target < start:
+            rate = self.cool_rate * np.sqrt(pres) * action["vti_scale"]
+        else:
+            rate = self.heat_rate / action["vti_scale"]
+        overshoot = 1.5
+        if action["ramp_rate"] is not None:
+            rate = min(rate, action["ramp_rate"])
+            overshoot = 1.0
+        tau = self.tau * (1 + 3 * abs(action["vti_scale"] - 1)) * (1 + pres / 25) * overshoot
+        total = 60 * delta / rate + tau * np.log(delta / (self.tolerance * target) + 1)
+        if noise:
+            total *= float(np.exp(self.rng.normal(0, self.noise)))
+        return float(total)
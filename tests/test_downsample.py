@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+import numpy as np
+from pyflexlab.downsample import Downsampler, downsample_indices
+
+y = np.cumsum(np.random.default_rng(0).normal(size=100000))
+x = np.arange(len(y)) * 0.1
+
+#=======test the offline downsampling keeps the extremes (minmax)=======
+idx = downsample_indices(x, y, 1000)
+print(len(idx), y[idx].max() == y.max(), y[idx].min() == y.min())
+assert len(downsample_indices(x[:500], y[:500], 1000)) == 500
+
+# Expected output:
+# 1000 True True
+
+#=======test the incremental downsampling of a growing trace=======
+ds = Downsampler(500, "lttb")
+for end in range(1000, len(y) + 1, 1000):
+    idx = ds.indices(x[:end], y[:end])
+print(idx[0], idx[-1], len(idx) <= 1000, np.all(np.diff(idx) > 0))
+
+# Expected output:
+# 0 99999 True True
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+import subprocess
+import sys
+
+HEAVY = ("pandas", "matplotlib", "plotly", "dash", "qcodes", "pymeasure", "pyvisa")
+
+
+def import_cost(module: str) -> tuple[float, list[str]]:
+    """import the module in a fresh interpreter, return the time (s) and the heavy packages loaded"""
+    code = (f"import sys, time; t = time.perf_counter(); import {module}; dt = time.perf_counter() - t; "
+            f"print(dt, *[name for name in {HEAVY!r} if name in sys.modules])")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    dt, *loaded = out.strip().splitlines()[-1].split()
+    return float(dt), loaded
+
+
+#=======report the import cost of the package and each module=======
+for module in ("pyflexlab", "pyflexlab.constants", "pyflexlab.file_organizer", "pyflexlab.data_process",
+               "pyflexlab.data_plot", "pyflexlab.measure_manager", "pyflexlab.equip_wrapper",
+               "pyflexlab.auxiliary", "pyflexlab.drivers"):
+    dt, loaded = import_cost(module)
+    print(f"{module:28s} {dt * 1000:8.1f} ms  {' '.join(loaded)}")
+
+#=======the heavy dependencies are only loaded when needed=======
+assert import_cost("pyflexlab")[1] == []
+assert not {"plotly", "dash"} & set(import_cost("pyflexlab.data_plot")[1])
+assert not {"qcodes", "pymeasure", "pyvisa"} & set(import_cost("pyflexlab.measure_manager")[1])
+print("lazy imports ok")
+
+# Expected output:
+# (the times depend on the machine)
+# pyflexlab                        ...  ms
+# pyflexlab.constants              ...  ms
+# pyflexlab.file_organizer         ...  ms
+# pyflexlab.data_process           ...  ms  pandas
+# pyflexlab.data_plot              ...  ms  pandas matplotlib
+# pyflexlab.measure_manager        ...  ms  pandas matplotlib
+# pyflexlab.equip_wrapper          ...  ms
+# pyflexlab.auxiliary              ...  ms  matplotlib
+# pyflexlab.drivers                ...  ms
+# lazy imports ok
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+import numpy as np
+from pyflexlab.constants import gen_seq, sweep_table, SweepPlan
+
+#=======test exact values of a long sweep=======
+table = sweep_table(0, 1, 0.1)
+print(table.tolist())
+assert table[3] == 0.3
+long_table = sweep_table(0, 100, 1E-3)
+assert len(long_table) == 100001 and long_table[-2] == 99.999
+
+# Expected output:
+# [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+
+#=======test the same sequence as the former gen_seq (both directions, uneven step)=======
+print(list(gen_seq(1, 0, 0.3)), list(gen_seq(0, 1, -0.3)))
+assert list(gen_seq(2, 2, 0.1)) == [2]
+
+# Expected output:
+# [1.0, 0.7, 0.4, 0.1, 0.0] [0.0, 0.3, 0.6, 0.9, 1.0]
+
+#=======test the sweep modes=======
+plan = SweepPlan.from_mode("0-max--max-max-0", 1, 0.5)
+print(plan, plan.values.tolist())
+assert list(plan) == [0.0, 0.5, 1.0, 1.0, 0.5, 0.0, -0.5, -1.0, -1.0, -0.5, 0.0, 0.5, 1.0, 1.0, 0.5, 0.0]
+print(len(SweepPlan.from_mode("0-max-0", 1E-6, 1E-8)), len(SweepPlan.from_mode("min-max", 2, 0.25, min_value=1)))
+
+# Expected output:
+# SweepPlan(4 segments, 16 points) [0.0, 0.5, 1.0, 1.0, 0.5, 0.0, -0.5, -1.0, -1.0, -0.5, 0.0, 0.5, 1.0, 1.0, 0.5, 0.0]
+# 202 5
+
+#=======test log and custom segments=======
+plan = SweepPlan().add_segment(1, 100, n_points=3, log=True).add_values([50, 20])
+print(plan.values.tolist(), plan[-1])
+assert np.allclose(plan.values, [1, 10, 100, 50, 20])
+
+# Expected output:
+# [1.0, 10.0, 100.0, 50.0, 20.0] 20.0